@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""
+Benchmarks of the FuBench harness itself.
+
+Measures problem generation and prompt building for every problem class,
+check() on valid and malformed answers, generate_latex_report() at 10, 1k
+and 10k results, and end-to-end runs of fubench.main() against the local
+mock server at several concurrency levels.
+
+Results are written as JSON and compared against a stored baseline; any
+benchmark slower than the baseline by more than the tolerance is reported
+and the script exits with status 1:
+
+    python bench.py --save-baseline      # on a known-good revision
+    python bench.py                      # later: compare against it
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+from rich.console import Console
+from rich.table import Table
+
+import fubench
+from mock_server import MockConfig, make_server
+from problems import DerivativeComputationProblem, IntegerQuadraticProblem, \
+    SystemOfEquationsProblem, TrigExpressionProblem
+
+PROBLEM_CLASSES = [IntegerQuadraticProblem, TrigExpressionProblem, DerivativeComputationProblem, SystemOfEquationsProblem]
+
+# Answers that fail to parse or have the wrong shape
+MALFORMED_ANSWERS = ["", "x = 3", "[1, 2", "The answer is 7", "[[1], 2]", "null"]
+
+# Registered benchmarks: (name, function, items); function(items) runs once
+BENCHMARKS = []
+
+
+def benchmark(name, items):
+    """Register a benchmark that processes items per call."""
+    def register(fn):
+        BENCHMARKS.append((name, fn, items))
+        return fn
+    return register
+
+
+def timed(fn, items, repeat):
+    """Return the best wall-clock time of repeat calls of fn(items)."""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(items)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def register_problem_benchmarks():
+    for ProblemClass in PROBLEM_CLASSES:
+        name = ProblemClass.__name__
+
+        @benchmark(f"generate/{name}", 10000)
+        def generate(n, ProblemClass=ProblemClass):
+            fubench.make_problem_set(ProblemClass, n, seed=0)
+
+        @benchmark(f"prompt/{name}", 10000)
+        def prompt(n, ProblemClass=ProblemClass):
+            problems = fubench.make_problem_set(ProblemClass, n, seed=0)
+            for i in range(n):
+                fubench.DEFAULT_PROMPT.format(problem=problems[i].prompt())
+
+        @benchmark(f"check_valid/{name}", 10000)
+        def check_valid(n, ProblemClass=ProblemClass):
+            problems = fubench.make_problem_set(ProblemClass, min(n, 1000), seed=0)
+            cases = [(problems[i], problems[i].solve()) for i in range(len(problems))]
+            for i in range(n):
+                problem, answer = cases[i % len(cases)]
+                problem.check(answer)
+
+        @benchmark(f"check_malformed/{name}", 10000)
+        def check_malformed(n, ProblemClass=ProblemClass):
+            problem = fubench.make_problem_set(ProblemClass, 1, seed=0)[0]
+            for i in range(n):
+                try:
+                    problem.check(MALFORMED_ANSWERS[i % len(MALFORMED_ANSWERS)])
+                except Exception:
+                    pass  # The harness treats a raising check() as incorrect
+
+
+def fake_results(n):
+    """Yield n synthetic results shaped like the ones in a run log."""
+    problems = fubench.make_problem_set(IntegerQuadraticProblem, n, seed=0)
+    for i in range(n):
+        problem = problems[i]
+        yield {
+            "problem": str(problem),
+            "prompt": fubench.DEFAULT_PROMPT.format(problem=problem.prompt()),
+            "full_response": "<think>\nLet me factor $x^2 + bx + c$ step by step.\n</think>\n<answer>" + problem.solve(),
+            "extracted_answer": problem.solve(),
+            "correct_answer": problem.solve(),
+            "is_correct": i % 3 != 0,
+            "model": "bench",
+            "problem_index": i + 1
+        }
+
+
+def register_report_benchmarks(workdir):
+    for n in (10, 1000, 10000):
+        @benchmark(f"report/{n}", n)
+        def report(n):
+            args = argparse.Namespace(model="bench", **{"class": "IntegerQuadraticProblem"})
+            summary = {"total_problems": n, "correct_count": n * 2 // 3, "accuracy": 2 / 3}
+            fubench.generate_latex_report(Path(workdir) / f"bench_report_{n}.tex", {
+                "summary": summary,
+                "detailed_results": fake_results(n)
+            }, args)
+
+
+def register_end_to_end_benchmarks(workdir, num_problems):
+    # A fast, error-free endpoint, so the numbers measure the harness
+    config = MockConfig(latency_median=0.005, latency_sigma=0.0, seed=0)
+    server = make_server("127.0.0.1", 0, config)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+    for concurrency in (1, 8, 32):
+        @benchmark(f"end_to_end/concurrency_{concurrency}", num_problems)
+        def end_to_end(n, concurrency=concurrency):
+            argv = [
+                "fubench.py", "--base-url", base_url, "--model", "bench",
+                "--num-problems", str(n), "--concurrency", str(concurrency),
+                "--seed", "0", "--no-cache", "--output", "bench_results.json"
+            ]
+            cwd = os.getcwd()
+            old_argv = sys.argv
+            os.chdir(workdir)
+            sys.argv = argv
+            try:
+                with contextlib.redirect_stdout(io.StringIO()):
+                    fubench.main()
+            finally:
+                sys.argv = old_argv
+                os.chdir(cwd)
+
+
+def compare(results, baseline):
+    """
+    Compare results with a baseline.
+
+    Returns:
+        dict: Benchmark name to the relative change in throughput, for
+        benchmarks present in both
+    """
+    changes = {}
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base and base.get("items_per_sec"):
+            changes[name] = result["items_per_sec"] / base["items_per_sec"] - 1
+    return changes
+
+
+def main():
+    console = Console()
+
+    parser = argparse.ArgumentParser(description='Benchmark the FuBench harness')
+    parser.add_argument('--filter', help='Run only benchmarks whose name contains this text')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per benchmark; the best time counts')
+    parser.add_argument('--e2e-problems', type=int, default=200, help='Problems per end-to-end run')
+    parser.add_argument('--output', default='bench_results.json', help='Where to write the results')
+    parser.add_argument('--baseline', default='bench_baseline.json', help='Baseline results to compare against')
+    parser.add_argument('--save-baseline', action='store_true', help='Store these results as the baseline instead of comparing')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='Allowed throughput drop versus the baseline, e.g. 0.25 for 25%%')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        register_problem_benchmarks()
+        register_report_benchmarks(workdir)
+        register_end_to_end_benchmarks(workdir, args.e2e_problems)
+
+        results = {}
+        for name, fn, items in BENCHMARKS:
+            if args.filter and args.filter not in name:
+                continue
+            console.print(f"[dim]Running {name}...[/dim]")
+            # End-to-end runs take seconds each; once is enough
+            seconds = timed(fn, items, 1 if name.startswith("end_to_end/") else args.repeat)
+            results[name] = {"items": items, "seconds": seconds, "items_per_sec": items / seconds}
+
+    output = {
+        "timestamp": datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "benchmarks": results
+    }
+    with open(args.output, 'w') as f:
+        json.dump(output, f, indent=2)
+
+    baseline = {}
+    if not args.save_baseline and Path(args.baseline).exists():
+        with open(args.baseline) as f:
+            baseline = json.load(f)["benchmarks"]
+    changes = compare(results, baseline)
+
+    table = Table(title="Harness Benchmarks", show_header=True, header_style="bold magenta")
+    table.add_column("Benchmark", min_width=30)
+    table.add_column("Items", justify="right")
+    table.add_column("Best Time", justify="right")
+    table.add_column("Items/sec", justify="right")
+    table.add_column("vs Baseline", justify="right")
+    regressions = []
+    for name, result in results.items():
+        change = changes.get(name)
+        if change is None:
+            cell = "-"
+        elif change < -args.tolerance:
+            cell = f"[bold red]{change:+.1%}[/bold red]"
+            regressions.append(name)
+        else:
+            cell = f"[green]{change:+.1%}[/green]" if change >= 0 else f"{change:+.1%}"
+        table.add_row(name, str(result["items"]), f"{result['seconds']:.4f}s", f"{result['items_per_sec']:,.0f}", cell)
+    console.print(table)
+    console.print(f"[dim]Results saved to[/dim] [cyan]{args.output}[/cyan]")
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(output, f, indent=2)
+        console.print(f"[dim]Baseline saved to[/dim] [cyan]{args.baseline}[/cyan]")
+    elif not baseline:
+        console.print(f"[yellow]No baseline at {args.baseline}; run with --save-baseline to store one[/yellow]")
+
+    if regressions:
+        console.print(f"[bold red]Performance regression:[/bold red] {len(regressions)} benchmark(s) "
+                      f"more than {args.tolerance:.0%} slower than the baseline:")
+        for name in regressions:
+            console.print(f"  [red]{name}: {changes[name]:+.1%}[/red]")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""Persistent on-disk cache of model completions for FuBench."""
+
+import hashlib
+import json
+import threading
+import time
+from pathlib import Path
+
+# Request fields that determine the completion
+KEY_FIELDS = ("model", "prompt", "max_tokens", "temperature", "stop")
+
+
+class ResponseCache:
+    """
+    Content-addressed SQLite cache of completions with LRU eviction.
+
+    Entries are keyed on a hash of the endpoint, the model, the fully
+    formatted prompt and the sampling parameters, so any change to the
+    prompt template or parameters is a miss while changes to grading or
+    reporting are not. Responses from one endpoint, such as a local mock
+    server, are never returned for another that serves the same model name.
+    When the stored values exceed max_bytes, the least recently used
+    entries are evicted.
+    """
+
+    def __init__(self, path=Path("logs") / "cache.sqlite3", max_bytes=1024 * 1024 * 1024, refresh=False, endpoint=None):
+        """
+        Args:
+            path: SQLite database file, created if missing
+            max_bytes: Size cap for stored values
+            refresh: If True, ignore existing entries but store new responses
+            endpoint: Base URL of the API the responses come from, or None
+                for OpenRouter
+        """
+        self.path = Path(path)
+        self.endpoint = endpoint
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.refresh = refresh
+        self.stats = {"hits": 0, "misses": 0, "writes": 0, "evictions": 0}
+
+        self._lock = threading.Lock()
+        import sqlite3
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created REAL NOT NULL,
+                accessed REAL NOT NULL
+            )
+        """)
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+        self._db.commit()
+        self._size = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    @staticmethod
+    def key(request, endpoint=None):
+        """Return the cache key for a completions request dict sent to endpoint (None for OpenRouter)."""
+        fields = [request.get(field) for field in KEY_FIELDS]
+        if request.get("n", 1) != 1:
+            # Only multi-sample requests carry n, so older keys stay valid
+            fields.append(request["n"])
+        if endpoint is not None:
+            # Likewise only other endpoints than OpenRouter add theirs
+            fields.append({"endpoint": endpoint})
+        return hashlib.sha256(json.dumps(fields, sort_keys=True).encode()).hexdigest()
+
+    def get(self, request):
+        """Return the cached value for request, or None on a miss."""
+        if self.refresh:
+            with self._lock:
+                self.stats["misses"] += 1
+            return None
+        key = self.key(request, self.endpoint)
+        with self._lock:
+            row = self._db.execute("SELECT value FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.stats["misses"] += 1
+                return None
+            self._db.execute("UPDATE responses SET accessed = ? WHERE key = ?", (time.time(), key))
+            self._db.commit()
+            self.stats["hits"] += 1
+        return json.loads(row[0])
+
+    def put(self, request, value):
+        """Store a JSON-serializable value for request, evicting old entries if needed."""
+        key = self.key(request, self.endpoint)
+        data = json.dumps(value)
+        size = len(data.encode())
+        now = time.time()
+        with self._lock:
+            row = self._db.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                self._size -= row[0]
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (key, value, size, created, accessed) VALUES (?, ?, ?, ?, ?)",
+                (key, data, size, now, now)
+            )
+            self._size += size
+            self.stats["writes"] += 1
+            self._evict()
+            self._db.commit()
+
+    def _evict(self):
+        # Evict down to 90% of the cap so we don't evict on every write
+        if self._size <= self.max_bytes:
+            return
+        target = self.max_bytes * 0.9
+        rows = self._db.execute("SELECT key, size FROM responses ORDER BY accessed").fetchall()
+        for key, size in rows:
+            if self._size <= target:
+                break
+            self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self._size -= size
+            self.stats["evictions"] += 1
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+class CountedCache:
+    """
+    One model's view of a shared ResponseCache, counting its own hits, misses and writes.
+
+    The shared cache's stats count every model's. Evictions make room for
+    any model's entries, so only the shared cache counts them.
+    """
+
+    def __init__(self, cache):
+        self.cache = cache
+        self.stats = {"hits": 0, "misses": 0, "writes": 0}
+        self._lock = threading.Lock()
+
+    def get(self, request):
+        value = self.cache.get(request)
+        with self._lock:
+            self.stats["misses" if value is None else "hits"] += 1
+        return value
+
+    def put(self, request, value):
+        self.cache.put(request, value)
+        with self._lock:
+            self.stats["writes"] += 1
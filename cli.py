@@ -0,0 +1,2638 @@
+"""The FuBench command line: evaluation runs and the merge, regrade, import, stats and query commands.
+
+fubench.py is the script that runs it; see run().
+"""
+
+import os
+import sys
+import json
+import argparse
+import contextlib
+import functools
+import hashlib
+import re
+import heapq
+import itertools
+import math
+import random
+import threading
+from problems import ParamsProblemSet, ProblemParams, ProblemSet
+from random import shuffle
+from datetime import datetime
+from pathlib import Path
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+import time
+import registry
+from scheduler import BudgetGovernor, RequestCancelled, RequestCoalescer, RequestHedger, RequestScheduler
+from cache import CountedCache, ResponseCache
+from runlog import RunLogWriter, read_header, read_results, read_summary, responses_path
+from resultsdb import GROUP_COLUMNS, ResultsDB
+import symbolic
+from watchdog import StreamWatchdog
+from profiling import profiler
+from metrics import TimingCollector, UsageCounter, mcnemar_p, pass_at_k, pass_at_k_values, percentile, wilson_interval
+
+OPENROUTER_BASE_URL = "https://openrouter.ai/api/v1"
+
+# OpenAI client for OpenRouter, created by main() once --base-url is known
+client = None
+
+# openai, rich, subprocess, platform and ProcessPoolExecutor are imported where they
+# are used, so --list-classes, --dry-run and other short invocations start quickly
+
+class LazyConsole:
+    """
+    Stand-in for a rich Console that creates it on first use.
+    
+    main() checks its arguments with one, so a --dry-run, which prints
+    with plain print, never imports rich. rich itself, e.g. Progress, must
+    be given the Console from get().
+    """
+    
+    _console = None
+    
+    def get(self):
+        if self._console is None:
+            from rich.console import Console
+            self._console = Console()
+        return self._console
+    
+    def __getattr__(self, name):
+        return getattr(self.get(), name)
+
+def make_client(base_url=OPENROUTER_BASE_URL):
+    """Create the OpenAI client for an OpenAI-compatible completions endpoint."""
+    from openai import OpenAI
+    return OpenAI(
+        base_url=base_url,
+        # Local stand-ins such as mock_server.py don't check the key
+        api_key=os.getenv("OPENROUTER_API_KEY") or "not-needed",
+        max_retries=0  # Retries are handled by RequestScheduler
+    )
+
+# Default prompt template for base model
+DEFAULT_PROMPT = """A conversation between User and Assistant. The user asks a question, and the Assistant solves it.
+The assistant first thinks about the reasoning process in the mind and then provides the user
+with the answer. The reasoning process and answer are enclosed within <think> </think> and
+<answer> </answer> tags, respectively, i.e., <think> reasoning process here </think>
+<answer> answer here </answer>. User: {problem}. Assistant:"""
+
+@contextlib.contextmanager
+def until(deadline):
+    """
+    Bound a request by a deadline, such as the end of --max-wall-time.
+    
+    Yields the extra client.completions.create arguments that time the
+    request out at deadline, a time.monotonic() value; none if deadline is
+    None. An error raised once the deadline has passed, such as that
+    timeout, becomes RequestCancelled, so the problem is left for --resume
+    instead of being retried or recorded as an error.
+    
+    Raises:
+        RequestCancelled: If the deadline has passed before the request is sent
+    """
+    if deadline is None:
+        yield {}
+        return
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        raise RequestCancelled()
+    try:
+        yield {"timeout": remaining}
+    except Exception as e:
+        if isinstance(e, RequestCancelled) or time.monotonic() < deadline:
+            raise
+        raise RequestCancelled() from e
+
+def request_completion(request, stream=False, cancelled=(), watchdog=None, deadline=None):
+    """
+    Send one completions request and time it.
+    
+    Args:
+        request: Keyword arguments for client.completions.create
+        stream: Stream the response, recording time-to-first-token and
+            stopping as soon as </answer> arrives
+        cancelled: threading.Events; once one is set, a streamed response
+            is closed at the next chunk
+        watchdog: Optional callable returning a new StreamWatchdog; a
+            streamed response it aborts is closed and its text is partial
+        deadline: Optional time.monotonic() value the request must finish
+            by (see until())
+    
+    Returns:
+        tuple: (response text, metrics dict with ttft, latency,
+        prompt_tokens, output_tokens and tokens_per_sec, plus "aborted"
+        with the watchdog's reason if it aborted the response)
+    
+    Raises:
+        RequestCancelled: If an event in cancelled was set, or the
+            deadline passed, before the response was complete
+    """
+    if any(event.is_set() for event in cancelled):
+        raise RequestCancelled()
+    start = time.perf_counter()
+    ttft = None
+    prompt_tokens = None
+    output_tokens = None
+    aborted = None
+    
+    with until(deadline) as options:
+        if not stream:
+            response = client.completions.create(**request, **options)
+            full_response = response.choices[0].text
+            if getattr(response, "usage", None):
+                prompt_tokens = response.usage.prompt_tokens
+                output_tokens = response.usage.completion_tokens
+        else:
+            response = client.completions.create(**request, **options, stream=True, stream_options={"include_usage": True})
+            parts = []
+            chunks = 0
+            tail = ""
+            watch = watchdog() if watchdog else None
+            try:
+                for chunk in response:
+                    if getattr(chunk, "usage", None):
+                        prompt_tokens = chunk.usage.prompt_tokens
+                        output_tokens = chunk.usage.completion_tokens
+                    if not chunk.choices or not chunk.choices[0].text:
+                        continue
+                    if ttft is None:
+                        ttft = time.perf_counter() - start
+                    text = chunk.choices[0].text
+                    parts.append(text)
+                    chunks += 1
+                    # The tag may be split across chunks, so keep a short tail
+                    tail += text
+                    if "</answer>" in tail:
+                        break
+                    if any(event.is_set() for event in cancelled) or (deadline is not None and time.monotonic() >= deadline):
+                        raise RequestCancelled()
+                    if watch is not None:
+                        aborted = watch.feed(text)
+                        if aborted:
+                            break
+                    tail = tail[-len("</answer>"):]
+            finally:
+                # Closing the stream stops generation client-side
+                response.close()
+            full_response = "".join(parts)
+            end = full_response.find("</answer>")
+            if end != -1:
+                # Match the non-streaming response, which stops before the tag
+                full_response = full_response[:end]
+            if output_tokens is None:
+                # No usage chunk when we stop early; providers send about one
+                # token per chunk
+                output_tokens = chunks
+    
+    latency = time.perf_counter() - start
+    profiler.record("http", start, latency, stream=stream)
+    generation_time = latency - (ttft or 0.0)
+    metrics = {
+        "ttft": ttft,
+        "latency": latency,
+        "prompt_tokens": prompt_tokens,
+        "output_tokens": output_tokens,
+        "tokens_per_sec": output_tokens / generation_time if output_tokens and generation_time > 0 else None
+    }
+    if aborted:
+        metrics["aborted"] = aborted
+    return full_response, metrics
+
+def build_request(model, prompt, max_tokens, temperature=0.0, n=1):
+    """Return the completions request for one prompt, asking for n choices."""
+    request = dict(
+        model=model,
+        prompt=prompt,
+        max_tokens=max_tokens,
+        temperature=temperature,  # 0.0 is deterministic for evaluation
+        stop=["</answer>", "\n\nUser:"]  # Stop after answer tag or new user turn
+    )
+    if n > 1:
+        request["n"] = n
+    return request
+
+def request_batch_completion(request, deadline=None):
+    """
+    Send one completions request with a list of prompts, timing out at the optional deadline.
+    
+    Returns:
+        tuple: (dict mapping prompt position to response text, metrics dict
+        with the latency of the whole request and each prompt's share of
+        its token usage)
+    """
+    start = time.perf_counter()
+    with until(deadline) as options:
+        response = client.completions.create(**request, **options)
+    texts = {}
+    for choice in response.choices:
+        # With one choice per prompt, choice.index is the prompt's position
+        if 0 <= choice.index < len(request['prompt']):
+            texts[choice.index] = choice.text
+    profiler.record("http", start, time.perf_counter() - start, batch_size=len(request['prompt']))
+    # Usage is only reported for the whole batch, so every prompt gets an
+    # equal share and the shares add up to the batch's usage
+    usage = getattr(response, "usage", None)
+    metrics = {
+        "ttft": None,
+        "latency": time.perf_counter() - start,
+        "prompt_tokens": usage.prompt_tokens / len(request['prompt']) if usage else None,
+        "output_tokens": usage.completion_tokens / len(request['prompt']) if usage else None,
+        "tokens_per_sec": None,
+        "batch_size": len(request['prompt'])
+    }
+    return texts, metrics
+
+def request_samples(request, scheduler=None, deadline=None):
+    """
+    Request request['n'] sampled choices for one prompt.
+    
+    The choices are asked for in one request, so the prompt is sent and
+    billed once. Providers that reject n, or return fewer choices than
+    asked for, get the missing samples as concurrent single requests.
+    Every request times out at the optional deadline (see until()).
+    
+    Returns:
+        tuple: (list of response texts, metrics dict with the latency and
+        token usage of all samples and how many were single requests)
+    """
+    from openai import BadRequestError
+    
+    def create(request):
+        with until(deadline) as options:
+            return client.completions.create(**request, **options)
+    
+    call = scheduler.call if scheduler else lambda fn, *args, **kwargs: fn(*args, **kwargs)
+    start = time.perf_counter()
+    n = request['n']
+    texts = []
+    prompt_tokens = 0
+    output_tokens = 0
+    try:
+        with profiler.span("http", n=n):
+            response = call(create, request)
+        texts = [choice.text for choice in sorted(response.choices, key=lambda choice: choice.index)][:n]
+        if getattr(response, "usage", None):
+            prompt_tokens = response.usage.prompt_tokens
+            output_tokens = response.usage.completion_tokens
+    except BadRequestError:
+        pass  # n not supported; sample one at a time
+    
+    missing = n - len(texts)
+    if missing:
+        single = {key: value for key, value in request.items() if key != 'n'}
+        with ThreadPoolExecutor(max_workers=missing) as pool:
+            for text, metrics in pool.map(lambda _: call(request_completion, single, deadline=deadline), range(missing)):
+                texts.append(text)
+                prompt_tokens += metrics['prompt_tokens'] or 0
+                output_tokens += metrics['output_tokens'] or 0
+    
+    latency = time.perf_counter() - start
+    metrics = {
+        "ttft": None,
+        "latency": latency,
+        "prompt_tokens": prompt_tokens or None,
+        "output_tokens": output_tokens or None,
+        "tokens_per_sec": output_tokens / latency if output_tokens and latency > 0 else None,
+        "samples": n,
+        "single_requests": missing
+    }
+    return texts, metrics
+
+def shared_call(coalescer, request, fn, *args, **kwargs):
+    """
+    Call fn(*args, **kwargs) to send request, unless an identical request was sent already.
+    
+    Returns:
+        tuple: (return value of fn, True if it was shared from another
+        problem's identical request through the RequestCoalescer)
+    """
+    if coalescer is None:
+        return fn(*args, **kwargs), False
+    return coalescer.call(ResponseCache.key(request), fn, *args, **kwargs)
+
+def send_completion(request, scheduler=None, hedger=None, stream=False, watchdog=None, cancelled=None, deadline=None):
+    """
+    Send one completions request through the scheduler, hedging it if a RequestHedger is given.
+    
+    A streamed request is closed once the optional cancelled
+    threading.Event is set, or once it loses to its hedge. Every copy
+    times out at the optional deadline (see until()).
+    
+    Returns:
+        tuple: (response text, metrics dict); a hedged request's metrics
+        also carry "hedge", the copy that won: "primary" or "backup"
+    """
+    def attempt(copy_cancelled=None, sending=contextlib.nullcontext()):
+        events = [event for event in (cancelled, copy_cancelled) if event]
+        
+        def send():
+            # Holding a slot now, so the hedger's timer starts
+            with sending:
+                return request_completion(request, stream=stream, cancelled=events, watchdog=watchdog, deadline=deadline)
+        
+        if scheduler:
+            return scheduler.call(send)
+        return send()
+    
+    if hedger is None:
+        return attempt()
+    start = time.perf_counter()
+    (full_response, metrics), winner = hedger.call(attempt)
+    if winner:
+        # The backup started late; count the wait for the primary too
+        metrics = {**metrics, "latency": time.perf_counter() - start, "hedge": winner}
+    return full_response, metrics
+
+def evaluate_problem(problem, model=None, prompt_template=DEFAULT_PROMPT, max_tokens=4000, scheduler=None, cache=None, stream=False, completion=None, temperature=0.0, samples=1, coalescer=None, hedger=None, watchdog=None, cancelled=None, deadline=None, cached=None):
+    """
+    Evaluate a single problem using the specified model via completions API.
+    
+    Args:
+        problem: The problem object
+        model: The model identifier for OpenRouter
+        prompt_template: The prompt template with {problem} placeholder
+        max_tokens: Maximum tokens for the response
+        scheduler: Optional RequestScheduler used to retry throttled and
+            transient failures and to limit in-flight requests
+        cache: Optional ResponseCache consulted before calling the API
+        stream: Stream the completion and record time-to-first-token
+        completion: Optional (response text, metrics) already fetched, e.g.
+            by evaluate_batch(); no request is sent
+        temperature: Sampling temperature
+        samples: Number of responses to sample; with more than one, every
+            sample is graded and the result is the majority vote
+        coalescer: Optional RequestCoalescer; a request identical to one
+            already sent shares its response and is marked deduplicated
+        hedger: Optional RequestHedger that sends a backup copy of a slow
+            single-sample request
+        watchdog: Optional callable returning a new StreamWatchdog for a
+            streamed response; the reason it aborted a response is
+            recorded under "aborted"
+        cancelled: Optional threading.Event that closes a streamed response
+            once it is set
+        deadline: Optional time.monotonic() value by which requests must
+            finish; one still running then is cancelled (see until())
+        cached: Optional cache entry for the request that the caller has
+            looked up already, e.g. evaluate_batch(); the cache is not
+            consulted again
+    
+    Returns:
+        dict: Contains the problem, prompt, response, extracted answer, and
+        evaluation; or, if the request was cancelled before the response
+        was complete, only the problem, prompt and "cancelled"
+    """
+    # Format the prompt with the problem
+    with profiler.span("format_prompt"):
+        prompt = prompt_template.format(problem=problem.prompt())
+    
+    # Call the model using completions API for base models
+    full_response = None
+    metrics = None
+    aborted = None
+    try:
+        request = build_request(model, prompt, max_tokens, temperature=temperature, n=samples)
+        
+        if cached is None and cache and completion is None:
+            with profiler.span("cache"):
+                cached = cache.get(request)
+        shared = False
+        if samples > 1:
+            if cached is not None:
+                texts = cached["texts"]
+            else:
+                (texts, metrics), shared = shared_call(coalescer, request, request_samples, request, scheduler, deadline)
+                if shared:
+                    metrics = None  # The timing belongs to the problem that sent the request
+                elif cache:
+                    with profiler.span("cache"):
+                        cache.put(request, {"texts": texts})
+            full_response = texts[0]
+            
+            result = {
+                "problem": str(problem),
+                "prompt": prompt,
+                **grade_samples(problem, texts),
+                "model": model,
+                "cached": cached is not None,
+                "metrics": metrics
+            }
+            if shared:
+                result["deduplicated"] = True
+            return result
+        
+        if completion is not None:
+            full_response, metrics = completion
+        elif cached is not None:
+            full_response = cached["text"]
+        else:
+            (full_response, metrics), shared = shared_call(coalescer, request, send_completion, request, scheduler, hedger, stream, watchdog, cancelled, deadline)
+            aborted = metrics.get("aborted")
+            if shared:
+                metrics = None
+            elif cache and not aborted:
+                # An aborted response is partial; a run with other watchdog
+                # settings should get the whole one
+                with profiler.span("cache"):
+                    cache.put(request, {"text": full_response})
+        
+        if aborted and extract_answer(full_response) is None:
+            # Cut off before answering: wrong, not an error to retry
+            answer, is_correct, correct_answer = None, False, problem.solve()
+        else:
+            answer, is_correct, correct_answer = grade_response(problem, full_response)
+        
+        result = {
+            "problem": str(problem),
+            "prompt": prompt,
+            "full_response": full_response,
+            "extracted_answer": answer,
+            "correct_answer": correct_answer,
+            "is_correct": is_correct,
+            "model": model,
+            "cached": completion is None and cached is not None,
+            "metrics": metrics
+        }
+        if shared:
+            result["deduplicated"] = True
+        if aborted:
+            result["aborted"] = aborted
+        return result
+    
+    except RequestCancelled:
+        # Never answered, so not an error of the model; --resume sends it
+        return {"problem": str(problem), "prompt": prompt, "model": model, "cancelled": True}
+    except Exception as e:
+        result = {
+            "problem": str(problem),
+            "prompt": prompt,
+            "error": str(e),
+            "model": model
+        }
+        if full_response is not None:
+            # The request succeeded but grading failed; keep the response
+            # so it can be re-graded offline, and its usage
+            result["full_response"] = full_response
+            result["metrics"] = metrics
+        if aborted:
+            result["aborted"] = aborted
+        return result
+
+def extract_answer(full_response):
+    """Return the text between <answer> tags, or None if there is no answer tag."""
+    answer = None
+    if "<answer>" in full_response:
+        start = full_response.find("<answer>") + len("<answer>")
+        # Note: we already stopped at </answer>, but check in case
+        end = full_response.find("</answer>", start)
+        if end == -1:
+            answer = full_response[start:].strip()
+        else:
+            answer = full_response[start:end].strip()
+    return answer
+
+def grade_response(problem, full_response):
+    """
+    Extract the answer from a model response and check it.
+    
+    Returns:
+        tuple: (extracted answer, is_correct, correct answer)
+    """
+    with profiler.span("extract"):
+        answer = extract_answer(full_response)
+    
+    # Evaluate if the answer is correct
+    with profiler.span("check"):
+        is_correct = problem.check(answer)
+        correct_answer = problem.solve()
+    return answer, is_correct, correct_answer
+
+def grade_samples(problem, texts):
+    """
+    Grade every sampled response to a problem and take a majority vote.
+    
+    Answers are compared as text, ignoring whitespace; responses without
+    an answer do not vote, and ties go to the answer given first.
+    
+    Returns:
+        dict: Result fields: the full_response, extracted_answer and
+        is_correct of the majority answer, the correct_answer, num_correct
+        over all samples, and samples, one dict per response
+    """
+    samples = []
+    votes = {}
+    for text in texts:
+        with profiler.span("extract"):
+            answer = extract_answer(text)
+        try:
+            with profiler.span("check"):
+                is_correct = bool(problem.check(answer))
+        except Exception:
+            is_correct = False  # Malformed answer
+        samples.append({"full_response": text, "extracted_answer": answer, "is_correct": is_correct})
+        if answer is not None:
+            votes.setdefault("".join(answer.split()), []).append(len(samples) - 1)
+    
+    majority = samples[max(votes.values(), key=len)[0]] if votes else None
+    return {
+        "full_response": (majority or samples[0])["full_response"],
+        "extracted_answer": majority["extracted_answer"] if majority else None,
+        "correct_answer": problem.solve(),
+        "is_correct": majority["is_correct"] if majority else False,
+        "num_correct": sum(sample["is_correct"] for sample in samples),
+        "samples": samples
+    }
+
+def evaluate_batch(problems, model=None, prompt_template=DEFAULT_PROMPT, max_tokens=4000, scheduler=None, cache=None, stream=False, temperature=0.0, samples=1, coalescer=None, hedger=None, watchdog=None, cancelled=None, deadline=None):
+    """
+    Evaluate several problems with one multi-prompt completions request.
+    
+    Prompts answered from the cache, and with a coalescer prompts that
+    were already sent, are left out of the request, and a prompt repeated
+    within the batch is sent once. Each
+    returned choice is mapped back to its problem by index, and any prompt
+    the endpoint leaves unanswered, or the whole batch if the endpoint
+    rejects list prompts, falls back to single-prompt requests. If the
+    request is cancelled, its prompts get "cancelled" results like
+    evaluate_problem() gives, instead of falling back.
+    
+    Returns:
+        list: One result dict per problem, in the same order
+    """
+    completions = [None] * len(problems)
+    hits = [None] * len(problems)
+    unsent = set()
+    kwargs = dict(model=model, prompt_template=prompt_template, max_tokens=max_tokens, scheduler=scheduler, cache=cache, stream=stream, temperature=temperature, samples=samples, coalescer=coalescer, hedger=hedger, watchdog=watchdog, cancelled=cancelled, deadline=deadline)
+    
+    if len(problems) > 1 and not stream and samples == 1:
+        prompts = [prompt_template.format(problem=problem.prompt()) for problem in problems]
+        requests = [build_request(model, prompt, max_tokens, temperature=temperature) for prompt in prompts]
+        
+        pending = []
+        claims = {}
+        for j, request in enumerate(requests):
+            hits[j] = cache.get(request) if cache else None
+            if hits[j] is None:
+                if coalescer:
+                    future, leader = coalescer.claim(ResponseCache.key(request))
+                    if not leader:
+                        continue  # Sent already; evaluate_problem() shares the response
+                    claims[j] = future
+                pending.append(j)
+        
+        try:
+            if len(pending) > 1:
+                batch_request = dict(requests[pending[0]], prompt=[prompts[j] for j in pending])
+                try:
+                    if scheduler:
+                        texts, metrics = scheduler.call(request_batch_completion, batch_request, deadline)
+                    else:
+                        texts, metrics = request_batch_completion(batch_request, deadline)
+                except RequestCancelled:
+                    # A budget stop or the deadline; left for --resume
+                    texts, metrics = {}, None
+                    unsent.update(pending)
+                except Exception:
+                    texts, metrics = {}, None  # List prompts rejected; send them one at a time
+                for position, text in texts.items():
+                    j = pending[position]
+                    completions[j] = (text, metrics)
+                    if cache:
+                        cache.put(requests[j], {"text": text})
+                    if j in claims:
+                        coalescer.resolve(ResponseCache.key(requests[j]), claims.pop(j), completions[j])
+        finally:
+            # Unanswered prompts are claimed again by evaluate_problem()
+            for j, future in claims.items():
+                coalescer.release(ResponseCache.key(requests[j]), future)
+    
+    results = []
+    for j, (problem, completion, cached) in enumerate(zip(problems, completions, hits)):
+        if j in unsent:
+            results.append({"problem": str(problem), "prompt": prompts[j], "model": model, "cancelled": True})
+            continue
+        # Without a completion, evaluate_problem() uses the cache or sends its own request
+        result = evaluate_problem(problem, completion=completion, cached=cached, **kwargs)
+        if len(problems) > 1 and completion is None and not result.get('cached') and not result.get('deduplicated'):
+            result['batch_fallback'] = True
+        results.append(result)
+    return results
+
+# Escape special LaTeX characters but preserve math mode
+def escape_latex(text, preserve_math=False):
+    if text is None:
+        return ""
+    
+    if preserve_math:
+        # Split by $ to preserve math mode
+        parts = text.split('$')
+        result = []
+        for i, part in enumerate(parts):
+            if i % 2 == 0:  # Outside math mode
+                result.append(escape_latex(part, preserve_math=False))
+            else:  # Inside math mode
+                result.append('$' + part + '$')
+        return ''.join(result)
+    
+    replacements = {
+        '\\': r'\textbackslash{}',
+        '{': r'\{',
+        '}': r'\}',
+        '$': r'\$',
+        '&': r'\&',
+        '%': r'\%',
+        '#': r'\#',
+        '_': r'\_',
+        '~': r'\textasciitilde{}',
+        '^': r'\^{}',
+        '<': r'\textless{}',
+        '>': r'\textgreater{}',
+    }
+    for old, new in replacements.items():
+        text = text.replace(old, new)
+    return text
+
+# Extract reasoning from response
+def extract_reasoning(response):
+    if not response:
+        return "No reasoning provided"
+    
+    # Try to extract content between <think> tags
+    if "<think>" in response and "</think>" in response:
+        start = response.find("<think>") + len("<think>")
+        end = response.find("</think>")
+        return response[start:end].strip()
+    
+    # Otherwise return everything before <answer> tag
+    if "<answer>" in response:
+        return response[:response.find("<answer>")].strip()
+    
+    return response.strip()
+
+LATEX_PREAMBLE = r"""\documentclass[11pt]{article}
+\usepackage[margin=1in]{geometry}
+\usepackage{amsmath}
+\usepackage{amssymb}
+\usepackage{xcolor}
+\usepackage{tcolorbox}
+\usepackage{enumitem}
+\usepackage{fancyhdr}
+\usepackage{datetime2}
+\usepackage{pdfpages}
+
+% Define colors
+\definecolor{correctgreen}{RGB}{0,150,0}
+\definecolor{incorrectred}{RGB}{200,0,0}
+\definecolor{boxgray}{RGB}{240,240,240}
+
+% Setup fancy headers
+\pagestyle{fancy}
+\fancyhf{}
+\lhead{FuBench Evaluation Report}
+\rhead{\DTMnow}
+\cfoot{\thepage}
+
+% Setup tcolorbox styles
+\tcbset{
+    base/.style={
+        boxrule=0.5pt,
+        arc=2mm,
+        fonttitle=\bfseries,
+        colback=boxgray,
+        colframe=black!50
+    },
+    correct/.style={
+        base,
+        colframe=correctgreen,
+        colbacktitle=correctgreen!20
+    },
+    incorrect/.style={
+        base,
+        colframe=incorrectred,
+        colbacktitle=incorrectred!20
+    }
+}
+"""
+
+def latex_question_box(problem):
+    """Render the question box of a report section."""
+    return f"""
+\\begin{{tcolorbox}}[colback=gray!5, colframe=gray!50, boxrule=0.5pt, title={{Question}}]
+{escape_latex(problem, preserve_math=True)}
+\\end{{tcolorbox}}
+"""
+
+def latex_response_box(result, title="Model Response"):
+    """Render the box with one model's response, answer and status."""
+    # Determine if answer is correct
+    is_correct = result.get('is_correct', False)
+    box_style = 'correct' if is_correct else 'incorrect'
+    
+    # Extract components
+    full_response = result.get('full_response', '')
+    model_answer = result.get('extracted_answer', 'No answer extracted')
+    correct_answer = result.get('correct_answer', 'Unknown')
+    
+    box = f"""
+\\begin{{tcolorbox}}[{box_style}, title={{{escape_latex(title)}}}]
+\\textbf{{Full Response:}}
+\\begin{{quote}}
+{escape_latex(full_response, preserve_math=True)}
+\\end{{quote}}
+
+\\textbf{{Extracted Answer:}} {escape_latex(model_answer, preserve_math=True)}
+
+\\textbf{{Correct Answer:}} {escape_latex(correct_answer)}
+
+"""
+    
+    if 'samples' in result:
+        # The response shown is the majority answer's
+        answers = ", ".join(escape_latex(sample['extracted_answer'] or "none") for sample in result['samples'])
+        box += f"\\textbf{{Samples:}} {result['num_correct']} of {len(result['samples'])} correct; answers: {answers}\n\n"
+        box += r"\textbf{Majority Vote:} "
+    else:
+        box += r"\textbf{Status:} "
+    
+    if is_correct:
+        box += r"\textcolor{correctgreen}{$\checkmark$ Correct}"
+    else:
+        box += r"\textcolor{incorrectred}{$\times$ Incorrect}"
+    
+    return box + "\n\\end{tcolorbox}\n"
+
+def latex_sampling_items(sampling):
+    """Render the summary items of a multi-sample run, or nothing for a single-sample run."""
+    if not sampling:
+        return ""
+    items = f"    \\item \\textbf{{Samples:}} {sampling['samples']} per problem at temperature {sampling['temperature']}\n"
+    items += f"    \\item \\textbf{{Majority-Vote Accuracy:}} {escape_latex(format(sampling['majority_vote_accuracy'], '.1%'))}\n"
+    for k, value in sampling['pass_at_k'].items():
+        items += f"    \\item \\textbf{{pass@{k}:}} {escape_latex(format(value, '.1%'))}\n"
+    return items
+
+def latex_problem_section(i, result):
+    """Render the report section for one result."""
+    return (f"\n\\subsection{{Problem {i}}}\n"
+            + latex_question_box(result.get('problem', 'No problem text'))
+            + latex_response_box(result)
+            + "\n\\clearpage\n")
+
+def write_if_changed(path, content):
+    """Write content to path unless the file already holds it. Returns True if written."""
+    path = Path(path)
+    if path.exists() and path.stat().st_size == len(content.encode()) and path.read_text() == content:
+        return False
+    path.write_text(content)
+    return True
+
+def write_latex_document(filename, front_matter, sections, chunk_size=None):
+    """
+    Write a LaTeX report as a stream of per-problem sections.
+    
+    Each section goes to its own file in a sections directory next to the
+    report, and the main file only \\input's them, so memory stays flat
+    however many sections there are. Section files whose content is
+    unchanged are not rewritten, so regenerating a report after a small
+    change touches only what changed.
+    
+    With chunk_size, the sections are grouped into standalone part
+    documents that compile_pdf() can build in parallel, and the main file
+    includes the compiled parts.
+    
+    Args:
+        filename: Main .tex file
+        front_matter: LaTeX between \\begin{document} and the sections
+        sections: Iterable of (number, LaTeX) pairs, one per problem
+        chunk_size: Sections per part document, or None for a single file
+    
+    Returns:
+        list: The part .tex files to compile before the main file (empty
+        unless chunk_size is given)
+    """
+    filename = Path(filename)
+    # TeX dislikes some characters in \input paths (model names contain ':')
+    safe_stem = re.sub(r'[^A-Za-z0-9_-]', '_', filename.stem)
+    sections_dir = filename.parent / f"{safe_stem}_sections"
+    sections_dir.mkdir(exist_ok=True)
+    
+    parts = []
+    part_file = None
+    part_hash = None
+    
+    def close_part():
+        if part_file is not None:
+            part_file.write("\n\\end{document}\n")
+            part_file.close()
+            # Inputs hash, so compile_pdf() can reuse an up-to-date part PDF
+            write_if_changed(parts[-1].with_suffix('.inputs'), part_hash.hexdigest() + "\n")
+    
+    with open(filename, 'w') as f:
+        f.write(LATEX_PREAMBLE + "\n\\begin{document}\n" + front_matter)
+        
+        for n, (i, section) in enumerate(sections):
+            section_name = f"{sections_dir.name}/problem_{i:06d}"
+            write_if_changed(filename.parent / f"{section_name}.tex", section)
+            
+            if not chunk_size:
+                f.write(f"\\input{{{section_name}}}\n")
+                continue
+            
+            if n % chunk_size == 0:
+                # Start a new standalone part document
+                close_part()
+                part_tex = filename.parent / f"{safe_stem}_part{len(parts) + 1:04d}.tex"
+                parts.append(part_tex)
+                part_file = open(part_tex, 'w')
+                part_hash = hashlib.sha256()
+                part_file.write(LATEX_PREAMBLE + "\n\\begin{document}\n"
+                                "\\setcounter{section}{2}\n"
+                                f"\\setcounter{{subsection}}{{{i - 1}}}\n\n")
+                f.write(f"\\includepdf[pages=-]{{{part_tex.stem}}}\n")
+            part_file.write(f"\\input{{{section_name}}}\n")
+            part_hash.update(section.encode())
+        close_part()
+        
+        f.write(r"""
+\end{document}
+""")
+    
+    return parts
+
+def generate_latex_report(filename, log_data, args, chunk_size=None):
+    """
+    Generate a LaTeX report with questions, reasoning, answers, and correctness.
+    
+    The report is streamed by write_latex_document(), one section per
+    result.
+    
+    Returns:
+        list: The part .tex files to compile before the main file (empty
+        unless chunk_size is given)
+    """
+    summary = log_data['summary']
+    front_matter = r"""\title{Mathematical Problem Evaluation Report}
+\author{Model: """ + escape_latex(args.model) + r"""}
+\date{\today}
+\maketitle
+
+\section{Summary}
+\begin{itemize}
+    \item \textbf{Model:} """ + escape_latex(args.model) + r"""
+    \item \textbf{Problem Class:} """ + escape_latex(args.__dict__['class']) + r"""
+    \item \textbf{Total Problems:} """ + str(summary['total_problems']) + r"""
+    \item \textbf{Correct Answers:} """ + str(summary['correct_count']) + r"""
+    \item \textbf{Accuracy:} """ + escape_latex(f"{summary['accuracy']:.1%}") + r"""
+""" + latex_sampling_items(summary.get('sampling')) + r"""\end{itemize}
+
+\section{Detailed Results}
+
+"""
+    sections = ((i, latex_problem_section(i, result)) for i, result in enumerate(log_data['detailed_results'], 1))
+    return write_latex_document(filename, front_matter, sections, chunk_size)
+
+
+def generate_comparison_report(filename, run_info, model_rows, comparisons, log_filenames, chunk_size=None):
+    """
+    Generate a LaTeX report comparing several models on the same problems.
+    
+    The summary lists each model's accuracy and the paired head-to-head
+    results; each problem's section shows the question once, followed by
+    every model's response.
+    
+    Returns:
+        list: The part .tex files to compile before the main file (empty
+        unless chunk_size is given)
+    """
+    def percent(value, sign=""):
+        return escape_latex(format(value, sign + ".1%"))
+    
+    model_lines = "\n".join(
+        f"{escape_latex(row['model'])} & {row['correct_count']} / {row['total_problems']} & "
+        f"{percent(row['accuracy'])} & [{percent(row['interval'][0])}, {percent(row['interval'][1])}] \\\\"
+        for row in model_rows
+    )
+    pair_lines = "\n".join(
+        f"{escape_latex(c['models'][0])} & {escape_latex(c['models'][1])} & {c['pairs']} & "
+        f"{c['first_only']} & {c['second_only']} & {percent(c['accuracy_difference'], '+')} & "
+        f"{c['p_value']:.3g} \\\\"
+        for c in comparisons
+    )
+    front_matter = r"""\title{Model Comparison Report}
+\author{Problem Class: """ + escape_latex(run_info['problem_class']) + r"""}
+\date{\today}
+\maketitle
+
+\section{Summary}
+All models were evaluated on the same """ + str(run_info['num_problems']) + r""" problems.
+
+\begin{tabular}{lrrr}
+\textbf{Model} & \textbf{Correct} & \textbf{Accuracy} & \textbf{95\% CI} \\
+\hline
+""" + model_lines + r"""
+\end{tabular}
+
+\subsection*{Head-to-Head}
+Pairs are problems where both models returned a response; the p-value is from the exact McNemar test.
+
+\begin{tabular}{llrrrrr}
+\textbf{Model A} & \textbf{Model B} & \textbf{Pairs} & \textbf{Only A} & \textbf{Only B} & \textbf{A $-$ B} & \textbf{p} \\
+\hline
+""" + pair_lines + r"""
+\end{tabular}
+
+\section{Detailed Results}
+
+"""
+    
+    def sections():
+        for index, results in paired_results(log_filenames):
+            problem = next(result for result in results if result is not None)['problem']
+            section = f"\n\\subsection{{Problem {index}}}\n" + latex_question_box(problem)
+            for row, result in zip(model_rows, results):
+                if result is None:
+                    section += f"\n\\textit{{No result from {escape_latex(row['model'])}.}}\n"
+                else:
+                    section += latex_response_box(result, title=row['model'])
+            yield index, section + "\n\\clearpage\n"
+    
+    return write_latex_document(filename, front_matter, sections(), chunk_size)
+
+
+def show_result(console, table, problem, result, verbose=False, model=None):
+    """Add a finished result to the results table, printing it in full if verbose."""
+    i = result['problem_index']
+    
+    # Print problem if verbose
+    if verbose:
+        console.print(f"\n[bold]Problem {i}{f' ({model})' if model else ''}:[/bold] {problem}")
+    
+    if "error" in result:
+        if verbose:
+            console.print(f"[red]Error: {result['error']}[/red]")
+            
+        table.add_row(
+            str(i),
+            str(problem),
+            f"[red]Error: {result['error']}[/red]",
+            "-",
+            "[red]✗[/red]"
+        )
+    else:
+        if verbose:
+            console.print(f"[dim]Full response:[/dim]")
+            from rich.panel import Panel
+            console.print(Panel(result.get('full_response', 'No response'), border_style="dim"))
+            console.print(f"[bold]Extracted answer:[/bold] {result.get('extracted_answer', 'None')}")
+            console.print(f"[bold]Correct answer:[/bold] {result['correct_answer']}")
+            console.print(f"[bold]Status:[/bold] {'[green]Correct[/green]' if result['is_correct'] else '[red]Incorrect[/red]'}")
+        
+        status_icon = "[green]✓[/green]" if result['is_correct'] else "[red]✗[/red]"
+        answer_color = "green" if result['is_correct'] else "red"
+        answer = result['extracted_answer'] or (f"Aborted: {result['aborted']}" if result.get('aborted') else 'No answer extracted')
+        
+        table.add_row(
+            str(i),
+            str(problem),
+            f"[{answer_color}]{answer}[/{answer_color}]",
+            f"[cyan]{result['correct_answer']}[/cyan]",
+            status_icon
+        )
+
+
+def parse_shard(value):
+    """Parse a --shard value "I/N" into (I, N)."""
+    try:
+        index, count = (int(part) for part in value.split('/'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected I/N, got '{value}'")
+    if not 0 <= index < count:
+        raise argparse.ArgumentTypeError(f"shard index must satisfy 0 <= I < N, got '{value}'")
+    return (index, count)
+
+
+def make_problem_set(ProblemClass, n, seed):
+    """
+    Generate n problems deterministically from seed.
+    
+    Uses the class's array-backed batch() when it has one and NumPy is
+    installed, and otherwise builds objects one at a time from a seeded
+    global RNG, since the problem classes draw from the random module.
+    """
+    if hasattr(ProblemClass, 'batch'):
+        try:
+            # Array-backed set; problem objects are built on access
+            return ProblemClass.batch(n, seed=seed)
+        except ImportError:
+            pass  # NumPy not installed
+    random.seed(seed)
+    problems = [ProblemClass() for i in range(n)]
+    shuffle(problems)
+    return problems
+
+
+def problem_set_hash(params):
+    """
+    Return the SHA-256 of a problem set's parameters as the JSON list json.dumps() gives.
+    
+    The parameters are hashed one at a time, so they need not be in a list.
+    """
+    digest = hashlib.sha256(b"[")
+    for j, problem in enumerate(params):
+        digest.update(((", " if j else "") + json.dumps(problem)).encode())
+    digest.update(b"]")
+    return digest.hexdigest()
+
+
+def learn_max_tokens(results_db, model, problem_class, at_percentile, max_tokens, min_responses=20, headroom=1.25):
+    """
+    Learn a max_tokens for a model and problem class from earlier runs.
+    
+    Correct responses show how long an answer this model needs for this
+    class. The budget is the given percentile of their output tokens plus
+    headroom, so a response that runs much longer than that is cut off
+    instead of paid for. max_tokens stays the upper bound.
+    
+    Args:
+        results_db: ResultsDB holding the earlier runs
+        at_percentile: Percentile of correct responses' lengths, e.g. 99
+        max_tokens: The configured --max-tokens
+        min_responses: Correct responses needed to learn anything
+        headroom: Factor the percentile is multiplied by
+    
+    Returns:
+        tuple: (max_tokens, number of correct responses learned from);
+        the configured max_tokens if there are fewer than min_responses
+    """
+    lengths = results_db.output_tokens(model, problem_class)
+    if len(lengths) < min_responses:
+        return max_tokens, len(lengths)
+    return min(max_tokens, math.ceil(percentile(lengths, at_percentile) * headroom)), len(lengths)
+
+
+def without_texts(result):
+    """Return a result without its prompt and response texts, which stay in the run log."""
+    result = {key: value for key, value in result.items() if key not in ("prompt", "full_response")}
+    if "samples" in result:
+        result["samples"] = [{key: value for key, value in sample.items() if key != "full_response"}
+                             for sample in result["samples"]]
+    return result
+
+def write_results_json(filename, output_data, results):
+    """Write the summary file, streaming results into its "results" array."""
+    with open(filename, 'w') as f:
+        # Reuse json's formatting for the summary fields, minus the closing brace
+        f.write(json.dumps(output_data, indent=2)[:-2] + ',\n  "results": [')
+        for n, result in enumerate(results):
+            f.write(",\n    " if n else "\n    ")
+            f.write(json.dumps(result, indent=2).replace("\n", "\n    "))
+        f.write("\n  ]\n}\n")
+
+
+def symbolic_candidate(result):
+    """
+    Return the answer of a result that the symbolic verifier should re-check, or None.
+    
+    Only single-sample results with a response that check() rejected or
+    could not parse are re-checked.
+    """
+    if result.get('is_correct') or 'samples' in result or result.get('full_response') is None:
+        return None
+    return extract_answer(result['full_response'])
+
+
+def apply_symbolic_verdict(result, answer, verdict, problem):
+    """Record a symbolic verdict on a result, marking it correct if the answer is equivalent."""
+    result['symbolic_check'] = verdict
+    if verdict == symbolic.EQUIVALENT:
+        result.pop('error', None)
+        result.update(extracted_answer=answer, correct_answer=problem.solve(), is_correct=True)
+
+
+def sampling_summary(num_correct, samples, temperature, accuracy):
+    """
+    Summarize a multi-sample run.
+    
+    Args:
+        num_correct: Correct samples per evaluated problem (0 for errors)
+        samples: Samples per problem
+        temperature: Sampling temperature
+        accuracy: Majority-vote accuracy of the run
+    
+    Returns:
+        dict: samples, temperature, pass_at_k (mean unbiased estimate per
+        k, keyed by k as a string) and majority_vote_accuracy
+    """
+    return {
+        "samples": samples,
+        "temperature": temperature,
+        "pass_at_k": {
+            str(k): sum(pass_at_k(samples, c, k) for c in num_correct) / len(num_correct) if num_correct else 0
+            for k in pass_at_k_values(samples)
+        },
+        "majority_vote_accuracy": accuracy
+    }
+
+
+class ModelRun:
+    """The per-model state of an evaluation: its log, scheduler and running totals."""
+    
+    def __init__(self, model, run_info, log_filename, scheduler, header=None, coalescer=None, hedger=None, results_db=None,
+                 cache=None, verifier=None):
+        """
+        Args:
+            model: Model name
+            run_info: Run configuration written to the log header, including
+                samples and temperature
+            log_filename: Run log, appended to if it already exists
+            scheduler: RequestScheduler limiting this model's requests
+            header: Log header for a new log, or None when resuming
+            coalescer: RequestCoalescer sharing identical requests, or None
+            hedger: RequestHedger for slow requests, or None
+            results_db: ResultsDB that results are also written to, or None
+            cache: ResponseCache shared by the models, or None
+            verifier: SymbolicVerifier shared by the models, or None
+        """
+        self.model = model
+        self.run_info = run_info
+        self.log_filename = log_filename
+        self.scheduler = scheduler
+        self.coalescer = coalescer
+        self.hedger = hedger
+        # The cache and verifier are shared, but each model reports its own counts
+        self.cache = CountedCache(cache) if cache else None
+        self.symbolic_stats = symbolic.new_stats() if verifier else None
+        
+        # Results already in the log are not evaluated again. Failed results
+        # are retried; a later record for the same problem_index supersedes them
+        self.finished = set()
+        self.correct_count = 0
+        self.num_correct = []  # Correct samples per problem, for pass@k
+        self.timings = TimingCollector()
+        self.usage = UsageCounter(run_info.get('price'))
+        self.aborted = {}  # Watchdog abort reason -> results
+        if header is None:
+            for result in read_results(log_filename, responses=False):
+                # Failed and aborted responses were paid for too
+                self.usage.add(result.get('metrics'))
+                if result.get('aborted'):
+                    self.aborted[result['aborted']] = self.aborted.get(result['aborted'], 0) + 1
+                if "error" not in result:
+                    self.finished.add(result['problem_index'])
+                    self.timings.add(result.get('metrics'))
+                    self.num_correct.append(result.get('num_correct', 0))
+                    if result['is_correct']:
+                        self.correct_count += 1
+        self.completed = len(self.finished)
+        # Throughput counts only what this invocation generated
+        self.started = time.perf_counter()
+        self.resumed_usage = self.usage.summary()
+        
+        # Each result is appended to the log as soon as it completes, so an
+        # interrupted run loses nothing and memory stays flat
+        self.run_log = RunLogWriter(log_filename, header=header)
+        self.results_db = results_db
+        if results_db:
+            self.run_id = results_db.add_run(log_filename, header or read_header(log_filename))
+        
+        self.futures = set()
+        # Indices of the problems not yet fed to the executor
+        self.pending = None
+        # Set to close this model's streamed responses in flight
+        self.cancelled = threading.Event()
+        self.early_stop = None
+        self.budget_stop = None
+        self.task = None
+        
+        # Create results table
+        from rich.table import Table
+        self.table = Table(title="Evaluation Results", show_header=True, header_style="bold magenta")
+        self.table.add_column("#", style="dim", width=4)
+        self.table.add_column("Problem", min_width=30)
+        self.table.add_column("Model Answer", min_width=15)
+        self.table.add_column("Correct Answer", min_width=15)
+        self.table.add_column("Status", justify="center", min_width=10)
+    
+    def record(self, result):
+        """Count a finished result and append it to the log."""
+        self.completed += 1
+        self.num_correct.append(result.get('num_correct', 0))
+        self.usage.add(result.get('metrics'))
+        if result.get('aborted'):
+            self.aborted[result['aborted']] = self.aborted.get(result['aborted'], 0) + 1
+        if "error" not in result:
+            if result['is_correct']:
+                self.correct_count += 1
+            self.timings.add(result.get('metrics'))
+        self.run_log.write_result(result)
+        if self.results_db:
+            self.results_db.add_result(self.run_id, result)
+    
+    def check_stop(self, width, total):
+        """
+        Stop this model once the Wilson interval on its accuracy is narrower than width.
+        
+        Errors count as incorrect, as they do in the accuracy. Queued
+        requests are cancelled, retrying ones raise RequestCancelled and
+        streamed ones are closed; the few other requests already on the
+        wire finish in the background and only fill the cache.
+        
+        Returns:
+            bool: True if the model has stopped
+        """
+        if self.completed >= total:
+            return False
+        low, high = wilson_interval(self.correct_count, self.completed)
+        if high - low >= width:
+            return False
+        self.early_stop = {
+            "evaluated": self.completed,
+            "correct_count": self.correct_count,
+            "interval": [low, high],
+            "width": high - low,
+            "target_width": width
+        }
+        self.cancel()
+        return True
+    
+    def cancel(self, drain=False):
+        """
+        Send no more requests: queued problems are dropped and retries give up.
+        
+        Args:
+            drain: Let the requests in flight finish; otherwise streamed
+                responses are closed and their problems left for --resume
+        """
+        self.scheduler.cancel()
+        if not drain:
+            self.cancelled.set()
+        for future in self.futures:
+            future.cancel()
+    
+    def usage_summary(self):
+        """Return the token usage of the run, with this invocation's wall time and throughput."""
+        usage = self.usage.summary()
+        wall_time = time.perf_counter() - self.started
+        new_tokens = usage['total_tokens'] - self.resumed_usage['total_tokens']
+        new_output_tokens = usage['output_tokens'] - self.resumed_usage['output_tokens']
+        usage['wall_time'] = wall_time
+        usage['tokens_per_sec'] = new_tokens / wall_time if wall_time > 0 else None
+        usage['output_tokens_per_sec'] = new_output_tokens / wall_time if wall_time > 0 else None
+        return usage
+    
+    def summary(self, total):
+        """Return the run summary over the problems actually evaluated."""
+        if self.early_stop:
+            total_problems = self.early_stop['evaluated']
+        elif self.budget_stop:
+            total_problems = self.completed
+        else:
+            total_problems = total
+        summary = {
+            "correct_count": self.correct_count,
+            "total_problems": total_problems,
+            "accuracy": self.correct_count / total_problems if total_problems > 0 else 0,
+            "request_stats": self.scheduler.stats,
+            "cache_stats": self.cache.stats if self.cache else None,
+            "timing_stats": self.timings.summary(),
+            "usage": self.usage_summary()
+        }
+        if self.symbolic_stats:
+            summary['symbolic_stats'] = self.symbolic_stats
+        if self.coalescer:
+            summary['dedup_stats'] = self.coalescer.stats
+        if self.hedger:
+            summary['hedge_stats'] = {**self.hedger.stats, "percentile": self.hedger.percentile, "budget": self.hedger.budget}
+        if self.early_stop:
+            summary['early_stop'] = {**self.early_stop, "planned": total}
+        if self.budget_stop:
+            summary['budget_stop'] = {**self.budget_stop, "evaluated": self.completed, "planned": total}
+        if self.aborted:
+            summary['aborted'] = self.aborted
+        if self.run_info.get('samples', 1) > 1:
+            summary['sampling'] = sampling_summary(self.num_correct, self.run_info['samples'],
+                                                   self.run_info['temperature'], summary['accuracy'])
+        return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Evaluate mathematical problems using OpenRouter')
+    parser.add_argument('--model', nargs='+', default=['deepseek/deepseek-v3-base:free'], help='Model(s) to use; several models are evaluated on the same problems and compared')
+    parser.add_argument('--base-url', help=f'OpenAI-compatible API base URL, e.g. http://127.0.0.1:8000/v1 for mock_server.py (default: {OPENROUTER_BASE_URL}, or the endpoint of the --resume log)')
+    parser.add_argument('--class', default='IntegerQuadraticProblem', help='Problem class name to use (see --list-classes), or module:Class')
+    parser.add_argument('--list-classes', action='store_true', help='List the available problem classes, including plugins, and exit')
+    parser.add_argument('--dry-run', action='store_true', help="Check the arguments and print the run's plan and an example prompt, then exit without sending requests or writing files")
+    parser.add_argument('--num-problems', type=int, default=10, help='Number of problems to evaluate')
+    parser.add_argument('--output', default='results.json', help='Output file for results')
+    parser.add_argument('--prompt-file', help='File containing custom prompt template')
+    parser.add_argument('--verbose', action='store_true', help='Show full model responses')
+    parser.add_argument('--pdf', action='store_true', help='Compile and open PDF report')
+    parser.add_argument('--report-chunk-size', type=int, metavar='N', help='Split the LaTeX report into standalone parts of N problems that compile in parallel and are rebuilt only when changed')
+    parser.add_argument('--max-tokens', type=int, default=4000, help='Maximum tokens for model response')
+    parser.add_argument('--learn-max-tokens', type=float, metavar='PERCENTILE', help="Lower --max-tokens to this percentile, e.g. 99, of the lengths of the model's correct responses to the class in earlier runs, plus 25%% headroom")
+    parser.add_argument('--abort-repetition', action='store_true', help='With --stream, abort a response that keeps repeating itself')
+    parser.add_argument('--max-think-tokens', type=int, metavar='N', help='With --stream, abort a response whose <think> block is still open after N tokens')
+    parser.add_argument('--concurrency', type=int, default=1, help='Maximum number of completions to keep in flight at once, per model')
+    parser.add_argument('--max-retries', type=int, default=6, help='Retries for throttled or transient API errors')
+    parser.add_argument('--cache', action=argparse.BooleanOptionalAction, default=True, help='Reuse completions from the on-disk response cache')
+    parser.add_argument('--refresh', action='store_true', help='Ignore cached completions but store the new ones')
+    parser.add_argument('--cache-size', type=int, default=1024, help='Response cache size cap in MB')
+    parser.add_argument('--results-db', action=argparse.BooleanOptionalAction, default=True, help='Also record results in logs/results.sqlite3 for the stats and query commands')
+    parser.add_argument('--dedup', action=argparse.BooleanOptionalAction, help='Send identical prompts once and share the response (default: on at temperature 0); --no-dedup samples every problem separately')
+    parser.add_argument('--hedge', type=float, metavar='PERCENTILE', help='Send a backup copy of a request that runs longer than this percentile of recent latencies, e.g. 95, and keep the first response')
+    parser.add_argument('--hedge-budget', type=float, default=0.05, metavar='FRACTION', help='Maximum backup requests as a fraction of requests')
+    parser.add_argument('--batch-size', type=int, default=1, help='Prompts per completions request; falls back to single prompts if the endpoint rejects lists')
+    parser.add_argument('--stream', action='store_true', help='Stream completions and record time-to-first-token and tokens/sec')
+    parser.add_argument('--seed', type=int, help='Random seed for the problem set; the same seed gives the same problems')
+    parser.add_argument('--shard', type=parse_shard, metavar='I/N', help='Evaluate only shard I of N (0 <= I < N) of the seeded problem set')
+    parser.add_argument('--resume', metavar='LOG', help='Resume an interrupted run from its logs/fubench_run_*.jsonl log')
+    parser.add_argument('--samples', type=int, default=1, metavar='K', help='Responses to sample per problem, for pass@k and majority-vote accuracy')
+    parser.add_argument('--temperature', type=float, default=0.0, help='Sampling temperature')
+    parser.add_argument('--symbolic', action='store_true', help='Re-check answers that check() rejects for mathematical equivalence with SymPy')
+    parser.add_argument('--symbolic-timeout', type=float, default=5.0, help='Seconds allowed per symbolic check')
+    parser.add_argument('--symbolic-jobs', type=int, help='Processes for symbolic checks (default: CPU count)')
+    parser.add_argument('--profile', action='store_true', help='Time each phase and write a Chrome trace and a text summary next to the run log')
+    parser.add_argument('--until-ci', type=float, metavar='WIDTH', help='Stop once the 95%% Wilson interval on accuracy is narrower than WIDTH, e.g. 0.1')
+    parser.add_argument('--price', type=float, nargs=2, metavar=('PROMPT', 'OUTPUT'), help='USD per million prompt and output tokens, to report the cost of the run')
+    parser.add_argument('--max-total-tokens', type=int, metavar='N', help='Stop sending requests before prompt plus output tokens reach N, and finish with the results so far')
+    parser.add_argument('--max-cost', type=float, metavar='USD', help='Stop sending requests before the cost reaches USD; needs --price')
+    parser.add_argument('--max-wall-time', type=float, metavar='SECONDS', help='Stop sending requests in time to finish within SECONDS')
+    
+    args = parser.parse_args()
+    
+    if args.list_classes:
+        registry.print_classes()
+        return
+    
+    console = LazyConsole()
+    
+    if args.profile:
+        profiler.enable()
+    
+    if args.concurrency < 1:
+        console.print("[bold red]Error:[/bold red] --concurrency must be at least 1")
+        return
+    
+    if args.batch_size < 1:
+        console.print("[bold red]Error:[/bold red] --batch-size must be at least 1")
+        return
+    
+    if args.batch_size > 1 and args.stream:
+        console.print("[bold red]Error:[/bold red] --batch-size cannot be combined with --stream")
+        return
+    
+    if args.samples < 1:
+        console.print("[bold red]Error:[/bold red] --samples must be at least 1")
+        return
+    if args.samples > 1 and (args.batch_size > 1 or args.stream):
+        console.print("[bold red]Error:[/bold red] --samples cannot be combined with --batch-size or --stream")
+        return
+    if args.samples > 1 and args.temperature == 0:
+        console.print("[yellow]Warning: at --temperature 0 all samples will be the same; pass e.g. --temperature 0.7[/yellow]")
+    
+    if args.hedge is not None:
+        if not 0 < args.hedge < 100:
+            console.print("[bold red]Error:[/bold red] --hedge must be a percentile between 0 and 100")
+            return
+        if args.hedge_budget < 0:
+            console.print("[bold red]Error:[/bold red] --hedge-budget cannot be negative")
+            return
+        if args.samples > 1:
+            console.print("[bold red]Error:[/bold red] --hedge cannot be combined with --samples")
+            return
+    
+    if args.symbolic and not symbolic.available():
+        console.print("[bold red]Error:[/bold red] --symbolic needs SymPy and its LaTeX parser")
+        console.print("Install them with: [cyan]pip install sympy antlr4-python3-runtime==4.11[/cyan]")
+        return
+    
+    if (args.abort_repetition or args.max_think_tokens is not None) and not args.stream:
+        console.print("[bold red]Error:[/bold red] --abort-repetition and --max-think-tokens need --stream")
+        return
+    if args.max_think_tokens is not None and args.max_think_tokens < 1:
+        console.print("[bold red]Error:[/bold red] --max-think-tokens must be at least 1")
+        return
+    if args.learn_max_tokens is not None and not 0 < args.learn_max_tokens <= 100:
+        console.print("[bold red]Error:[/bold red] --learn-max-tokens must be a percentile between 0 and 100")
+        return
+    
+    if args.until_ci is not None and not 0 < args.until_ci < 1:
+        console.print("[bold red]Error:[/bold red] --until-ci must be between 0 and 1")
+        return
+    
+    for name in ('max_total_tokens', 'max_cost', 'max_wall_time'):
+        if getattr(args, name) is not None and getattr(args, name) <= 0:
+            console.print(f"[bold red]Error:[/bold red] --{name.replace('_', '-')} must be positive")
+            return
+    if args.price and min(args.price) < 0:
+        console.print("[bold red]Error:[/bold red] --price cannot be negative")
+        return
+    
+    if args.shard and args.seed is None and not args.resume:
+        console.print("[bold red]Error:[/bold red] --shard needs --seed so every shard gets the same problem set")
+        return
+    
+    models = args.model
+    if len(set(models)) < len(models):
+        console.print("[bold red]Error:[/bold red] --model lists a model more than once")
+        return
+    if args.resume and len(models) > 1:
+        console.print("[bold red]Error:[/bold red] --resume continues one model's log; resume each model's log separately")
+        return
+    
+    if args.resume:
+        # Continue an interrupted run with its original problems and settings
+        try:
+            header = read_header(args.resume)
+        except (OSError, ValueError) as e:
+            console.print(f"[bold red]Error:[/bold red] Cannot resume from '{args.resume}': {e}")
+            return
+        run_info = header['run_info']
+        models = [run_info['model']]
+        args.__dict__['class'] = run_info['problem_class']
+        args.max_tokens = run_info['max_tokens']
+        args.temperature = run_info['temperature']
+        args.samples = run_info.get('samples', 1)
+        args.shard = run_info.get('shard')
+        args.price = args.price or run_info.get('price')
+        # The rest of the run goes to the same endpoint, and caches against it
+        logged_url = run_info.get('base_url', OPENROUTER_BASE_URL)
+        if args.base_url is not None and args.base_url.rstrip("/") != logged_url.rstrip("/"):
+            console.print(f"[bold red]Error:[/bold red] --base-url {args.base_url} differs from the endpoint "
+                          f"'{args.resume}' was run against, {logged_url}")
+            return
+        args.base_url = logged_url
+        prompt_template = run_info['prompt_template']
+        timestamp = run_info['timestamp']
+    else:
+        # Load custom prompt if provided
+        prompt_template = DEFAULT_PROMPT
+        if args.prompt_file:
+            with open(args.prompt_file, 'r') as f:
+                prompt_template = f.read()
+        
+        # Create log filename with timestamp
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        args.base_url = args.base_url or OPENROUTER_BASE_URL
+    
+    # Check for API key
+    if args.base_url == OPENROUTER_BASE_URL and not os.getenv("OPENROUTER_API_KEY") and not args.dry_run:
+        console.print("[bold red]Error:[/bold red] OPENROUTER_API_KEY environment variable not set")
+        console.print("Please set it with: [cyan]export OPENROUTER_API_KEY='your-api-key'[/cyan]")
+        return
+    shard_suffix = f"_shard{args.shard[0]}of{args.shard[1]}" if args.shard else ""
+    # Runs started in the same second, such as the tasks of a job array,
+    # must not write to the same files
+    run_suffix = f"_{args.__dict__['class']}{shard_suffix}_{os.urandom(4).hex()}"
+    
+    if args.max_cost is not None and not args.price:
+        console.print("[bold red]Error:[/bold red] --max-cost needs --price to know what tokens cost")
+        return
+    
+    # Get problem class
+    try:
+        ProblemClass = registry.resolve(args.__dict__['class'])
+    except registry.UnknownProblemClass as e:
+        console.print(f"[bold red]Error:[/bold red] {e}")
+        return
+    
+    # Problems of a new run are generated after the dry run, which only needs their number
+    if args.resume:
+        problems_to_evaluate = ParamsProblemSet(ProblemClass, header['problems'])
+        num_problems = len(problems_to_evaluate)
+    else:
+        num_problems = args.num_problems
+    
+    # This shard's problems, by index into the whole problem set
+    if args.shard:
+        shard_indices = range(args.shard[0], num_problems, args.shard[1])
+    else:
+        shard_indices = range(num_problems)
+    
+    # The run's plan: (label, value, rich style, note)
+    plan = [
+        (f"Model{'s' if len(models) > 1 else ''}", ', '.join(models), "yellow", ""),
+        ("Problem Class", args.__dict__['class'], "magenta", ""),
+        ("Problems", len(shard_indices), "green",
+         f" (shard {args.shard[0]} of {args.shard[1]}, {num_problems} in total)" if args.shard else ""),
+        ("Concurrency", args.concurrency, "green", " per model" if len(models) > 1 else "")
+    ]
+    if args.samples > 1:
+        plan.append(("Samples", args.samples, "green", f" per problem at temperature {args.temperature}"))
+    if args.base_url != OPENROUTER_BASE_URL:
+        plan.append(("Endpoint", args.base_url, "yellow", ""))
+    plan.append(("Type", "Base model (completions API)", None, ""))
+    
+    if args.dry_run:
+        # Plain print, and no problem set: a dry run imports neither rich nor NumPy
+        print("FuBench dry run")
+        for label, value, _, note in plan:
+            print(f"{label}: {value}{note}")
+        if args.resume:
+            for i in shard_indices[:3]:
+                print(f"\nPrompt {i + 1}:")
+                print(prompt_template.format(problem=problems_to_evaluate[i].prompt()))
+        else:
+            # The run draws its problems from the seed when it starts
+            print("\nExample prompt:")
+            print(prompt_template.format(problem=ProblemClass().prompt()))
+        print(f"\nDry run: {len(shard_indices)} problems planned; no requests sent")
+        return
+    
+    # Get problems, once for every model so that results pair up by problem
+    if not args.resume:
+        # Every run is seeded, so any run can be reproduced from its log
+        seed = args.seed if args.seed is not None else random.randrange(2**32)
+        with profiler.span("generate", num_problems=args.num_problems):
+            problems_to_evaluate = make_problem_set(ProblemClass, args.num_problems, seed)
+            # Computed as the header is written and hashed, not held in a list
+            problem_params = ProblemParams(problems_to_evaluate)
+        if args.shard and hasattr(ProblemClass, 'batch') and not isinstance(problems_to_evaluate, ProblemSet):
+            # Shards on machines with NumPy would get other problems
+            console.print(f"[bold red]Error:[/bold red] --shard with {ProblemClass.__name__} needs NumPy (pip install numpy), "
+                          f"so every shard generates the same problem set")
+            return
+        
+        run_info = {
+            "timestamp": timestamp,
+            "problem_class": args.__dict__['class'],
+            "num_problems": len(problems_to_evaluate),
+            "prompt_template": prompt_template,
+            "max_tokens": args.max_tokens,
+            "temperature": args.temperature,
+            "samples": args.samples,
+            "base_url": args.base_url,
+            "seed": seed,
+            # The same seed gives other problems with and without NumPy
+            "generator": "numpy" if isinstance(problems_to_evaluate, ProblemSet) else "random",
+            "shard": args.shard,
+            "price": args.price,
+            # Lets merge check that shards really share one problem set
+            "problem_set_hash": problem_set_hash(problem_params)
+        }
+        if len(models) > 1:
+            run_info['compared_models'] = models
+    
+    console = console.get()
+    
+    # Display header
+    from rich.panel import Panel
+    header_lines = ["[bold cyan]Mathematical Problem Evaluation[/bold cyan]"]
+    for label, value, style, note in plan:
+        header_lines.append(f"{label}: [{style}]{value}[/{style}]{note}" if style else f"{label}: {value}{note}")
+    console.print(Panel.fit(
+        "\n".join(header_lines),
+        title="[bold]FuBench[/bold]",
+        border_style="blue"
+    ))
+    
+    # One client, and so one connection pool, for every model
+    global client
+    client = make_client(args.base_url)
+    
+    # Create logs directory if it doesn't exist
+    logs_dir = Path("logs")
+    logs_dir.mkdir(exist_ok=True)
+    
+    # Reuse completions we have already paid for, from this endpoint only
+    cache = None
+    if args.cache:
+        cache = ResponseCache(logs_dir / "cache.sqlite3", max_bytes=args.cache_size * 1024 * 1024, refresh=args.refresh,
+                              endpoint=None if args.base_url == OPENROUTER_BASE_URL else args.base_url.rstrip("/"))
+    
+    # Second opinion on answers the class's check() rejects
+    verifier = None
+    if args.symbolic:
+        verifier = symbolic.SymbolicVerifier(jobs=args.symbolic_jobs, timeout=args.symbolic_timeout)
+    
+    # One log per model. Each model has its own scheduler, which retries
+    # throttled requests and adapts that model's in-flight limit to its
+    # provider, so a slow or throttled model does not hold back the others
+    results_db = ResultsDB(logs_dir / "results.sqlite3") if args.results_db else None
+    # Budgets are learned from earlier runs, which the database may hold even with --no-results-db
+    learning_db = None
+    if args.learn_max_tokens is not None and not args.resume:
+        learning_db = results_db or ResultsDB(logs_dir / "results.sqlite3")
+    runs = []
+    for model in models:
+        scheduler = RequestScheduler(max_concurrency=args.concurrency, max_retries=args.max_retries)
+        # Identical prompts at temperature above 0 are samples, not repeats
+        coalescer = RequestCoalescer() if (args.temperature == 0 if args.dedup is None else args.dedup) else None
+        hedger = RequestHedger(percentile=args.hedge, budget=args.hedge_budget,
+                               max_workers=2 * args.concurrency) if args.hedge is not None else None
+        if args.resume:
+            runs.append(ModelRun(model, run_info, Path(args.resume), scheduler, coalescer=coalescer, hedger=hedger, results_db=results_db,
+                                 cache=cache, verifier=verifier))
+            console.print(f"[dim]Resuming: {len(runs[-1].finished)} of {len(shard_indices)} problems already finished[/dim]")
+        else:
+            log_filename = logs_dir / f"fubench_run_{timestamp}_{model.replace('/', '_')}{run_suffix}.jsonl"
+            model_run_info = {**run_info, "model": model}
+            if learning_db:
+                model_run_info['max_tokens'], responses = learn_max_tokens(
+                    learning_db, model, run_info['problem_class'], args.learn_max_tokens, args.max_tokens)
+                model_run_info['learned_max_tokens'] = {"percentile": args.learn_max_tokens, "responses": responses,
+                                                        "configured": args.max_tokens}
+                console.print(f"[dim]Max tokens for {model}: {model_run_info['max_tokens']}" + (
+                    f", learned from {responses} correct responses in earlier runs[/dim]" if model_run_info['max_tokens'] < args.max_tokens
+                    else f"; {responses} correct responses in earlier runs give no lower budget[/dim]"))
+            runs.append(ModelRun(model, model_run_info, log_filename, scheduler, header={
+                "run_info": model_run_info,
+                "problems": problem_params
+            }, coalescer=coalescer, hedger=hedger, results_db=results_db, cache=cache, verifier=verifier))
+    
+    # Token, cost and wall-time limits apply to all models together
+    governor = None
+    if args.max_total_tokens or args.max_cost or args.max_wall_time:
+        governor = BudgetGovernor(max_total_tokens=args.max_total_tokens, max_cost=args.max_cost,
+                                  max_wall_time=args.max_wall_time, prices=args.price,
+                                  batch_size=args.batch_size)
+    
+    if learning_db and learning_db is not results_db:
+        learning_db.close()
+    
+    # Each streamed response gets its own watchdog
+    watchdog = None
+    if args.abort_repetition or args.max_think_tokens is not None:
+        watchdog = functools.partial(StreamWatchdog, repetition=args.abort_repetition, max_think_tokens=args.max_think_tokens)
+    
+    # Each model gets its own threads, so a slow model's requests cannot
+    # hold the threads another model's requests are queued for
+    for run in runs:
+        run.executor = ThreadPoolExecutor(max_workers=args.concurrency)
+    interrupted = False
+    abandoned = False
+    try:
+        from rich.progress import BarColumn, Progress, SpinnerColumn, TaskProgressColumn, TextColumn
+        with Progress(
+            SpinnerColumn(),
+            TextColumn("[progress.description]{task.description}"),
+            BarColumn(),
+            TaskProgressColumn(),
+            console=console
+        ) as progress:
+            for run in runs:
+                run.task = progress.add_task(f"[cyan]{run.model}" if len(runs) > 1 else "[cyan]Evaluating problems...",
+                                             total=len(shard_indices), completed=run.completed)
+            
+            # Keep up to --concurrency requests per model in flight at
+            # once, each carrying up to --batch-size prompts. Each model's
+            # executor is fed a window of batches at a time, and problems
+            # are built in the worker, so only the problems being evaluated
+            # are held in memory
+            futures = {}
+            deadline = governor.deadline() if governor else None
+            # With a budget, batches queued behind the ones in flight would count against it too
+            window = args.concurrency if governor else 2 * args.concurrency
+            
+            def evaluate(run, indices):
+                problems = [problems_to_evaluate[i] for i in indices]
+                results = evaluate_batch(problems, model=run.model, prompt_template=prompt_template, max_tokens=run.run_info['max_tokens'], scheduler=run.scheduler, cache=run.cache, stream=args.stream, temperature=args.temperature, samples=args.samples, coalescer=run.coalescer, hedger=run.hedger, watchdog=watchdog, cancelled=run.cancelled, deadline=deadline)
+                return list(zip(indices, problems, results))
+            
+            def outstanding():
+                """Requests queued or in flight, for every model, whose results are not recorded yet."""
+                return sum(task[0] == "request" for task in futures.values())
+            
+            def feed(run):
+                if run.early_stop or run.budget_stop or run.cancelled.is_set():
+                    return
+                room = window - sum(futures[future][0] == "request" for future in run.futures)
+                if governor and governor.estimating():
+                    # With a budget, one request goes first so the others can be estimated
+                    room = 0 if outstanding() else 1
+                for _ in range(room):
+                    indices = list(itertools.islice(run.pending, args.batch_size))
+                    if not indices:
+                        break
+                    # With a budget, queue a batch only if it fits with everything already queued
+                    if governor and governor.check(outstanding() + 1):
+                        break
+                    future = run.executor.submit(evaluate, run, indices)
+                    futures[future] = ("request", run, indices)
+                    run.futures.add(future)
+            
+            for run in runs:
+                run.pending = (i for i in shard_indices if i + 1 not in run.finished)
+                feed(run)
+            
+            def finish(run, i, problem, result):
+                with profiler.span("log_write", problem_index=i + 1):
+                    run.record(result)
+                with profiler.span("render", problem_index=i + 1):
+                    show_result(console, run.table, problem, result, verbose=args.verbose,
+                                model=run.model if len(runs) > 1 else None)
+                    progress.update(run.task, advance=1, description=(
+                        f"[cyan]{run.model}: {run.completed}/{len(shard_indices)}" if len(runs) > 1
+                        else f"[cyan]Problem {run.completed}/{len(shard_indices)}"))
+            
+            # Symbolic checks are added to the futures as results come in,
+            # so wait on the set as it changes rather than a fixed list. With
+            # a wall-time limit, wake up at least once a second to check it
+            while futures:
+                done, _ = wait(futures, timeout=1.0 if args.max_wall_time else None, return_when=FIRST_COMPLETED)
+                for future in done:
+                    task = futures.pop(future)
+                    run = task[1]
+                    run.futures.discard(future)
+                    if run.early_stop or future.cancelled():
+                        continue  # Cancelled, or finished after the model stopped
+                    
+                    if task[0] == "verify":
+                        _, _, i, problem, result, answer, submitted = task
+                        # Queueing plus checking time in the verifier's processes
+                        profiler.record("symbolic", submitted, time.perf_counter() - submitted, problem_index=i + 1)
+                        try:
+                            apply_symbolic_verdict(result, answer, future.result(), problem)
+                        except Exception as e:
+                            result['symbolic_check'] = f"error: {e}"
+                        finish(run, i, problem, result)
+                    else:
+                        for i, problem, result in future.result():
+                            if result.get('cancelled'):
+                                continue  # Never sent; left for --resume
+                            if governor:
+                                # Spent now, even if a symbolic check still has to grade it
+                                governor.add(result.get('metrics'))
+                            # Add timestamp and index to result
+                            result['timestamp'] = datetime.now().isoformat()
+                            result['problem_index'] = i + 1
+                            answer = symbolic_candidate(result) if verifier else None
+                            if answer is not None:
+                                # Grade in the verifier's processes; record the result when it is done
+                                check = verifier.submit(answer, problem.solve(), stats=run.symbolic_stats)
+                                futures[check] = ("verify", run, i, problem, result, answer, time.perf_counter())
+                                run.futures.add(check)
+                            else:
+                                finish(run, i, problem, result)
+                    
+                    if args.until_ci is not None:
+                        run.check_stop(args.until_ci, len(shard_indices))
+                
+                if governor and not governor.stopped:
+                    # Estimates grow as results come in; stop if what is
+                    # already queued would now reach a limit
+                    governor.check(outstanding())
+                elif governor and governor.overrun():
+                    abandoned = True
+                    # Out of time; close streams still open and leave the
+                    # rest to --resume. Other requests time out at the deadline
+                    for r in runs:
+                        r.cancelled.set()
+                    break
+                
+                for run in runs:
+                    feed(run)
+                
+                if governor and governor.stopped and not any(r.budget_stop for r in runs):
+                    # Stop sending before a limit is reached; what is in
+                    # flight still finishes and is recorded
+                    console.print(f"[yellow]Reached --{governor.stopped['reason'].replace('_', '-')}: "
+                                  f"finishing the {sum(r.scheduler.in_flight for r in runs)} requests in flight[/yellow]")
+                    for r in runs:
+                        r.budget_stop = governor.stopped
+                        r.cancel(drain=True)
+                
+                # Stopped models may still have requests on the wire; don't wait for them
+                if not any(r.futures for r in runs if not r.early_stop):
+                    break
+    except KeyboardInterrupt:
+        interrupted = True
+    finally:
+        # On Ctrl-C or an early stop, drop queued problems instead of
+        # waiting for them
+        stopped = interrupted or abandoned or any(run.early_stop for run in runs)
+        for run in runs:
+            run.executor.shutdown(wait=not stopped, cancel_futures=True)
+        if verifier:
+            verifier.close()
+        for run in runs:
+            if run.hedger:
+                run.hedger.close()
+    
+    if governor and governor.stopped:
+        # What the drained requests added on top of the spend at the stop
+        for run in runs:
+            run.budget_stop = {**governor.stopped, "spent": governor.spent(), "abandoned": abandoned}
+    
+    if interrupted:
+        for run in runs:
+            run.run_log.close()
+        if results_db:
+            results_db.close()
+        console.print(f"\n[yellow]Interrupted.[/yellow] Finished results are saved in:")
+        for run in runs:
+            console.print(f"  [cyan]{run.log_filename}[/cyan]")
+        console.print(f"Resume with: [cyan]python fubench.py --resume {runs[0].log_filename}[/cyan]"
+                      + (" (once per log)" if len(runs) > 1 else ""))
+        if args.profile:
+            write_profile(console, logs_dir / f"fubench_profile_{timestamp}{run_suffix}")
+        return
+    
+    summaries = []
+    for run in runs:
+        # Show results table
+        console.print("\n")
+        if len(runs) > 1:
+            run.table.title = f"Evaluation Results: {run.model}"
+        with profiler.span("render"):
+            console.print(run.table)
+        
+        summary = run.summary(len(shard_indices))
+        if len(runs) > 1:
+            console.print(f"\n[bold]{run.model}[/bold]")
+        print_summary(console, summary)
+        summaries.append(summary)
+        
+        # Close the log with the run summary
+        run.run_log.write_summary(summary)
+        run.run_log.close()
+        if results_db:
+            results_db.set_summary(run.run_id, summary)
+    if results_db:
+        results_db.close()
+    
+    for run, summary in zip(runs, summaries):
+        run_args = argparse.Namespace(**{**vars(args), "model": run.model})
+        if len(runs) > 1:
+            # Per-model results next to the combined comparison
+            output = Path(args.output)
+            run_args.output = str(output.with_name(f"{output.stem}_{run.model.replace('/', '_')}{output.suffix}"))
+        write_run_outputs(console, run_args, run.run_info, summary, run.log_filename)
+    
+    if len(runs) > 1:
+        write_comparison(console, args, runs, summaries, logs_dir / f"fubench_comparison_{timestamp}{run_suffix}.tex")
+    
+    if args.profile:
+        write_profile(console, logs_dir / f"fubench_profile_{timestamp}{run_suffix}")
+
+
+def write_profile(console, stem):
+    """Write the profiler's Chrome trace (<stem>.trace.json) and text summary (<stem>.txt)."""
+    wall_time = profiler.elapsed()
+    trace_filename = stem.with_name(stem.name + ".trace.json")
+    summary_filename = stem.with_name(stem.name + ".txt")
+    profiler.write_chrome_trace(trace_filename)
+    profiler.write_text_summary(summary_filename, wall_time)
+    console.print(f"[dim]Profile saved to[/dim] [cyan]{summary_filename}[/cyan] [dim]and[/dim] [cyan]{trace_filename}[/cyan] "
+                  f"[dim](open in https://ui.perfetto.dev)[/dim]")
+
+
+def compare_models(log_filenames):
+    """
+    Compare every pair of run logs head to head on the problems they share.
+    
+    Results are paired by problem_index. Problems where either model got
+    no response (an API error) are left out of that pair; a response that
+    cannot be parsed counts as incorrect. The exact McNemar test on the
+    pairs where only one model was correct says how likely a split at
+    least this uneven is if the two models were equally accurate.
+    
+    Returns:
+        list: One dict per pair of logs (in argument order) with the pair
+        indices, counts of both/first only/second only/neither correct,
+        the accuracy difference and the McNemar p-value
+    """
+    pairs = {pair: {"both": 0, "first_only": 0, "second_only": 0, "neither": 0}
+             for pair in itertools.combinations(range(len(log_filenames)), 2)}
+    for _, results in paired_results(log_filenames):
+        for (a, b), counts in pairs.items():
+            if any(results[n] is None or results[n].get('full_response') is None for n in (a, b)):
+                continue
+            key = {(True, True): "both", (True, False): "first_only",
+                   (False, True): "second_only", (False, False): "neither"}[(bool(results[a].get('is_correct')), bool(results[b].get('is_correct')))]
+            counts[key] += 1
+    
+    comparisons = []
+    for (a, b), counts in pairs.items():
+        n = sum(counts.values())
+        comparisons.append({
+            "pair": [a, b],
+            "pairs": n,
+            **counts,
+            "accuracy_difference": (counts['first_only'] - counts['second_only']) / n if n else 0,
+            "p_value": mcnemar_p(counts['first_only'], counts['second_only'])
+        })
+    return comparisons
+
+
+def paired_results(log_filenames):
+    """
+    Yield (problem_index, results) for every problem in any of the logs, in index order.
+    
+    results has one entry per log, None where that log has no result for
+    the problem. Each log is streamed, so only one problem is in memory.
+    """
+    def tagged(n, path):
+        for result in read_results(path):
+            yield result['problem_index'], n, result
+    
+    current, results = None, None
+    for index, n, result in heapq.merge(*(tagged(n, path) for n, path in enumerate(log_filenames)), key=lambda item: item[:2]):
+        if index != current:
+            if results is not None:
+                yield current, results
+            current, results = index, [None] * len(log_filenames)
+        results[n] = result
+    if results is not None:
+        yield current, results
+
+
+def write_comparison(console, args, runs, summaries, tex_filename):
+    """Print the model comparison tables and write the combined results and LaTeX report."""
+    from rich.table import Table
+    models = [run.model for run in runs]
+    log_filenames = [run.log_filename for run in runs]
+    
+    table = Table(title="Model Comparison", show_header=True, header_style="bold magenta")
+    table.add_column("Model", min_width=20)
+    table.add_column("Correct", justify="right")
+    table.add_column("Accuracy", justify="right")
+    table.add_column("95% CI", justify="right")
+    model_rows = []
+    for model, summary in zip(models, summaries):
+        low, high = wilson_interval(summary['correct_count'], summary['total_problems'])
+        table.add_row(model, f"{summary['correct_count']} / {summary['total_problems']}",
+                      f"{summary['accuracy']:.1%}", f"[{low:.1%}, {high:.1%}]")
+        model_rows.append({"model": model, "correct_count": summary['correct_count'],
+                           "total_problems": summary['total_problems'], "accuracy": summary['accuracy'],
+                           "interval": [low, high]})
+    console.print("\n")
+    console.print(table)
+    
+    comparisons = compare_models(log_filenames)
+    head_to_head = Table(title="Head-to-Head (paired by problem)", show_header=True, header_style="bold magenta")
+    head_to_head.add_column("Model A", min_width=20)
+    head_to_head.add_column("Model B", min_width=20)
+    head_to_head.add_column("Pairs", justify="right")
+    head_to_head.add_column("Only A", justify="right")
+    head_to_head.add_column("Only B", justify="right")
+    head_to_head.add_column("A - B", justify="right")
+    head_to_head.add_column("p (McNemar)", justify="right")
+    for comparison in comparisons:
+        a, b = comparison.pop('pair')
+        comparison['models'] = [models[a], models[b]]
+        color = "green" if comparison['p_value'] < 0.05 else "dim"
+        head_to_head.add_row(models[a], models[b], str(comparison['pairs']),
+                             str(comparison['first_only']), str(comparison['second_only']),
+                             f"{comparison['accuracy_difference']:+.1%}",
+                             f"[{color}]{comparison['p_value']:.3g}[/{color}]")
+    console.print(head_to_head)
+    
+    with open(args.output, 'w') as f:
+        json.dump({
+            "models": model_rows,
+            "comparisons": comparisons,
+            "logs": [str(path) for path in log_filenames]
+        }, f, indent=2)
+    
+    parts = generate_comparison_report(tex_filename, runs[0].run_info, model_rows, comparisons, log_filenames,
+                                       chunk_size=args.report_chunk_size)
+    console.print(f"\n[dim]Comparison saved to[/dim] [cyan]{args.output}[/cyan]")
+    console.print(f"[dim]Comparison report saved to[/dim] [cyan]{tex_filename}[/cyan]")
+    if args.pdf:
+        compile_pdf(console, tex_filename, verbose=args.verbose, parts=parts)
+
+
+def print_summary(console, summary):
+    """Display the summary panel for a finished run."""
+    from rich.panel import Panel
+    accuracy = summary['accuracy']
+    request_stats = summary['request_stats']
+    summary_color = "green" if accuracy >= 0.8 else "yellow" if accuracy >= 0.5 else "red"
+    summary_lines = [
+        f"[bold]Final Results[/bold]\n",
+        f"Correct: [{summary_color}]{summary['correct_count']}[/{summary_color}] / {summary['total_problems']}",
+        f"Accuracy: [{summary_color}]{accuracy:.1%}[/{summary_color}]"
+    ]
+    sampling = summary.get('sampling')
+    if sampling:
+        summary_lines[-1] += " (majority vote)"
+        summary_lines.append("  ".join(f"pass@{k}: {value:.1%}" for k, value in sampling['pass_at_k'].items()))
+    symbolic_stats = summary.get('symbolic_stats')
+    if symbolic_stats:
+        summary_lines.append(
+            f"Symbolic checks: {symbolic_stats['checks']} "
+            f"({symbolic_stats['equivalent']} equivalent, {symbolic_stats['timeout']} timed out, "
+            f"{symbolic_stats['memo_hits']} memoized)"
+        )
+    early_stop = summary.get('early_stop')
+    if early_stop:
+        low, high = early_stop['interval']
+        summary_lines.append(
+            f"Stopped early after {early_stop['evaluated']} of {early_stop['planned']} problems: "
+            f"95% CI [{low:.1%}, {high:.1%}] is narrower than {early_stop['target_width']:.1%}"
+        )
+    budget_stop = summary.get('budget_stop')
+    if budget_stop:
+        limit = f"${budget_stop['limit']:g}" if budget_stop['reason'] == "max_cost" else \
+            f"{budget_stop['limit']:g}s" if budget_stop['reason'] == "max_wall_time" else f"{budget_stop['limit']:,}"
+        summary_lines.append(
+            f"Stopped at --{budget_stop['reason'].replace('_', '-')} {limit} after {budget_stop['evaluated']} of {budget_stop['planned']} problems"
+            + (" (requests still in flight were abandoned)" if budget_stop['abandoned'] else "")
+        )
+    if request_stats:
+        summary_lines.append(
+            f"Requests: {request_stats['requests']} "
+            f"(retries: {request_stats['retries']}, throttled: {request_stats['throttles']}, "
+            f"lowest concurrency: {request_stats['min_limit']})"
+        )
+    if summary.get('cache_stats'):
+        summary_lines.append(f"Cache: {summary['cache_stats']['hits']} hits, {summary['cache_stats']['misses']} misses")
+    hedge_stats = summary.get('hedge_stats')
+    if hedge_stats:
+        threshold = f", last at {hedge_stats['threshold']:.2f}s" if hedge_stats['threshold'] else ""
+        summary_lines.append(
+            f"Hedged: {hedge_stats['hedges']} of {hedge_stats['requests']} requests past p{hedge_stats['percentile']:g}{threshold} "
+            f"(backup won {hedge_stats['wins']})"
+        )
+    dedup_stats = summary.get('dedup_stats')
+    if dedup_stats and dedup_stats['deduplicated']:
+        summary_lines.append(f"Deduplicated: {dedup_stats['deduplicated']} of {dedup_stats['deduplicated'] + dedup_stats['requests']} "
+                             f"problems reused an identical request")
+    aborted = summary.get('aborted')
+    if aborted:
+        summary_lines.append("Aborted by the watchdog: " + ", ".join(f"{count} {reason.replace('_', ' ')}" for reason, count in aborted.items()))
+    usage = summary.get('usage')
+    if usage and usage['total_tokens']:
+        line = (f"Tokens: {usage['total_tokens']:,.0f} ({usage['prompt_tokens']:,.0f} prompt, "
+                f"{usage['output_tokens']:,.0f} output)")
+        if usage.get('output_tokens_per_sec'):
+            line += f", {usage['output_tokens_per_sec']:,.1f} output tokens/sec over {usage['wall_time']:.1f}s"
+        if usage['cost'] is not None:
+            line += f", ${usage['cost']:.4f}"
+        summary_lines.append(line)
+    for name, label, unit in [("ttft", "Time to first token", "s"), ("latency", "Latency", "s"), ("tokens_per_sec", "Tokens/sec", "")]:
+        stats = summary['timing_stats'][name]
+        if stats:
+            summary_lines.append(f"{label} p50/p95/p99: {stats['p50']:.2f}{unit} / {stats['p95']:.2f}{unit} / {stats['p99']:.2f}{unit}")
+    console.print("\n")
+    console.print(Panel(
+        "\n".join(summary_lines),
+        title="[bold]Summary[/bold]",
+        border_style=summary_color
+    ))
+
+
+def report_filename(log_filename):
+    """Return the LaTeX report path that belongs to a run log."""
+    log_filename = Path(log_filename)
+    return log_filename.with_name(log_filename.name.replace("fubench_run_", "fubench_report_")).with_suffix(".tex")
+
+
+def write_run_outputs(console, args, run_info, summary, log_filename):
+    """Write results.json and the LaTeX report for a finished run log, and compile the PDF if requested."""
+    # Save summary results, reading the results back from the log in
+    # problem_index order
+    output_data = {
+        "model": run_info['model'],
+        "num_problems": summary['total_problems'],
+        "correct_count": summary['correct_count'],
+        "accuracy": summary['accuracy'],
+        "request_stats": summary['request_stats'],
+        "cache_stats": summary['cache_stats'],
+        "timing_stats": summary['timing_stats']
+    }
+    for key in ('early_stop', 'budget_stop', 'usage', 'aborted', 'sampling', 'symbolic_stats', 'dedup_stats', 'hedge_stats'):
+        if summary.get(key):
+            output_data[key] = summary[key]
+    with profiler.span("results_json"):
+        write_results_json(args.output, output_data,
+                           (without_texts(result) for result in read_results(log_filename, responses=False)))
+    
+    # Detailed log with all prompts and responses, for the report
+    log_data = {
+        "run_info": run_info,
+        "summary": summary,
+        "detailed_results": read_results(log_filename)
+    }
+    
+    # Generate LaTeX report
+    tex_filename = report_filename(log_filename)
+    with profiler.span("report"):
+        parts = generate_latex_report(tex_filename, log_data, args, chunk_size=args.report_chunk_size)
+    
+    console.print(f"\n[dim]Summary saved to[/dim] [cyan]{args.output}[/cyan]")
+    console.print(f"[dim]Detailed log saved to[/dim] [cyan]{log_filename}[/cyan]")
+    console.print(f"[dim]LaTeX report saved to[/dim] [cyan]{tex_filename}[/cyan]")
+    
+    # Compile and open PDF if requested
+    if args.pdf:
+        compile_pdf(console, tex_filename, verbose=args.verbose, parts=parts)
+
+
+def run_pdflatex(tex_filename):
+    """Run pdflatex once on a .tex file, from its own directory so relative \input paths resolve."""
+    import subprocess
+    with profiler.span("pdflatex", file=tex_filename.name):
+        return subprocess.run(
+            ['pdflatex', '-interaction=nonstopmode', tex_filename.name],
+            cwd=tex_filename.parent,
+            capture_output=True,
+            text=True
+        )
+
+
+def needs_rerun(tex_filename):
+    """Return True if the last pdflatex run asked for another pass to resolve references."""
+    log = tex_filename.with_suffix('.log')
+    if not log.exists():
+        return False
+    text = log.read_text(errors='replace')
+    return "Rerun to get" in text or "Label(s) may have changed" in text
+
+
+def compile_part(tex_filename):
+    """
+    Compile one part of a chunked report unless its PDF is up to date.
+    
+    Returns:
+        tuple: (compiled, result) where compiled is False if the PDF was
+        reused and result is the last pdflatex CompletedProcess or None
+    """
+    inputs = tex_filename.with_suffix('.inputs')
+    built = tex_filename.with_suffix('.built')
+    if (tex_filename.with_suffix('.pdf').exists() and built.exists()
+            and built.read_text() == inputs.read_text()):
+        return False, None
+    result = run_pdflatex(tex_filename)
+    if needs_rerun(tex_filename):
+        result = run_pdflatex(tex_filename)
+    if result.returncode == 0:
+        built.write_text(inputs.read_text())
+    return True, result
+
+
+def compile_pdf(console, tex_filename, verbose=False, parts=(), jobs=None):
+    """
+    Compile a LaTeX report with pdflatex and open the PDF.
+    
+    The parts of a chunked report are compiled first, in parallel, skipping
+    parts whose inputs have not changed since they were last built. The
+    main file is then compiled once, and again only if pdflatex reports
+    unresolved references.
+    
+    Args:
+        console: Rich console for progress messages
+        tex_filename: Main report .tex file
+        verbose: Show pdflatex errors
+        parts: Part .tex files returned by generate_latex_report()
+        jobs: Number of parts to compile at once (default: CPU count)
+    """
+    import platform
+    import subprocess
+    tex_filename = Path(tex_filename)
+    pdf_filename = tex_filename.with_suffix('.pdf')
+    
+    console.print(f"\n[dim]Compiling LaTeX to PDF...[/dim]")
+    
+    # Try to compile with pdflatex
+    try:
+        if parts:
+            compiled = 0
+            with ThreadPoolExecutor(max_workers=jobs or os.cpu_count()) as executor:
+                for part, (built, result) in zip(parts, executor.map(compile_part, parts)):
+                    compiled += built
+                    if result is not None and result.returncode != 0:
+                        console.print(f"[yellow]Warning: pdflatex had some issues with {part.name}:[/yellow]")
+                        if verbose:
+                            console.print(f"[dim]{result.stdout[-500:]}[/dim]")
+            console.print(f"[dim]Compiled {compiled} of {len(parts)} report parts ({len(parts) - compiled} up to date)[/dim]")
+        
+        result = run_pdflatex(tex_filename)
+        if needs_rerun(tex_filename):
+            result = run_pdflatex(tex_filename)
+        
+        if result.returncode != 0:
+            console.print(f"[yellow]Warning: pdflatex had some issues (this is often okay):[/yellow]")
+            if verbose:
+                console.print(f"[dim]{result.stdout[-500:]}[/dim]")
+        
+        if pdf_filename.exists():
+            console.print(f"[green]PDF compiled successfully:[/green] [cyan]{pdf_filename}[/cyan]")
+            
+            # Open PDF based on platform
+            console.print(f"[dim]Opening PDF...[/dim]")
+            if platform.system() == 'Darwin':  # macOS
+                subprocess.run(['open', str(pdf_filename)])
+            elif platform.system() == 'Windows':
+                os.startfile(str(pdf_filename))
+            else:  # Linux and others
+                subprocess.run(['xdg-open', str(pdf_filename)])
+                
+        else:
+            console.print(f"[red]Error: PDF file was not created[/red]")
+            
+    except FileNotFoundError:
+        console.print(f"[red]Error: pdflatex not found. Please install a LaTeX distribution.[/red]")
+    except Exception as e:
+        console.print(f"[red]Error compiling/opening PDF: {e}[/red]")
+
+def sum_stats(stats_list):
+    """Add up per-run counter dicts such as request_stats; minimums stay minimums."""
+    stats_list = [stats for stats in stats_list if stats]
+    if not stats_list:
+        return None
+    total = {}
+    for stats in stats_list:
+        for key, value in stats.items():
+            if key.startswith("min_"):
+                total[key] = min(total.get(key, value), value)
+            else:
+                total[key] = total.get(key, 0) + value
+    return total
+
+
+def merge_main(argv):
+    """Combine the run logs of the shards of one problem set into a single log, summary and report."""
+    from rich.console import Console
+    console = Console()
+    
+    parser = argparse.ArgumentParser(prog='fubench.py merge', description='Merge the run logs of a sharded evaluation')
+    parser.add_argument('logs', nargs='+', help='Shard run logs (logs/fubench_run_*.jsonl)')
+    parser.add_argument('--output', default='results.json', help='Output file for merged results')
+    parser.add_argument('--verbose', action='store_true', help='Show pdflatex errors')
+    parser.add_argument('--pdf', action='store_true', help='Compile and open PDF report')
+    parser.add_argument('--report-chunk-size', type=int, metavar='N', help='Split the LaTeX report into standalone parts of N problems that compile in parallel and are rebuilt only when changed')
+    args = parser.parse_args(argv)
+    
+    try:
+        headers = [read_header(path) for path in args.logs]
+    except (OSError, ValueError) as e:
+        console.print(f"[bold red]Error:[/bold red] {e}")
+        return
+    
+    # The shards must come from the same seeded problem set and settings
+    first = headers[0]['run_info']
+    def setting(run_info, key):
+        if key == 'max_tokens' and 'learned_max_tokens' in run_info:
+            # Shards may learn different budgets; the configured one must match
+            return run_info['learned_max_tokens']['configured']
+        return run_info.get(key)
+    
+    for key in ('model', 'problem_class', 'generator', 'problem_set_hash', 'prompt_template', 'max_tokens', 'temperature', 'samples'):
+        values = {json.dumps(setting(header['run_info'], key)) for header in headers}
+        if key == 'generator' and len(values) > 1:
+            console.print(f"[bold red]Error:[/bold red] some shards generated their problems with NumPy and some without, "
+                          f"so they have different problems; run every shard with NumPy installed")
+            return
+        if len(values) > 1:
+            console.print(f"[bold red]Error:[/bold red] logs disagree on {key}; they are not shards of one run")
+            return
+    
+    def evaluated(path, planned):
+        summary = read_summary(path) or {}
+        stop = summary.get('early_stop') or summary.get('budget_stop') or {}
+        return stop.get('evaluated', planned)
+    
+    shards = [header['run_info'].get('shard') for header in headers]
+    num_problems = first['num_problems']
+    if all(shards):
+        counts = {count for _, count in shards}
+        indices = [index for index, _ in shards]
+        if len(counts) > 1 or len(set(indices)) < len(indices):
+            console.print(f"[bold red]Error:[/bold red] overlapping or inconsistent shards: {shards}")
+            return
+        count = counts.pop()
+        missing = sorted(set(range(count)) - set(indices))
+        if missing:
+            console.print(f"[yellow]Warning: shards {missing} of {count} are missing; merging the rest[/yellow]")
+        # A shard stopped early by --until-ci or a budget only counts what it evaluated
+        total_problems = sum(evaluated(path, len(range(index, num_problems, count)))
+                             for path, index in zip(args.logs, indices))
+    elif len(headers) == 1:
+        total_problems = evaluated(args.logs[0], num_problems)
+    else:
+        console.print("[bold red]Error:[/bold red] only logs of --shard runs can be merged")
+        return
+    
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    log_filename = Path(args.logs[0]).parent / (f"fubench_run_{timestamp}_{first['model'].replace('/', '_')}"
+                                                f"_{first['problem_class']}_merged_{os.urandom(4).hex()}.jsonl")
+    run_info = {**first, "timestamp": timestamp, "shard": None, "merged_from": [str(path) for path in args.logs]}
+    
+    # Each log yields its results in problem_index order, so a k-way merge
+    # keeps the combined log in order without loading it into memory
+    run_log = RunLogWriter(log_filename, header={"run_info": run_info, "problems": headers[0]['problems']})
+    correct_count = 0
+    timings = TimingCollector()
+    usage = UsageCounter(first.get('price'))
+    aborted = {}
+    num_correct = []
+    last_index = None
+    for result in heapq.merge(*(read_results(path) for path in args.logs), key=lambda r: r['problem_index']):
+        if result['problem_index'] == last_index:
+            continue  # Same problem in two logs; keep the first
+        last_index = result['problem_index']
+        if result.get('is_correct'):
+            correct_count += 1
+        timings.add(result.get('metrics'))
+        usage.add(result.get('metrics'))
+        if result.get('aborted'):
+            aborted[result['aborted']] = aborted.get(result['aborted'], 0) + 1
+        num_correct.append(result.get('num_correct', 0))
+        run_log.write_result(result)
+    
+    shard_summaries = [read_summary(path) or {} for path in args.logs]
+    summary = {
+        "correct_count": correct_count,
+        "total_problems": total_problems,
+        "accuracy": correct_count / total_problems if total_problems > 0 else 0,
+        "request_stats": sum_stats(s.get('request_stats') for s in shard_summaries),
+        "cache_stats": sum_stats(s.get('cache_stats') for s in shard_summaries),
+        "timing_stats": timings.summary(),
+        "usage": usage.summary()
+    }
+    if aborted:
+        summary['aborted'] = aborted
+    if first.get('samples', 1) > 1:
+        summary['sampling'] = sampling_summary(num_correct, first['samples'], first['temperature'], summary['accuracy'])
+    run_log.write_summary(summary)
+    run_log.close()
+    
+    console.print(f"[dim]Merged {len(args.logs)} logs[/dim]")
+    print_summary(console, summary)
+    
+    # The report takes the model and class from the run arguments
+    args.model = first['model']
+    args.__dict__['class'] = first['problem_class']
+    write_run_outputs(console, args, run_info, summary, log_filename)
+
+
+def regrade_log(path, report_chunk_size=None, symbolic_timeout=None):
+    """
+    Re-grade every result in a run log and write a regraded log and report.
+    
+    Problems are rebuilt from the parameters in the log header, and answers
+    are re-extracted and re-checked with the current code, so changes to
+    check() or extract_answer() need no new API calls. The log is read as
+    a stream. Runs in a worker process.
+    
+    Args:
+        path: Run log to re-grade
+        report_chunk_size: Problems per report part (see generate_latex_report())
+        symbolic_timeout: If given, answers check() rejects are re-checked
+            with symbolic.verify(), allowing this many seconds per check
+    
+    Returns:
+        dict: The regraded log, report and report part paths, the old and
+        new summaries, and how many results changed
+    """
+    header = read_header(path)
+    run_info = header['run_info']
+    ProblemClass = registry.resolve(run_info['problem_class'])
+    old_summary = read_summary(path) or {}
+    
+    regraded_filename = Path(path).with_name(Path(path).stem + "_regraded.jsonl")
+    # Re-grading a log again replaces its earlier regraded log
+    for stale in (regraded_filename, responses_path(regraded_filename)):
+        stale.unlink(missing_ok=True)
+    run_log = RunLogWriter(regraded_filename, header={
+        "run_info": {**run_info, "regraded_from": str(path)},
+        "problems": header['problems']
+    })
+    correct_count = 0
+    changed = 0
+    timings = TimingCollector()
+    num_correct = []
+    verdicts = {}
+    for result in read_results(path):
+        if result.get('full_response') is not None:
+            problem = ProblemClass(**header['problems'][result['problem_index'] - 1])
+            was_correct = result.get('is_correct', False)
+            try:
+                if 'samples' in result:
+                    result.update(grade_samples(problem, [sample['full_response'] for sample in result['samples']]))
+                else:
+                    answer, is_correct, correct_answer = grade_response(problem, result['full_response'])
+                    result.update(extracted_answer=answer, is_correct=is_correct, correct_answer=correct_answer)
+                result.pop('error', None)
+            except Exception as e:
+                result['error'] = str(e)
+                result['is_correct'] = False
+            answer = symbolic_candidate(result) if symbolic_timeout else None
+            if answer is not None:
+                # This worker is its own process, so verify in place; the memo
+                # saves re-checking answers repeated across the log
+                key = (symbolic.normalize(answer), problem.solve())
+                if key not in verdicts:
+                    verdicts[key] = symbolic.verify(answer, problem.solve(), timeout=symbolic_timeout)
+                apply_symbolic_verdict(result, answer, verdicts[key], problem)
+            if bool(result['is_correct']) != bool(was_correct):
+                changed += 1
+        if result.get('is_correct'):
+            correct_count += 1
+        if "error" not in result:
+            timings.add(result.get('metrics'))
+        num_correct.append(result.get('num_correct', 0))
+        run_log.write_result(result)
+    
+    total_problems = old_summary.get('total_problems', run_info['num_problems'])
+    summary = {
+        **old_summary,
+        "correct_count": correct_count,
+        "total_problems": total_problems,
+        "accuracy": correct_count / total_problems if total_problems > 0 else 0,
+        "timing_stats": timings.summary(),
+        "regraded_changes": changed
+    }
+    if run_info.get('samples', 1) > 1:
+        summary['sampling'] = sampling_summary(num_correct, run_info['samples'], run_info['temperature'], summary['accuracy'])
+    run_log.write_summary(summary)
+    run_log.close()
+    
+    tex_filename = report_filename(regraded_filename)
+    report_args = argparse.Namespace(model=run_info['model'], **{'class': run_info['problem_class']})
+    parts = generate_latex_report(tex_filename, {
+        "run_info": run_info,
+        "summary": summary,
+        "detailed_results": read_results(regraded_filename)
+    }, report_args, chunk_size=report_chunk_size)
+    
+    return {
+        "log": str(regraded_filename),
+        "report": str(tex_filename),
+        "parts": [str(part) for part in parts],
+        "old_summary": old_summary,
+        "summary": summary,
+        "changed": changed
+    }
+
+
+def regrade_main(argv):
+    """Re-grade existing run logs offline, in parallel across logs."""
+    from rich.console import Console
+    console = Console()
+    
+    parser = argparse.ArgumentParser(prog='fubench.py regrade', description='Re-grade run logs with the current answer extraction and check() code')
+    parser.add_argument('logs', nargs='+', help='Run logs (logs/fubench_run_*.jsonl)')
+    parser.add_argument('--jobs', type=int, default=os.cpu_count(), help='Number of logs to re-grade in parallel')
+    parser.add_argument('--verbose', action='store_true', help='Show pdflatex errors')
+    parser.add_argument('--pdf', action='store_true', help='Compile and open the regraded PDF reports')
+    parser.add_argument('--symbolic', action='store_true', help='Re-check answers that check() rejects for mathematical equivalence with SymPy')
+    parser.add_argument('--symbolic-timeout', type=float, default=5.0, help='Seconds allowed per symbolic check')
+    parser.add_argument('--report-chunk-size', type=int, metavar='N', help='Split the LaTeX report into standalone parts of N problems that compile in parallel and are rebuilt only when changed')
+    parser.add_argument('--results-db', action=argparse.BooleanOptionalAction, default=True, help="Replace each run's results in logs/results.sqlite3 with the regraded ones")
+    args = parser.parse_args(argv)
+    
+    if args.symbolic and not symbolic.available():
+        console.print("[bold red]Error:[/bold red] --symbolic needs SymPy and its LaTeX parser")
+        console.print("Install them with: [cyan]pip install sympy antlr4-python3-runtime==4.11[/cyan]")
+        return
+    
+    from rich.table import Table
+    table = Table(title="Re-graded Runs", show_header=True, header_style="bold magenta")
+    table.add_column("Log", min_width=30)
+    table.add_column("Problems", justify="right")
+    table.add_column("Old Accuracy", justify="right")
+    table.add_column("New Accuracy", justify="right")
+    table.add_column("Changed", justify="right")
+    
+    from concurrent.futures import ProcessPoolExecutor
+    outputs = []
+    with ProcessPoolExecutor(max_workers=max(1, min(args.jobs, len(args.logs)))) as executor:
+        futures = {executor.submit(regrade_log, path, args.report_chunk_size, args.symbolic_timeout if args.symbolic else None): path for path in args.logs}
+        for future in as_completed(futures):
+            path = futures[future]
+            try:
+                output = future.result()
+            except Exception as e:
+                console.print(f"[red]Error re-grading {path}: {e}[/red]")
+                continue
+            old_accuracy = output['old_summary'].get('accuracy')
+            table.add_row(
+                str(path),
+                str(output['summary']['total_problems']),
+                f"{old_accuracy:.1%}" if old_accuracy is not None else "-",
+                f"{output['summary']['accuracy']:.1%}",
+                str(output['changed'])
+            )
+            outputs.append(output)
+    
+    console.print(table)
+    if args.results_db and outputs:
+        # Written here, not in the workers, so one process writes the database
+        results_db = ResultsDB(Path("logs") / "results.sqlite3")
+        for output in outputs:
+            results_db.import_log(output['log'])
+        results_db.close()
+    for output in outputs:
+        console.print(f"[dim]Regraded log saved to[/dim] [cyan]{output['log']}[/cyan]")
+        console.print(f"[dim]LaTeX report saved to[/dim] [cyan]{output['report']}[/cyan]")
+        if args.pdf:
+            compile_pdf(console, Path(output['report']), verbose=args.verbose,
+                        parts=[Path(part) for part in output['parts']])
+
+
+def print_rows(console, title, columns, rows, as_json=False):
+    """Print query rows as a Rich table, or as JSON lines."""
+    from rich.table import Table
+    if as_json:
+        for row in rows:
+            print(json.dumps(dict(zip(columns, row))))
+        return
+    table = Table(title=title, show_header=True, header_style="bold magenta")
+    for column in columns:
+        table.add_column(column)
+    for row in rows:
+        table.add_row(*("" if value is None else str(value) for value in row))
+    console.print(table)
+
+
+def import_main(argv):
+    """Load existing run logs into the results database."""
+    from rich.console import Console
+    console = Console()
+    
+    parser = argparse.ArgumentParser(prog='fubench.py import', description='Load run logs into the results database')
+    parser.add_argument('logs', nargs='+', help='Run logs (logs/fubench_run_*.jsonl, or *.json from older versions)')
+    parser.add_argument('--db', default=str(Path("logs") / "results.sqlite3"), help='Results database')
+    args = parser.parse_args(argv)
+    
+    results_db = ResultsDB(args.db)
+    total = 0
+    for path in args.logs:
+        try:
+            _, count = results_db.import_log(path)
+        except (OSError, ValueError, KeyError) as e:
+            console.print(f"[yellow]Skipped {path}: {e}[/yellow]")
+            continue
+        total += count
+        console.print(f"[dim]Imported {count} results from[/dim] [cyan]{path}[/cyan]")
+    results_db.close()
+    console.print(f"Imported {total} results into [cyan]{args.db}[/cyan]")
+
+
+def stats_main(argv):
+    """Show accuracy and latency per model and problem class from the results database."""
+    from rich.console import Console
+    console = Console()
+    
+    parser = argparse.ArgumentParser(prog='fubench.py stats', description='Accuracy and latency across runs from the results database')
+    parser.add_argument('--db', default=str(Path("logs") / "results.sqlite3"), help='Results database')
+    parser.add_argument('--model', help='Only this model')
+    parser.add_argument('--class', dest='problem_class', help='Only this problem class')
+    parser.add_argument('--since', metavar='DATE', help='Only results from this ISO date or time on, e.g. 2025-06-01')
+    parser.add_argument('--last-runs', type=int, metavar='N', help="Only each model's last N runs")
+    parser.add_argument('--by', nargs='*', choices=list(GROUP_COLUMNS), default=['model', 'class'], help='Columns to group by')
+    parser.add_argument('--json', action='store_true', help='Print JSON lines instead of a table')
+    args = parser.parse_args(argv)
+    
+    if not Path(args.db).exists():
+        console.print(f"[bold red]Error:[/bold red] No results database at {args.db}; run an evaluation or `fubench.py import` first")
+        return
+    results_db = ResultsDB(args.db)
+    start = time.perf_counter()
+    columns, rows = results_db.stats(model=args.model, problem_class=args.problem_class, since=args.since,
+                                     last_runs=args.last_runs, by=args.by)
+    elapsed = time.perf_counter() - start
+    results_db.close()
+    print_rows(console, "Results by " + ", ".join(args.by) if args.by else "All Results", columns, rows, args.json)
+    if not args.json:
+        console.print(f"[dim]{len(rows)} rows in {elapsed * 1000:.1f} ms[/dim]")
+
+
+def query_main(argv):
+    """Run a read-only SQL query against the results database."""
+    from rich.console import Console
+    console = Console()
+    
+    parser = argparse.ArgumentParser(prog='fubench.py query', description='Run a read-only SQL query on the results database (tables: runs, results)')
+    parser.add_argument('sql', help='SQL query, e.g. "SELECT model, AVG(is_correct) FROM results GROUP BY model"')
+    parser.add_argument('--db', default=str(Path("logs") / "results.sqlite3"), help='Results database')
+    parser.add_argument('--json', action='store_true', help='Print JSON lines instead of a table')
+    args = parser.parse_args(argv)
+    
+    if not Path(args.db).exists():
+        console.print(f"[bold red]Error:[/bold red] No results database at {args.db}; run an evaluation or `fubench.py import` first")
+        return
+    results_db = ResultsDB(args.db)
+    import sqlite3
+    start = time.perf_counter()
+    try:
+        columns, rows = results_db.query(args.sql)
+    except sqlite3.Error as e:
+        console.print(f"[bold red]Error:[/bold red] {e}")
+        return
+    finally:
+        results_db.close()
+    elapsed = time.perf_counter() - start
+    print_rows(console, "Query Results", columns, rows, args.json)
+    if not args.json:
+        console.print(f"[dim]{len(rows)} rows in {elapsed * 1000:.1f} ms[/dim]")
+
+
+# Subcommands; anything else runs an evaluation
+COMMANDS = {
+    "merge": merge_main,
+    "regrade": regrade_main,
+    "import": import_main,
+    "stats": stats_main,
+    "query": query_main,
+}
+
+def run():
+    """Run the subcommand named by sys.argv[1], or an evaluation."""
+    if len(sys.argv) > 1 and sys.argv[1] in COMMANDS:
+        COMMANDS[sys.argv[1]](sys.argv[2:])
+    else:
+        main()
\ No newline at end of file
@@ -0,0 +1,157 @@
+"""Summary statistics for FuBench runs."""
+
+import math
+
+# Per-result timing metrics recorded by request_completion()
+TIMING_METRICS = ("ttft", "latency", "output_tokens", "tokens_per_sec")
+
+
+def percentile(values, p):
+    """Return the p-th percentile of values by linear interpolation."""
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    rank = (len(ordered) - 1) * p / 100
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def summarize(values, percentiles=(50, 95, 99)):
+    """
+    Summarize a list of numbers.
+
+    Returns:
+        dict: count, mean and the requested percentiles (keys "p50" etc.),
+        or None if there are no values
+    """
+    if not values:
+        return None
+    summary = {"count": len(values), "mean": sum(values) / len(values)}
+    for p in percentiles:
+        summary[f"p{p}"] = percentile(values, p)
+    return summary
+
+
+def wilson_interval(successes, n, z=1.96):
+    """
+    Return the Wilson score interval for a binomial proportion.
+
+    Unlike the normal approximation it stays inside [0, 1] and is sensible
+    at 0 or n successes, which is common for hard problem classes. The
+    default z gives a 95% interval.
+
+    Returns:
+        tuple: (low, high), or (0.0, 1.0) if n is 0
+    """
+    if n == 0:
+        return 0.0, 1.0
+    p = successes / n
+    denominator = 1 + z * z / n
+    center = (p + z * z / (2 * n)) / denominator
+    margin = z * math.sqrt(p * (1 - p) / n + z * z / (4 * n * n)) / denominator
+    return max(0.0, center - margin), min(1.0, center + margin)
+
+
+def mcnemar_p(b, c):
+    """
+    Return the two-sided exact McNemar p-value for paired binary outcomes.
+
+    Args:
+        b: Pairs where only the first model was correct
+        c: Pairs where only the second model was correct
+
+    Returns:
+        float: Probability of a split at least this uneven if both models
+        were equally accurate; 1.0 if there are no discordant pairs
+    """
+    n = b + c
+    if n == 0:
+        return 1.0
+    tail = sum(math.comb(n, k) for k in range(min(b, c) + 1)) / 2 ** n
+    return min(1.0, 2 * tail)
+
+
+def pass_at_k(n, c, k):
+    """
+    Return the unbiased pass@k estimate from n samples of which c are correct.
+
+    This is the probability that at least one of k samples drawn without
+    replacement from the n is correct (Chen et al., 2021), which has lower
+    variance than drawing exactly k samples per problem.
+    """
+    if n - c < k:
+        return 1.0
+    return 1.0 - math.comb(n - c, k) / math.comb(n, k)
+
+
+def pass_at_k_values(samples):
+    """Return the k to report for a given number of samples: powers of two up to samples, and samples."""
+    ks = [1]
+    while ks[-1] * 2 < samples:
+        ks.append(ks[-1] * 2)
+    if ks[-1] != samples:
+        ks.append(samples)
+    return ks
+
+
+class TimingCollector:
+    """Collect per-result timing metrics and summarize them as percentiles."""
+
+    def __init__(self):
+        self.values = {name: [] for name in TIMING_METRICS}
+
+    def add(self, metrics):
+        """Record the metrics dict of one result; None values are skipped."""
+        if not metrics:
+            return
+        for name in TIMING_METRICS:
+            if metrics.get(name) is not None:
+                self.values[name].append(metrics[name])
+
+    def summary(self):
+        return {name: summarize(values) for name, values in self.values.items()}
+
+
+def usage_cost(prompt_tokens, output_tokens, prices):
+    """Return the cost of a token count at prices, a (prompt, output) pair in USD per million tokens."""
+    return (prompt_tokens * prices[0] + output_tokens * prices[1]) / 1e6
+
+
+class UsageCounter:
+    """Add up the token usage of results, and its cost if prices are known."""
+
+    def __init__(self, prices=None):
+        """
+        Args:
+            prices: Optional (prompt, output) prices in USD per million tokens
+        """
+        self.prices = prices
+        self.results = 0
+        self.prompt_tokens = 0
+        self.output_tokens = 0
+
+    def add(self, metrics):
+        """Record the metrics dict of one result; cached and shared results have none and cost nothing."""
+        if not metrics:
+            return
+        self.results += 1
+        self.prompt_tokens += metrics.get("prompt_tokens") or 0
+        self.output_tokens += metrics.get("output_tokens") or 0
+
+    @property
+    def total_tokens(self):
+        return self.prompt_tokens + self.output_tokens
+
+    @property
+    def cost(self):
+        return usage_cost(self.prompt_tokens, self.output_tokens, self.prices) if self.prices else None
+
+    def summary(self):
+        return {
+            "results": self.results,
+            "prompt_tokens": self.prompt_tokens,
+            "output_tokens": self.output_tokens,
+            "total_tokens": self.total_tokens,
+            "cost": self.cost
+        }
@@ -0,0 +1,401 @@
+#!/usr/bin/env python3
+"""
+Local OpenAI-compatible completions server for testing FuBench offline.
+
+Serves POST /v1/completions with simulated latency, injected errors and
+rate limiting, and answers that know the problem classes in problems.py:
+each response is right, wrong or malformed at configurable rates.
+
+    python mock_server.py --port 8000 --latency-median 0.5 --throttle-rate 0.05
+    python fubench.py --base-url http://127.0.0.1:8000/v1 --concurrency 64
+"""
+
+import argparse
+import json
+import math
+import random
+import re
+import threading
+import time
+import uuid
+from fractions import Fraction
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Roughly four characters per token, as for English text
+CHARS_PER_TOKEN = 4
+
+
+class MockConfig:
+    """Behavior of the mock server. All rates are probabilities per request."""
+
+    def __init__(self, latency_median=0.2, latency_sigma=0.5, tokens_per_sec=0.0,
+                 error_rate=0.0, throttle_rate=0.0, retry_after=1.0,
+                 correct_rate=0.7, wrong_rate=0.2, latex_rate=0.0, think_words=40, batch_limit=None, max_n=None, seed=None):
+        """
+        Args:
+            latency_median: Median time to first token in seconds
+            latency_sigma: Sigma of the lognormal time-to-first-token distribution
+            tokens_per_sec: Generation speed after the first token; 0 for instant
+            error_rate: Fraction of requests answered with a 500 or 503
+            throttle_rate: Fraction of requests answered with a 429
+            retry_after: Retry-After seconds sent with 429s
+            correct_rate: Fraction of answers that are correct
+            wrong_rate: Fraction of answers that are wrong; the rest are malformed
+            latex_rate: Fraction of correct answers written as equivalent but
+                non-canonical LaTeX, e.g. \\frac{68}{2} for 34
+            think_words: Approximate length of the <think> block in words
+            batch_limit: Prompts answered per list-prompt request; None for
+                all, 0 to reject list prompts with a 400
+            max_n: Choices returned per prompt; None for the requested n, 1
+                to ignore n, 0 to reject n > 1 with a 400
+            seed: Random seed for reproducible behavior
+        """
+        self.latency_median = latency_median
+        self.latency_sigma = latency_sigma
+        self.tokens_per_sec = tokens_per_sec
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.correct_rate = correct_rate
+        self.wrong_rate = wrong_rate
+        self.latex_rate = latex_rate
+        self.think_words = think_words
+        self.batch_limit = batch_limit
+        self.max_n = max_n
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+
+    def uniform(self):
+        with self.lock:
+            return self.random.random()
+
+    def ttft(self):
+        """Draw a time to first token from the lognormal latency distribution."""
+        if self.latency_median <= 0:
+            return 0.0
+        with self.lock:
+            return self.random.lognormvariate(math.log(self.latency_median), self.latency_sigma)
+
+
+# Answer generators for the problem classes in problems.py. Each takes the
+# problem text and returns the correct answer string, or None if the text
+# is not a problem of that class.
+
+def _solve_quadratic(text):
+    m = re.search(r"\$x\^2 ([+-]) (\d+)x ([+-]) (\d+) = 0\$", text)
+    if not m:
+        return None
+    b = int(m.group(2)) * (1 if m.group(1) == '+' else -1)
+    c = int(m.group(4)) * (1 if m.group(3) == '+' else -1)
+    root = math.isqrt(b * b - 4 * c)
+    return json.dumps(sorted({(-b - root) // 2, (-b + root) // 2}))
+
+
+def _solve_trig(text):
+    return "1" if r"\sec^2" in text else None
+
+
+def _solve_derivative(text):
+    return "[1, 0, -1, 21]" if "f(x) = 2 + x - x^2" in text else None
+
+
+def _solve_system(text):
+    if "system of equations" not in text:
+        return None
+    rows = []
+    for lhs, rhs in re.findall(r"\$([^$=]*)= (-?\d+)\$", text):
+        coefficients = {var: int(coef) for coef, var in re.findall(r"([+-]?\d+)([xyz])", lhs.replace(' ', ''))}
+        rows.append([coefficients.get(v, 0) for v in "xyz"] + [int(rhs)])
+    if len(rows) != 3:
+        return None
+
+    # Cramer's rule in exact arithmetic
+    def det(m):
+        return (m[0][0] * (m[1][1] * m[2][2] - m[2][1] * m[1][2])
+                - m[0][1] * (m[1][0] * m[2][2] - m[2][0] * m[1][2])
+                + m[0][2] * (m[1][0] * m[2][1] - m[2][0] * m[1][1]))
+    a = [row[:3] for row in rows]
+    d = det(a)
+    if d == 0:
+        return None
+    solution = []
+    for col in range(3):
+        m = [row[:] for row in a]
+        for i in range(3):
+            m[i][col] = rows[i][3]
+        solution.append(Fraction(det(m), d))
+    if any(x.denominator != 1 for x in solution):
+        return None
+    return json.dumps([int(x) for x in solution])
+
+
+SOLVERS = [_solve_quadratic, _solve_trig, _solve_derivative, _solve_system]
+
+
+def correct_answer(prompt):
+    """Return the correct answer for a FuBench prompt, or None if unknown."""
+    for solver in SOLVERS:
+        answer = solver(prompt)
+        if answer is not None:
+            return answer
+    return None
+
+
+def wrong_answer(answer):
+    """Return a plausible but incorrect variant of a correct answer."""
+    try:
+        value = json.loads(answer)
+    except ValueError:
+        return answer + "0"
+    if isinstance(value, list) and value:
+        value[0] += 1
+        return json.dumps(value)
+    return json.dumps(value + 1)
+
+
+def latex_answer(answer):
+    """Return a correct answer rewritten with every integer as an equivalent LaTeX fraction."""
+    try:
+        value = json.loads(answer)
+    except ValueError:
+        return answer
+    values = value if isinstance(value, list) else [value]
+    if not all(isinstance(v, int) for v in values):
+        return answer
+    parts = [f"\\frac{{{2 * v}}}{{2}}" for v in values]
+    return f"[{', '.join(parts)}]" if isinstance(value, list) else parts[0]
+
+
+def generate_text(prompt, config):
+    """Generate a completion in the <think>/<answer> format the prompt asks for."""
+    answer = correct_answer(prompt)
+    draw = config.uniform()
+    think = " ".join(["Let me work through this step by step."] * max(1, config.think_words // 8))
+    if answer is not None and draw < config.correct_rate:
+        if config.uniform() < config.latex_rate:
+            answer = latex_answer(answer)
+        return f"<think>\n{think}\n</think>\n<answer>{answer}</answer>"
+    if answer is not None and draw < config.correct_rate + config.wrong_rate:
+        return f"<think>\n{think}\n</think>\n<answer>{wrong_answer(answer)}</answer>"
+    # Malformed: no answer tag, or an answer in the wrong format
+    if draw < (1 + config.correct_rate + config.wrong_rate) / 2:
+        return f"<think>\n{think}\nThe answer is probably {answer}."
+    return f"<think>\n{think}\n</think>\n<answer>x = {answer}</answer>"
+
+
+def apply_stop(text, stop, max_tokens):
+    """Truncate text at the first stop sequence or at max_tokens."""
+    finish_reason = "stop"
+    if isinstance(stop, str):
+        stop = [stop]
+    for sequence in stop or []:
+        index = text.find(sequence)
+        if index != -1:
+            text = text[:index]
+    if max_tokens is not None and len(text) > max_tokens * CHARS_PER_TOKEN:
+        text = text[:max_tokens * CHARS_PER_TOKEN]
+        finish_reason = "length"
+    return text, finish_reason
+
+
+def count_tokens(text):
+    return max(1, math.ceil(len(text) / CHARS_PER_TOKEN)) if text else 0
+
+
+class CompletionHandler(BaseHTTPRequestHandler):
+    """Handle OpenAI-style completions requests."""
+
+    protocol_version = "HTTP/1.1"
+    config = MockConfig()
+    quiet = True
+
+    def log_message(self, format, *args):
+        if not self.quiet:
+            super().log_message(format, *args)
+
+    def _send_json(self, status, body, headers=None):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_error(self, status, message, headers=None):
+        self._send_json(status, {"error": {"message": message, "code": status}}, headers)
+
+    def do_GET(self):
+        if self.path.rstrip('/').endswith("/models"):
+            self._send_json(200, {"object": "list", "data": [{"id": "mock", "object": "model"}]})
+        else:
+            self._send_error(404, f"Unknown path {self.path}")
+
+    def do_POST(self):
+        if not self.path.rstrip('/').endswith("/completions"):
+            self._send_error(404, f"Unknown path {self.path}")
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length))
+        except ValueError:
+            self._send_error(400, "Invalid JSON body")
+            return
+
+        config = self.config
+        # Injected failures are decided before any work is done, like a
+        # provider's gateway would
+        draw = config.uniform()
+        if draw < config.throttle_rate:
+            self._send_error(429, "Rate limit exceeded", {"Retry-After": str(config.retry_after)})
+            return
+        if draw < config.throttle_rate + config.error_rate:
+            self._send_error(503 if config.uniform() < 0.5 else 500, "Upstream error")
+            return
+
+        prompts = request.get("prompt", "")
+        if isinstance(prompts, str):
+            prompts = [prompts]
+        elif config.batch_limit == 0:
+            self._send_error(400, "prompt must be a string")
+            return
+        elif config.batch_limit is not None:
+            # Answer only part of the batch, as some providers do
+            prompts = prompts[:config.batch_limit]
+        n = request.get("n") or 1
+        if n > 1 and config.max_n == 0:
+            self._send_error(400, "n is not supported")
+            return
+        if config.max_n is not None:
+            # Return fewer choices than asked for, as some providers do
+            n = min(n, max(config.max_n, 1))
+        choices = []
+        for prompt_index, prompt in enumerate(prompts):
+            for _ in range(n):
+                text, finish_reason = apply_stop(generate_text(prompt, config), request.get("stop"), request.get("max_tokens"))
+                choices.append({"text": text, "index": len(choices), "finish_reason": finish_reason, "logprobs": None})
+
+        prompt_tokens = sum(count_tokens(p) for p in prompts)
+        completion_tokens = sum(count_tokens(c["text"]) for c in choices)
+        response = {
+            "id": f"cmpl-{uuid.uuid4().hex}",
+            "object": "text_completion",
+            "created": int(time.time()),
+            "model": request.get("model", "mock"),
+            "choices": choices,
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens
+            }
+        }
+
+        ttft = config.ttft()
+        if request.get("stream"):
+            self._stream(response, ttft, request)
+            return
+        generation_time = completion_tokens / config.tokens_per_sec if config.tokens_per_sec > 0 else 0.0
+        time.sleep(ttft + generation_time)
+        self._send_json(200, response)
+
+    def _stream(self, response, ttft, request):
+        """Send the response as server-sent events, one token per chunk."""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        def send(body):
+            self.wfile.write(f"data: {body}\n\n".encode())
+            self.wfile.flush()
+
+        delay = 1.0 / self.config.tokens_per_sec if self.config.tokens_per_sec > 0 else 0.0
+        time.sleep(ttft)
+        try:
+            for choice in response["choices"]:
+                text = choice["text"]
+                for start in range(0, len(text), CHARS_PER_TOKEN):
+                    chunk = {**response, "usage": None, "choices": [
+                        {"text": text[start:start + CHARS_PER_TOKEN], "index": choice["index"], "finish_reason": None, "logprobs": None}
+                    ]}
+                    send(json.dumps(chunk))
+                    if delay:
+                        time.sleep(delay)
+                send(json.dumps({**response, "usage": None, "choices": [
+                    {"text": "", "index": choice["index"], "finish_reason": choice["finish_reason"], "logprobs": None}
+                ]}))
+            if (request.get("stream_options") or {}).get("include_usage"):
+                send(json.dumps({**response, "choices": []}))
+            send("[DONE]")
+        except (BrokenPipeError, ConnectionResetError):
+            # The client stopped reading, e.g. after seeing </answer>
+            pass
+
+
+def make_server(host="127.0.0.1", port=8000, config=None, quiet=True):
+    """
+    Create a mock completions server.
+
+    Use port 0 to pick a free port; the bound port is server.server_address[1].
+    Call serve_forever() on the result, e.g. in a daemon thread.
+    """
+    handler = type("ConfiguredCompletionHandler", (CompletionHandler,), {
+        "config": config or MockConfig(),
+        "quiet": quiet
+    })
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local OpenAI-compatible completions server for testing FuBench')
+    parser.add_argument('--host', default='127.0.0.1', help='Interface to listen on')
+    parser.add_argument('--port', type=int, default=8000, help='Port to listen on')
+    parser.add_argument('--latency-median', type=float, default=0.2, help='Median time to first token in seconds')
+    parser.add_argument('--latency-sigma', type=float, default=0.5, help='Sigma of the lognormal latency distribution')
+    parser.add_argument('--tokens-per-sec', type=float, default=0.0, help='Generation speed after the first token (0 for instant)')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of requests answered with a 5xx error')
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help='Fraction of requests answered with a 429')
+    parser.add_argument('--retry-after', type=float, default=1.0, help='Retry-After seconds sent with 429s')
+    parser.add_argument('--correct-rate', type=float, default=0.7, help='Fraction of answers that are correct')
+    parser.add_argument('--wrong-rate', type=float, default=0.2, help='Fraction of answers that are wrong (the rest are malformed)')
+    parser.add_argument('--latex-rate', type=float, default=0.0, help='Fraction of correct answers written as equivalent non-canonical LaTeX')
+    parser.add_argument('--think-words', type=int, default=40, help='Approximate length of the reasoning trace in words')
+    parser.add_argument('--batch-limit', type=int, help='Prompts answered per list-prompt request (0 rejects list prompts)')
+    parser.add_argument('--max-n', type=int, help='Choices returned per prompt (1 ignores n, 0 rejects n > 1)')
+    parser.add_argument('--seed', type=int, help='Random seed')
+    parser.add_argument('--verbose', action='store_true', help='Log every request')
+
+    args = parser.parse_args()
+
+    config = MockConfig(
+        latency_median=args.latency_median,
+        latency_sigma=args.latency_sigma,
+        tokens_per_sec=args.tokens_per_sec,
+        error_rate=args.error_rate,
+        throttle_rate=args.throttle_rate,
+        retry_after=args.retry_after,
+        correct_rate=args.correct_rate,
+        wrong_rate=args.wrong_rate,
+        latex_rate=args.latex_rate,
+        think_words=args.think_words,
+        batch_limit=args.batch_limit,
+        max_n=args.max_n,
+        seed=args.seed
+    )
+    server = make_server(args.host, args.port, config, quiet=not args.verbose)
+    print(f"Mock completions server listening on http://{args.host}:{server.server_address[1]}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
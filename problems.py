@@ -1,16 +1,28 @@
 import json
-from random import shuffle, randint
+import math
+from random import Random, shuffle, randint
 
 def sign(a) -> str:
     return '+' if a > 0 else '-'
 
 class IntegerQuadraticProblem:
 
+  @classmethod
+  def batch(cls, n, seed=None):
+    """Draw n problems at once with NumPy; same distribution as cls()."""
+    import numpy as np
+    rng = np.random.default_rng(seed)
+    return IntegerQuadraticBatch(rng.integers(-99, 100, size=(n, 2), dtype=np.int16))
+
+  @classmethod
+  def space(cls):
+    """All easy problems (roots in [-99, 99], x1 <= x2), indexable and lazy."""
+    return IntegerQuadraticSpace()
+
   @classmethod
   def all_easy(cls):
-    for x1 in range(-99, 100):
-      for x2 in range(x1, 100):
-        yield cls(x1, x2)
+    # Iterating the space builds each problem only when it is reached
+    return cls.space()
 
   def __init__(self, x1=None, x2=None):
     if x1 == None:
@@ -18,9 +30,15 @@ class IntegerQuadraticProblem:
       x2 = randint(-99, 99)
     self._x1 = x1
     self._x2 = x2
+
+  @property
+  def equation(self):
     b = - (self._x1 + self._x2)
     c = self._x1 * self._x2
-    self.equation = f"$x^2 {sign(b)} {abs(b)}x {sign(c)} {abs(c)} = 0$"
+    return f"$x^2 {sign(b)} {abs(b)}x {sign(c)} {abs(c)} = 0$"
+
+  def params(self):
+    return {"x1": self._x1, "x2": self._x2}
   
   def __str__(self):
     return self.equation
@@ -37,8 +55,15 @@ class IntegerQuadraticProblem:
 
 class TrigExpressionProblem:
 
+  @classmethod
+  def space(cls):
+    return FixedProblemSpace(cls)
+
   def __init__(self):
     self.expression = r"""$\sqrt{ \sec^2 \theta - 1 } \frac{\cos \theta}{\sin \theta}$"""
+
+  def params(self):
+    return {}
   
   def __str__(self):
     return self.expression
@@ -57,6 +82,11 @@ class TrigExpressionProblem:
 class DerivativeComputationProblem:
     """Compute derivatives of a quadratic at given points and verify answers."""
 
+    @classmethod
+    def space(cls):
+        """The single fixed problem of this class, as a problem space."""
+        return FixedProblemSpace(cls)
+
     def __init__(self):
         # Define the polynomial and the points of evaluation
         self.expression = r"$f(x) = 2 + x - x^2$"
@@ -64,6 +94,10 @@ class DerivativeComputationProblem:
         # f'(x) = 1 - 2x, all evaluations are integers
         self._values = {x: int(1 - 2 * x) for x in self._points}
 
+    def params(self):
+        """Return the constructor arguments that rebuild this problem."""
+        return {}
+
     def __str__(self):
         return self.expression
 
@@ -93,7 +127,46 @@ class SystemOfEquationsProblem:
         """Random integer in [-9, 9]."""
         return randint(-9, 9)
 
-    def __init__(self):
+    @classmethod
+    def space(cls):
+        """Every system with coefficients and solution in [-9, 9], indexable and lazy."""
+        return SystemOfEquationsSpace()
+
+    @classmethod
+    def batch(cls, n, seed=None):
+        """
+        Draw n systems at once with NumPy; same distribution as cls().
+
+        Coefficients and solutions are drawn as arrays, determinants are
+        checked vectorized, and only the singular systems are redrawn.
+        """
+        import numpy as np
+        rng = np.random.default_rng(seed)
+        solutions = rng.integers(-9, 10, size=(n, 3), dtype=np.int8)
+        coefficients = rng.integers(-9, 10, size=(n, 3, 3), dtype=np.int8)
+
+        def det(m):
+            m = m.astype(np.int64)
+            return (m[:, 0, 0] * (m[:, 1, 1] * m[:, 2, 2] - m[:, 2, 1] * m[:, 1, 2])
+                    - m[:, 0, 1] * (m[:, 1, 0] * m[:, 2, 2] - m[:, 2, 0] * m[:, 1, 2])
+                    + m[:, 0, 2] * (m[:, 1, 0] * m[:, 2, 1] - m[:, 2, 0] * m[:, 1, 1]))
+
+        singular = np.flatnonzero(det(coefficients) == 0)
+        while len(singular):
+            coefficients[singular] = rng.integers(-9, 10, size=(len(singular), 3, 3), dtype=np.int8)
+            singular = singular[det(coefficients[singular]) == 0]
+        return SystemOfEquationsBatch(coefficients, solutions)
+
+    def __init__(self, coefficients=None, solution=None):
+        if coefficients is not None:
+            # Rebuild a known system, e.g. from a run log
+            (self._a1, self._b1, self._c1), (self._a2, self._b2, self._c2), (self._a3, self._b3, self._c3) = coefficients
+            self._x, self._y, self._z = solution
+            self._d1 = self._a1 * self._x + self._b1 * self._y + self._c1 * self._z
+            self._d2 = self._a2 * self._x + self._b2 * self._y + self._c2 * self._z
+            self._d3 = self._a3 * self._x + self._b3 * self._y + self._c3 * self._z
+            return
+
         while True:
             # Hidden integer solution
             self._x = self._rand()
@@ -119,6 +192,17 @@ class SystemOfEquationsProblem:
             if det != 0:
                 break  # Unique solution guaranteed
 
+    def params(self):
+        """Return the constructor arguments that rebuild this problem."""
+        return {
+            "coefficients": [
+                [self._a1, self._b1, self._c1],
+                [self._a2, self._b2, self._c2],
+                [self._a3, self._b3, self._c3],
+            ],
+            "solution": [self._x, self._y, self._z],
+        }
+
     # Helper to build a pretty inline equation string
     @staticmethod
     def _fmt_eq(a, b, c, d):
@@ -157,4 +241,268 @@ class SystemOfEquationsProblem:
             guess = json.loads(answer)
             return json.dumps(guess) == self.solve()
         except Exception:
-            return False
\ No newline at end of file
+            return False
+
+class ProblemSet:
+    """
+    Sequence of problems of one class whose objects are built lazily.
+
+    Subclasses store problem parameters compactly and implement __len__,
+    params(i) and _slice(s); a problem object, and so its prompt and
+    canonical answer, is only built when its index is accessed.
+    """
+
+    problem_class = None
+
+    def __len__(self):
+        raise NotImplementedError
+
+    def params(self, i):
+        """Return the constructor kwargs of problem i."""
+        raise NotImplementedError
+
+    def _slice(self, s):
+        raise NotImplementedError
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return self._slice(key)
+        if key < 0:
+            key += len(self)
+        if not 0 <= key < len(self):
+            raise IndexError(f"problem index {key} out of range")
+        return self.problem_class(**self.params(key))
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def prompt(self, i):
+        return self[i].prompt()
+
+    def solve(self, i):
+        return self[i].solve()
+
+
+class IntegerQuadraticBatch(ProblemSet):
+    """IntegerQuadraticProblems backed by an (n, 2) array of roots."""
+
+    problem_class = IntegerQuadraticProblem
+
+    def __init__(self, roots):
+        self.roots = roots
+
+    def __len__(self):
+        return len(self.roots)
+
+    def params(self, i):
+        x1, x2 = self.roots[i].tolist()
+        return {"x1": x1, "x2": x2}
+
+    def _slice(self, s):
+        return IntegerQuadraticBatch(self.roots[s])
+
+
+class SystemOfEquationsBatch(ProblemSet):
+    """SystemOfEquationsProblems backed by int8 coefficient and solution arrays."""
+
+    problem_class = SystemOfEquationsProblem
+
+    def __init__(self, coefficients, solutions):
+        self.coefficients = coefficients  # (n, 3, 3)
+        self.solutions = solutions  # (n, 3)
+
+    def __len__(self):
+        return len(self.solutions)
+
+    def params(self, i):
+        return {"coefficients": self.coefficients[i].tolist(), "solution": self.solutions[i].tolist()}
+
+    def _slice(self, s):
+        return SystemOfEquationsBatch(self.coefficients[s], self.solutions[s])
+
+
+class ParamsProblemSet(ProblemSet):
+    """Problems of any class built from a list of constructor kwargs, such as a run log's header holds."""
+
+    def __init__(self, problem_class, params):
+        self.problem_class = problem_class
+        self._params = params
+
+    def __len__(self):
+        return len(self._params)
+
+    def params(self, i):
+        return self._params[i]
+
+    def _slice(self, s):
+        return ParamsProblemSet(self.problem_class, self._params[s])
+
+
+class ProblemParams:
+    """
+    Read-only sequence of the constructor kwargs of a problem set's problems.
+
+    Each problem's kwargs are computed when they are read, so a run log's
+    header can be written, and the problem set hashed, without holding all
+    of them in a list.
+    """
+
+    def __init__(self, problems):
+        self._problems = problems
+
+    def __len__(self):
+        return len(self._problems)
+
+    def __getitem__(self, i):
+        if isinstance(self._problems, ProblemSet):
+            return self._problems.params(i)
+        return self._problems[i].params()
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+
+
+class ProblemSpace(ProblemSet):
+    """
+    Every problem of a class, addressed by integer index.
+
+    Subclasses give the size of the space and map an index to constructor
+    kwargs in O(1); nothing is built until an index is accessed, so
+    slicing, sampling and sharding the space cost almost no memory.
+    """
+
+    def __init__(self, indices=None):
+        # A range, or the list of indices picked by sample()
+        self.indices = range(self.size()) if indices is None else indices
+
+    def size(self):
+        """Number of problems in the whole space."""
+        raise NotImplementedError
+
+    def _params(self, index):
+        """Return the constructor kwargs of the problem at a space index."""
+        raise NotImplementedError
+
+    def _valid(self, index):
+        """Return False for indices that are not problems, e.g. singular systems."""
+        return True
+
+    def __len__(self):
+        return len(self.indices)
+
+    def params(self, i):
+        index = self.indices[i]
+        if not self._valid(index):
+            raise ValueError(f"index {index} is not a valid {self.problem_class.__name__}")
+        return self._params(index)
+
+    def _slice(self, s):
+        return self._with_indices(self.indices[s])
+
+    def _with_indices(self, indices):
+        space = object.__new__(type(self))
+        space.__dict__.update(self.__dict__)
+        space.indices = indices
+        return space
+
+    def index(self, i):
+        """Return the index in the whole space of problem i, e.g. for "problem #12345" lookups."""
+        return self.indices[i]
+
+    def sample(self, k, seed=None):
+        """Return k distinct valid problems chosen at random, reproducibly for a given seed."""
+        rng = Random(seed)
+        if type(self)._valid is ProblemSpace._valid:
+            return self._with_indices(rng.sample(self.indices, k))
+        # Some indices are not problems; draw until we have k valid ones
+        picked = []
+        seen = set()
+        while len(picked) < k:
+            if len(seen) >= len(self.indices):
+                raise ValueError(f"fewer than {k} valid problems in this space")
+            position = rng.randrange(len(self.indices))
+            if position in seen:
+                continue
+            seen.add(position)
+            if self._valid(self.indices[position]):
+                picked.append(self.indices[position])
+        return self._with_indices(picked)
+
+
+class FixedProblemSpace(ProblemSpace):
+    """Space of a class with one fixed problem, such as TrigExpressionProblem."""
+
+    def __init__(self, problem_class, indices=None):
+        self.problem_class = problem_class
+        super().__init__(indices)
+
+    def size(self):
+        return 1
+
+    def _params(self, index):
+        return {}
+
+
+class IntegerQuadraticSpace(ProblemSpace):
+    """
+    All 19,900 easy quadratics, in the order all_easy() used to yield them.
+
+    Index i maps to the i-th pair x1 <= x2 of roots in [-99, 99], taken
+    row by row over x1.
+    """
+
+    problem_class = IntegerQuadraticProblem
+    LOW, HIGH = -99, 99
+
+    def size(self):
+        n = self.HIGH - self.LOW + 1
+        return n * (n + 1) // 2
+
+    def _params(self, index):
+        n = self.HIGH - self.LOW + 1
+        # Row r (x1 = LOW + r) holds n - r pairs and starts at r(2n + 1 - r)/2,
+        # so invert that quadratic for the row and correct for rounding
+        r = ((2 * n + 1) - math.isqrt((2 * n + 1) ** 2 - 8 * index)) // 2
+        while r * (2 * n + 1 - r) // 2 > index:
+            r -= 1
+        while (r + 1) * (2 * n - r) // 2 <= index:
+            r += 1
+        x1 = self.LOW + r
+        x2 = x1 + index - r * (2 * n + 1 - r) // 2
+        return {"x1": x1, "x2": x2}
+
+
+class SystemOfEquationsSpace(ProblemSpace):
+    """
+    All 19^12 choices of coefficients and solution in [-9, 9].
+
+    The index is read as 12 base-19 digits: the nine coefficients row by
+    row, then x, y and z. Singular systems are part of the index range but
+    are not problems; accessing one raises ValueError and sample() skips
+    them.
+    """
+
+    problem_class = SystemOfEquationsProblem
+    DIGITS = 12
+    BASE = 19
+
+    def size(self):
+        return self.BASE ** self.DIGITS
+
+    def _digits(self, index):
+        values = []
+        for _ in range(self.DIGITS):
+            index, digit = divmod(index, self.BASE)
+            values.append(digit - 9)
+        return values[::-1]
+
+    def _params(self, index):
+        v = self._digits(index)
+        return {"coefficients": [v[0:3], v[3:6], v[6:9]], "solution": v[9:12]}
+
+    def _valid(self, index):
+        (a1, b1, c1), (a2, b2, c2), (a3, b3, c3) = self._params(index)["coefficients"]
+        return a1 * (b2 * c3 - b3 * c2) - b1 * (a2 * c3 - a3 * c2) + c1 * (a2 * b3 - a3 * b2) != 0
@@ -0,0 +1,178 @@
+"""Per-phase profiling for FuBench.
+
+The evaluation pipeline wraps each phase in a span of the module-level
+profiler:
+
+    from profiling import profiler
+
+    with profiler.span("check", problem_index=3):
+        ...
+
+Spans cost almost nothing until profiler.enable() is called (fubench.py
+does so for --profile). Once enabled, every span is recorded with its
+thread, so a run can be written out as a Chrome trace, viewable in
+chrome://tracing or https://ui.perfetto.dev, and as a plain-text table of
+time per phase.
+
+Custom timers use the same span() or timed(), or record() for a duration
+measured elsewhere. Hooks added with add_hook() are called with every
+finished span, e.g. to feed timings to another tool.
+"""
+
+import functools
+import json
+import os
+import threading
+import time
+
+from metrics import summarize
+
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ("profiler", "name", "args", "start")
+
+    def __init__(self, profiler, name, args):
+        self.profiler = profiler
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler.record(self.name, self.start, time.perf_counter() - self.start, **self.args)
+        return False
+
+
+class Profiler:
+    """Record named, timed spans from any thread."""
+
+    def __init__(self):
+        self.enabled = False
+        self.events = []
+        self.hooks = []
+        self._origin = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def enable(self):
+        """Start recording; the trace's time zero is now."""
+        self._origin = time.perf_counter()
+        self.events = []
+        self.enabled = True
+
+    def elapsed(self):
+        """Return the seconds since enable()."""
+        return time.perf_counter() - self._origin
+
+    def span(self, name, **args):
+        """Return a context manager that times its block as phase name; args go into the trace."""
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name, args)
+
+    def timed(self, name=None):
+        """Decorator that times every call of a function as a span."""
+        def decorate(fn):
+            phase = name or fn.__name__
+
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                with self.span(phase):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorate
+
+    def record(self, name, start, duration, **args):
+        """
+        Record a span measured elsewhere.
+
+        Args:
+            name: Phase name
+            start: time.perf_counter() value when the span started
+            duration: Length in seconds
+            **args: Extra fields shown with the span in the trace
+        """
+        if not self.enabled:
+            return
+        event = (name, start - self._origin, duration, threading.get_ident(), args)
+        with self._lock:
+            self.events.append(event)
+        for hook in self.hooks:
+            hook(name, start, duration, args)
+
+    def add_hook(self, fn):
+        """Call fn(name, start, duration, args) with every finished span."""
+        self.hooks.append(fn)
+
+    def summary(self):
+        """
+        Summarize the recorded spans per phase.
+
+        Returns:
+            dict: Phase name to count, total, mean, p50, p95, p99 and max
+            seconds, in order of total time
+        """
+        durations = {}
+        with self._lock:
+            for name, _, duration, _, _ in self.events:
+                durations.setdefault(name, []).append(duration)
+        phases = {}
+        for name, values in durations.items():
+            phases[name] = {**summarize(values), "total": sum(values), "max": max(values)}
+        return dict(sorted(phases.items(), key=lambda item: -item[1]['total']))
+
+    def write_chrome_trace(self, path):
+        """Write the spans in Chrome trace event format, one lane per thread."""
+        pid = os.getpid()
+        with self._lock:
+            events = list(self.events)
+        threads = {}
+        with open(path, 'w') as f:
+            f.write('{"displayTimeUnit": "ms", "traceEvents": [\n')
+            for n, (name, start, duration, thread, args) in enumerate(events):
+                tid = threads.setdefault(thread, len(threads))
+                f.write(("" if n == 0 else ",\n") + json.dumps({
+                    "name": name, "ph": "X", "pid": pid, "tid": tid,
+                    "ts": round(start * 1e6, 3), "dur": round(duration * 1e6, 3), "args": args
+                }))
+            for thread, tid in threads.items():
+                f.write(",\n" + json.dumps({
+                    "name": "thread_name", "ph": "M", "pid": pid, "tid": tid,
+                    "args": {"name": "main" if thread == threading.main_thread().ident else f"worker {tid}"}
+                }))
+            f.write("\n]}\n")
+
+    def write_text_summary(self, path, wall_time=None):
+        """
+        Write a plain-text table of time per phase.
+
+        Phases overlap when they run on several threads, so their totals
+        can add up to more than the wall-clock time.
+        """
+        lines = [f"{'Phase':<20} {'Count':>8} {'Total s':>10} {'% wall':>7} {'Mean ms':>10} {'p95 ms':>10} {'Max ms':>10}"]
+        for name, stats in self.summary().items():
+            share = f"{stats['total'] / wall_time:.1%}" if wall_time else "-"
+            lines.append(
+                f"{name:<20} {stats['count']:>8} {stats['total']:>10.3f} {share:>7} "
+                f"{stats['mean'] * 1e3:>10.3f} {stats['p95'] * 1e3:>10.3f} {stats['max'] * 1e3:>10.3f}"
+            )
+        if wall_time:
+            lines.append(f"\nWall-clock time: {wall_time:.3f} s")
+        with open(path, 'w') as f:
+            f.write("\n".join(lines) + "\n")
+
+
+# The profiler the pipeline reports to
+profiler = Profiler()
@@ -0,0 +1,136 @@
+"""Problem-class registry for FuBench.
+
+--class names are resolved here, from three sources:
+
+- Built-in classes: every class in problems.py with prompt(), solve(),
+  check() and params() methods. problems.py is small, so it is imported on first use.
+- Plugins: classes that other installed packages expose under the
+  "fubench.problems" entry-point group, e.g. in their pyproject.toml:
+
+      [project.entry-points."fubench.problems"]
+      GeometryProblem = "inhouse_problems.geometry:GeometryProblem"
+
+  Entry points are only read when a name is not built in, or to list the
+  classes, and a plugin's module is only imported when its class is used.
+- "module:Class" paths, resolved directly, for classes that are not
+  installed as plugins.
+
+Classes can also be added at run time with register().
+"""
+
+import importlib
+
+# Entry-point group that plugin packages register problem classes under
+ENTRY_POINT_GROUP = "fubench.problems"
+
+# name -> class, or "module:attribute" until it is first resolved
+_registered = {}
+_builtins = None
+_plugins = None
+
+
+class UnknownProblemClass(LookupError):
+    """Raised by resolve() for a name no source provides."""
+
+
+def _load(spec):
+    module_name, _, attribute = spec.partition(":")
+    obj = importlib.import_module(module_name)
+    for part in attribute.split("."):
+        obj = getattr(obj, part)
+    return obj
+
+
+# Methods a problem class must have; params() is what run logs store to rebuild a problem
+METHODS = ("prompt", "solve", "check", "params")
+
+
+def _is_problem_class(obj):
+    return isinstance(obj, type) and all(callable(getattr(obj, method, None)) for method in METHODS)
+
+
+def builtin_classes():
+    """Return the problem classes defined in problems.py, by name, in definition order."""
+    global _builtins
+    if _builtins is None:
+        import problems
+        _builtins = {name: obj for name, obj in vars(problems).items()
+                     if _is_problem_class(obj) and obj.__module__ == problems.__name__}
+    return _builtins
+
+
+def plugin_classes():
+    """Return the plugin entry points by name, without importing the plugins."""
+    global _plugins
+    if _plugins is None:
+        from importlib.metadata import entry_points
+        _plugins = {entry_point.name: entry_point for entry_point in entry_points(group=ENTRY_POINT_GROUP)}
+    return _plugins
+
+
+def register(name, cls):
+    """
+    Make a problem class available to --class under name.
+
+    Args:
+        name: Name to resolve
+        cls: The class, or a "module:Class" path imported on first use
+    """
+    _registered[name] = cls
+
+
+def resolve(name):
+    """
+    Return the problem class for a --class name.
+
+    Classes added with register() come first, then built-in classes, then
+    plugins, then "module:Class" paths.
+
+    Raises:
+        UnknownProblemClass: If no source provides name, or its plugin
+        cannot be imported
+    """
+    if name in _registered:
+        cls = _registered[name]
+        if isinstance(cls, str):
+            cls = _registered[name] = _load(cls)
+        return cls
+    if name in builtin_classes():
+        return builtin_classes()[name]
+    try:
+        if name in plugin_classes():
+            cls = plugin_classes()[name].load()
+        elif ":" in name:
+            cls = _load(name)
+        else:
+            raise UnknownProblemClass(f"Unknown problem class '{name}'; see --list-classes")
+    except (ImportError, AttributeError) as e:
+        raise UnknownProblemClass(f"Cannot load problem class '{name}': {e}") from e
+    if not _is_problem_class(cls):
+        raise UnknownProblemClass(f"'{name}' is not a problem class: it needs prompt(), solve(), check() and params()")
+    _registered[name] = cls
+    return cls
+
+
+def available():
+    """
+    List every problem class name without importing any plugin.
+
+    Returns:
+        list: (name, source) pairs, where source is "registered",
+        "built-in" or the plugin's "module:attribute"
+    """
+    names = {}
+    for name in builtin_classes():
+        names[name] = "built-in"
+    for name, entry_point in plugin_classes().items():
+        names.setdefault(name, entry_point.value)
+    for name in _registered:
+        names[name] = "registered"
+    return list(names.items())
+
+
+def print_classes():
+    """Print the problem classes --class accepts, without importing any plugin."""
+    for name, source in available():
+        print(f"{name:<32} {source}")
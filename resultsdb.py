@@ -0,0 +1,317 @@
+"""Indexed SQLite store of FuBench results across runs.
+
+Run logs hold everything about one run, but questions across runs, such as
+one model's accuracy on a problem class over its last 30 runs, would have
+to parse every log. Each run therefore also writes one row per result to
+logs/results.sqlite3 as results complete, and `fubench.py import` loads
+existing logs. Responses stay in the run logs; the database keeps what
+queries need:
+
+    runs:    id, log, model, problem_class, started, run_info, summary
+    results: run_id, problem_index, model, problem_class, params,
+             timestamp, is_correct, error, latency, ttft, ..., batch_size
+
+Results are indexed on model, problem class, problem parameters and
+timestamp, so `fubench.py stats` and `fubench.py query` answer in
+milliseconds.
+"""
+
+import json
+import threading
+from datetime import datetime
+from pathlib import Path
+
+from runlog import read_header, read_results, read_summary
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    log TEXT UNIQUE NOT NULL,
+    model TEXT,
+    problem_class TEXT,
+    started TEXT,
+    num_problems INTEGER,
+    temperature REAL,
+    samples INTEGER,
+    seed INTEGER,
+    base_url TEXT,
+    run_info TEXT,
+    summary TEXT
+);
+CREATE INDEX IF NOT EXISTS runs_model ON runs (model, problem_class, started);
+CREATE INDEX IF NOT EXISTS runs_started ON runs (started);
+
+CREATE TABLE IF NOT EXISTS results (
+    run_id INTEGER NOT NULL REFERENCES runs (id),
+    problem_index INTEGER NOT NULL,
+    model TEXT,
+    problem_class TEXT,
+    params TEXT,
+    timestamp TEXT,
+    is_correct INTEGER,
+    error TEXT,
+    extracted_answer TEXT,
+    correct_answer TEXT,
+    latency REAL,
+    ttft REAL,
+    output_tokens INTEGER,
+    tokens_per_sec REAL,
+    num_correct INTEGER,
+    samples INTEGER,
+    cached INTEGER,
+    batch_size INTEGER,
+    PRIMARY KEY (run_id, problem_index)
+);
+CREATE INDEX IF NOT EXISTS results_model ON results (model, problem_class, timestamp);
+CREATE INDEX IF NOT EXISTS results_class ON results (problem_class, params);
+CREATE INDEX IF NOT EXISTS results_timestamp ON results (timestamp);
+"""
+
+# Columns stats() can group by
+GROUP_COLUMNS = {"model": "r.model", "class": "r.problem_class", "run": "r.run_id", "params": "r.params"}
+
+
+def run_started(timestamp):
+    """Convert a run_info timestamp (YYYYmmdd_HHMMSS) to ISO format, which sorts by time."""
+    try:
+        return datetime.strptime(timestamp, "%Y%m%d_%H%M%S").isoformat()
+    except (TypeError, ValueError):
+        return timestamp
+
+
+def _chunks(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class ResultsDB:
+    """SQLite database of runs and their results, written as results complete."""
+
+    def __init__(self, path=Path("logs") / "results.sqlite3"):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        import sqlite3
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+        # Databases created before batch_size was recorded lack the column
+        if "batch_size" not in {row[1] for row in self._db.execute("PRAGMA table_info(results)")}:
+            self._db.execute("ALTER TABLE results ADD COLUMN batch_size INTEGER")
+        self._db.commit()
+        # Problem parameters by run, to fill in the params column
+        self._params = {}
+
+    def add_run(self, log, header):
+        """
+        Register a run by its log file, or return the existing run for that log.
+
+        Args:
+            log: Run log path; a resumed or re-imported log keeps its run id
+            header: The log's header record, with run_info and problems
+
+        Returns:
+            int: Run id for add_result()
+        """
+        run_info = header['run_info']
+        values = (
+            run_info.get('model'), run_info.get('problem_class'), run_started(run_info.get('timestamp')),
+            run_info.get('num_problems'), run_info.get('temperature'), run_info.get('samples', 1),
+            run_info.get('seed'), run_info.get('base_url'), json.dumps(run_info)
+        )
+        log = str(Path(log).resolve())
+        with self._lock:
+            row = self._db.execute("SELECT id FROM runs WHERE log = ?", (log,)).fetchone()
+            if row is None:
+                run_id = self._db.execute(
+                    "INSERT INTO runs (log, model, problem_class, started, num_problems, temperature, samples, seed, base_url, run_info) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", (log, *values)
+                ).lastrowid
+            else:
+                run_id = row[0]
+                self._db.execute(
+                    "UPDATE runs SET model = ?, problem_class = ?, started = ?, num_problems = ?, temperature = ?, "
+                    "samples = ?, seed = ?, base_url = ?, run_info = ? WHERE id = ?", (*values, run_id)
+                )
+            self._db.commit()
+        self._params[run_id] = (run_info, header.get('problems'))
+        return run_id
+
+    def _row(self, run_id, result):
+        run_info, problems = self._params[run_id]
+        index = result['problem_index']
+        params = problems[index - 1] if problems and 0 < index <= len(problems) else None
+        metrics = result.get('metrics') or {}
+        is_correct = result.get('is_correct')
+        return (
+            run_id, index, result.get('model') or run_info.get('model'), run_info.get('problem_class'),
+            json.dumps(params, sort_keys=True) if params is not None else None,
+            result.get('timestamp'), None if is_correct is None else int(bool(is_correct)), result.get('error'),
+            result.get('extracted_answer'), result.get('correct_answer'),
+            metrics.get('latency'), metrics.get('ttft'), metrics.get('output_tokens'), metrics.get('tokens_per_sec'),
+            result.get('num_correct'), len(result['samples']) if result.get('samples') else None,
+            int(bool(result.get('cached'))), metrics.get('batch_size')
+        )
+
+    def add_results(self, run_id, results):
+        """
+        Store results of a run; a later result for the same problem_index replaces the earlier one.
+
+        Returns:
+            int: Number of results stored
+        """
+        count = 0
+        with self._lock:
+            for rows in _chunks((self._row(run_id, result) for result in results), 1000):
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows
+                )
+                count += len(rows)
+            self._db.commit()
+        return count
+
+    def add_result(self, run_id, result):
+        self.add_results(run_id, [result])
+
+    def set_summary(self, run_id, summary):
+        with self._lock:
+            self._db.execute("UPDATE runs SET summary = ? WHERE id = ?", (json.dumps(summary), run_id))
+            self._db.commit()
+
+    def import_log(self, path):
+        """
+        Load a run log into the database.
+
+        Reads JSONL run logs and the single-JSON logs written by older
+        versions, which have no problem class or parameters. A log written
+        by `regrade` replaces the results of the run it was re-graded from,
+        so the run is counted once, with its new grades; its run_info keeps
+        regraded_from.
+
+        Returns:
+            tuple: (run id, number of results)
+        """
+        path = Path(path)
+        if path.suffix == ".json":
+            with open(path) as f:
+                data = json.load(f)
+            header = {"run_info": data['run_info']}
+            results = [{"problem_index": i, **result} for i, result in enumerate(data['detailed_results'], 1)]
+            summary = data.get('summary')
+        else:
+            header = read_header(path)
+            results = read_results(path, responses=False)
+            summary = read_summary(path)
+            if header['run_info'].get('regraded_from'):
+                # The regraded log is written next to the original
+                path = path.with_name(Path(header['run_info']['regraded_from']).name)
+        run_id = self.add_run(path, header)
+        count = self.add_results(run_id, results)
+        if summary is not None:
+            self.set_summary(run_id, summary)
+        return run_id, count
+
+    def query(self, sql, params=()):
+        """
+        Run a read-only SQL query.
+
+        Returns:
+            tuple: (column names, list of rows)
+        """
+        with self._lock:
+            self._db.execute("PRAGMA query_only = ON")
+            try:
+                cursor = self._db.execute(sql, params)
+                columns = [column[0] for column in cursor.description or ()]
+                return columns, cursor.fetchall()
+            finally:
+                self._db.execute("PRAGMA query_only = OFF")
+
+    def output_tokens(self, model, problem_class, limit=1000):
+        """
+        Return the output token counts of a model's latest correct responses to a problem class.
+
+        Only single-sample results sent on their own count, since a
+        multi-sample result records the tokens of all its samples together
+        and a --batch-size result an equal share of its batch's tokens.
+
+        Returns:
+            list: Up to limit token counts, newest first
+        """
+        _, rows = self.query(
+            "SELECT output_tokens FROM results WHERE model = ? AND problem_class = ? AND is_correct = 1 "
+            "AND output_tokens IS NOT NULL AND samples IS NULL AND batch_size IS NULL ORDER BY timestamp DESC LIMIT ?",
+            (model, problem_class, limit)
+        )
+        return [row[0] for row in rows]
+
+    def stats(self, model=None, problem_class=None, since=None, last_runs=None, by=("model", "class")):
+        """
+        Aggregate accuracy and latency over stored results.
+
+        Args:
+            model: Only this model
+            problem_class: Only this problem class
+            since: Only results with a timestamp at or after this ISO date
+            last_runs: Only each model's last N runs that match the other
+                filters
+            by: Columns to group by: "model", "class", "run" and/or "params"
+
+        Returns:
+            tuple: (column names, list of rows), one row per group with runs,
+            problems, correct, errors, accuracy and mean latency, ttft and
+            output tokens
+        """
+        where, params = [], []
+        if model:
+            where.append("r.model = ?")
+            params.append(model)
+        if problem_class:
+            where.append("r.problem_class = ?")
+            params.append(problem_class)
+        if since:
+            where.append("r.timestamp >= ?")
+            params.append(since)
+        if last_runs:
+            run_where, run_params = [], []
+            if model:
+                run_where.append("model = ?")
+                run_params.append(model)
+            if problem_class:
+                run_where.append("problem_class = ?")
+                run_params.append(problem_class)
+            where.append(f"""r.run_id IN (
+                SELECT id FROM (
+                    SELECT id, ROW_NUMBER() OVER (PARTITION BY model ORDER BY started DESC) AS recency
+                    FROM runs {'WHERE ' + ' AND '.join(run_where) if run_where else ''}
+                ) WHERE recency <= ?)""")
+            params.extend(run_params + [last_runs])
+        groups = [GROUP_COLUMNS[column] for column in by]
+        select = ", ".join(f"{expression} AS {column}" for column, expression in zip(by, groups))
+        sql = f"""
+            SELECT {select + ',' if select else ''}
+                COUNT(DISTINCT r.run_id) AS runs,
+                COUNT(*) AS problems,
+                SUM(r.is_correct = 1) AS correct,
+                SUM(r.error IS NOT NULL) AS errors,
+                ROUND(AVG(COALESCE(r.is_correct, 0)), 4) AS accuracy,
+                ROUND(AVG(r.latency), 3) AS mean_latency,
+                ROUND(AVG(r.ttft), 3) AS mean_ttft,
+                ROUND(AVG(r.output_tokens), 1) AS mean_output_tokens
+            FROM results r
+            {'WHERE ' + ' AND '.join(where) if where else ''}
+            {'GROUP BY ' + ', '.join(groups) if groups else ''}
+            {'ORDER BY ' + ', '.join(groups) if groups else ''}
+        """
+        return self.query(sql, params)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
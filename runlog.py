@@ -0,0 +1,250 @@
+"""Append-only JSONL run logs for FuBench.
+
+A run log holds one JSON record per line:
+
+    {"type": "header", "run_info": {...}, "problems": [...]}
+    {"type": "result", ...}            # one per completed problem
+    {"type": "summary", "summary": {...}}
+
+Results are appended and flushed as soon as they complete, so a crashed or
+interrupted run keeps everything finished so far and can be resumed.
+
+Results are stored compactly. The prompt template is kept once, in the
+header's run_info, and each result holds only the text substituted for
+{problem} under "prompt_problem". Responses longer than INLINE_LIMIT
+characters go to a sidecar file next to the log, <log>.responses.gz, with
+each response compressed as its own gzip member. The result then holds
+{"gz": [offset, length]} in place of the text, so one response can be read
+without decompressing the others, and `zcat` still reads the whole file.
+read_results() restores prompts and responses, so readers see the same
+results that were written.
+"""
+
+import gzip
+import json
+import os
+from pathlib import Path
+
+# Responses up to this many characters stay inline in the log
+INLINE_LIMIT = 512
+
+# Stands in for the problem text when splitting a prompt template
+_MARKER = "\x00"
+
+
+def responses_path(path):
+    """Return the sidecar file holding a run log's compressed responses."""
+    path = Path(path)
+    return path.with_name(path.stem + ".responses.gz")
+
+
+def _template_parts(run_info):
+    """Split the run's prompt template into the text before and after {problem}, or None."""
+    template = (run_info or {}).get("prompt_template")
+    if not template:
+        return None
+    try:
+        parts = template.format(problem=_MARKER).split(_MARKER)
+    except (IndexError, KeyError, ValueError):
+        return None
+    return parts if len(parts) == 2 else None
+
+
+class RunLogWriter:
+    """Append records to a JSONL run log, flushing after every record."""
+
+    def __init__(self, path, header=None):
+        """
+        Args:
+            path: Log file; a new log must not exist yet, and an existing
+                one is appended to
+            header: Run header dict, written first when starting a new log
+
+        Raises:
+            FileExistsError: If header is given and path already exists
+        """
+        self.path = path
+        self._responses = None
+        # Never write a second run into an existing log
+        self._file = open(path, 'a' if header is None else 'x')
+        if self._file.tell() > 0:
+            # Terminate a line left truncated by a crash before appending
+            with open(path, 'rb') as f:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    self._file.write("\n")
+        if header is not None:
+            self._write_header(header)
+            os.fsync(self._file.fileno())
+        elif self._file.tell() > 0:
+            header = read_header(path)  # Resuming; prompts are stored against its template
+        self._template = _template_parts(header.get("run_info")) if header else None
+
+    def _write(self, record):
+        self._file.write(json.dumps(record) + "\n")
+        self._file.flush()
+
+    def _write_header(self, header):
+        """Write the header record, streaming its problems one at a time."""
+        record = {"type": "header", **header}
+        problems = record.pop("problems", None)
+        if problems is None:
+            self._write(record)
+            return
+        # The same text json.dumps() gives with the problems as a list
+        self._file.write(json.dumps(record)[:-1] + ', "problems": [')
+        for j, params in enumerate(problems):
+            self._file.write((", " if j else "") + json.dumps(params))
+        self._file.write("]}\n")
+        self._file.flush()
+
+    def _store(self, text):
+        """Return text, or a reference to it in the sidecar file if it is long."""
+        if not isinstance(text, str) or len(text) <= INLINE_LIMIT:
+            return text
+        if self._responses is None:
+            self._responses = open(responses_path(self.path), 'ab')
+        offset = self._responses.tell()
+        data = gzip.compress(text.encode(), compresslevel=6, mtime=0)
+        self._responses.write(data)
+        # The response must be on disk before the record that points to it
+        self._responses.flush()
+        return {"gz": [offset, len(data)]}
+
+    def write_result(self, result):
+        record = {"type": "result"}
+        for key, value in result.items():
+            if key == "prompt" and self._template and isinstance(value, str):
+                prefix, suffix = self._template
+                if value.startswith(prefix) and value.endswith(suffix) and len(value) >= len(prefix) + len(suffix):
+                    record["prompt_problem"] = value[len(prefix):len(value) - len(suffix)]
+                    continue
+            if key == "full_response":
+                value = self._store(value)
+            elif key == "samples":
+                value = [{**sample, "full_response": self._store(sample.get("full_response"))} for sample in value]
+            record[key] = value
+        self._write(record)
+
+    def write_summary(self, summary):
+        self._write({"type": "summary", "summary": summary})
+
+    def close(self):
+        if self._responses is not None:
+            os.fsync(self._responses.fileno())
+            self._responses.close()
+        os.fsync(self._file.fileno())
+        self._file.close()
+
+
+def _iter_lines(path):
+    """Yield (offset, record) for every complete record in a JSONL log."""
+    with open(path, 'rb') as f:
+        offset = 0
+        for line in f:
+            start = offset
+            offset += len(line)
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # A crash can leave a truncated final line; skip it
+                continue
+            yield start, record
+
+
+def iter_records(path):
+    """Yield every record in a run log, in file order."""
+    for _, record in _iter_lines(path):
+        yield record
+
+
+def read_header(path):
+    """Return the header record of a run log."""
+    for record in iter_records(path):
+        if record.get("type") == "header":
+            return record
+    raise ValueError(f"{path} has no header record")
+
+
+def read_summary(path):
+    """Return the last summary written to a run log, or None."""
+    summary = None
+    for record in iter_records(path):
+        if record.get("type") == "summary":
+            summary = record["summary"]
+    return summary
+
+
+class _ResponseReader:
+    """Read responses back from a run log's sidecar file, opening it on first use."""
+
+    def __init__(self, path):
+        self.path = responses_path(path)
+        self._file = None
+
+    def load(self, value):
+        if not isinstance(value, dict) or "gz" not in value:
+            return value
+        if self._file is None:
+            self._file = open(self.path, 'rb')
+        offset, length = value["gz"]
+        self._file.seek(offset)
+        return gzip.decompress(self._file.read(length)).decode()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+
+
+def _expand(record, template, responses):
+    """Restore the prompt and, if responses is given, the response texts of a stored result."""
+    result = {}
+    for key, value in record.items():
+        if key == "type":
+            continue
+        if key == "prompt_problem" and template:
+            result["prompt"] = template[0] + value + template[1]
+            continue
+        if key == "full_response":
+            if responses:
+                value = responses.load(value)
+            elif isinstance(value, dict):
+                value = None
+        elif key == "samples" and responses:
+            value = [{**sample, "full_response": responses.load(sample.get("full_response"))} for sample in value]
+        result[key] = value
+    return result
+
+
+def read_results(path, responses=True):
+    """
+    Yield the result records of a run log in problem_index order.
+
+    Results are appended in completion order and a resumed run may write a
+    problem more than once, so the last record for each index wins. Only
+    the (index, offset) pairs are kept in memory; each result is read back
+    from disk as it is yielded.
+
+    Args:
+        path: Run log
+        responses: Decompress the response texts; if False, compressed
+            full_response values are None, which is faster when only the
+            grades and metrics are needed
+    """
+    offsets = {}
+    template = None
+    for offset, record in _iter_lines(path):
+        if record.get("type") == "result":
+            offsets[record["problem_index"]] = offset
+        elif record.get("type") == "header":
+            template = _template_parts(record.get("run_info"))
+
+    reader = _ResponseReader(path) if responses else None
+    try:
+        with open(path, 'rb') as f:
+            for index in sorted(offsets):
+                f.seek(offsets[index])
+                yield _expand(json.loads(f.readline()), template, reader)
+    finally:
+        if reader:
+            reader.close()
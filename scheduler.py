@@ -0,0 +1,545 @@
+"""Request scheduling for FuBench: retries, backoff, adaptive concurrency, deduplication, hedging and budgets."""
+
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+
+from metrics import percentile, usage_cost
+
+# Status codes that are worth retrying besides 429
+TRANSIENT_STATUS_CODES = {408, 409, 500, 502, 503, 504, 520, 522, 524, 529}
+
+
+def classify_error(error):
+    """
+    Classify an exception raised by the OpenAI client.
+
+    Returns:
+        str or None: "throttle" for rate limiting, "transient" for errors that
+        are likely to succeed on retry, or None if the error is permanent.
+    """
+    # Imported here so that importing this module does not load openai
+    from openai import APIConnectionError, APIStatusError, RateLimitError
+    if isinstance(error, RateLimitError):
+        return "throttle"
+    if isinstance(error, APIStatusError):
+        if error.status_code == 429:
+            return "throttle"
+        if error.status_code in TRANSIENT_STATUS_CODES:
+            return "transient"
+        return None
+    if isinstance(error, APIConnectionError):  # Includes timeouts
+        return "transient"
+    return None
+
+
+def retry_after(error):
+    """Return the delay in seconds requested by a Retry-After header, if any."""
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    headers = response.headers
+
+    value = headers.get("retry-after-ms")
+    if value is not None:
+        try:
+            return max(0.0, float(value) / 1000)
+        except ValueError:
+            pass
+
+    value = headers.get("retry-after")
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    # Retry-After may also be an HTTP date
+    from email.utils import parsedate_to_datetime
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class RequestCancelled(Exception):
+    """
+    Raised by RequestScheduler.call() after cancel() instead of sending or
+    retrying, and by a request that closed its stream when cancelled.
+    """
+
+
+class RequestScheduler:
+    """
+    Run API calls under an adaptive in-flight limit with retries.
+
+    The limit follows AIMD (additive increase, multiplicative decrease):
+    every throttled request halves it, at most once per cooldown window,
+    and every successful request raises it by 1/limit, so it grows by about
+    one slot per round of successful requests until it reaches
+    max_concurrency again. Throttled and transient failures are retried
+    with jittered exponential backoff, honoring Retry-After when the
+    provider sends one.
+    """
+
+    def __init__(self, max_concurrency, min_concurrency=1, max_retries=6,
+                 base_delay=1.0, max_delay=60.0, decrease_factor=0.5):
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min(min_concurrency, max_concurrency)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.decrease_factor = decrease_factor
+
+        self.limit = float(max_concurrency)
+        self.in_flight = 0
+        self._cond = threading.Condition()
+        self._last_decrease = 0.0
+        self._cancelled = threading.Event()
+
+        self.stats = {
+            "requests": 0,
+            "retries": 0,
+            "throttles": 0,
+            "transient_errors": 0,
+            "failures": 0,
+            "min_limit": max_concurrency,
+        }
+
+    def _acquire(self):
+        with self._cond:
+            while self.in_flight >= max(self.min_concurrency, int(self.limit)):
+                if self._cancelled.is_set():
+                    raise RequestCancelled()
+                self._cond.wait()
+            self.in_flight += 1
+            self.stats["requests"] += 1
+
+    def _release(self):
+        with self._cond:
+            self.in_flight -= 1
+            self._cond.notify_all()
+
+    def _on_success(self):
+        with self._cond:
+            if self.limit < self.max_concurrency:
+                self.limit = min(self.max_concurrency, self.limit + 1.0 / self.limit)
+                self._cond.notify_all()
+
+    def _on_throttle(self, delay):
+        with self._cond:
+            self.stats["throttles"] += 1
+            # A burst of 429s from one overload event should only count once
+            now = time.monotonic()
+            if now - self._last_decrease < max(delay, self.base_delay):
+                return
+            self._last_decrease = now
+            self.limit = max(self.min_concurrency, self.limit * self.decrease_factor)
+            self.stats["min_limit"] = min(self.stats["min_limit"], int(self.limit))
+
+    def cancel(self):
+        """
+        Stop sending requests: queued and retrying calls raise RequestCancelled.
+
+        Requests already on the wire are left to finish.
+        """
+        self._cancelled.set()
+        with self._cond:
+            self._cond.notify_all()
+
+    def backoff(self, attempt, error=None):
+        """Return the delay before retry number attempt (0-based)."""
+        requested = retry_after(error) if error is not None else None
+        if requested is not None:
+            # Honor the provider, plus a little jitter to avoid a thundering herd
+            return min(self.max_delay, requested) + random.uniform(0, self.base_delay)
+        # Full jitter exponential backoff
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def call(self, fn, *args, **kwargs):
+        """
+        Call fn(*args, **kwargs) once a slot is free, retrying retryable errors.
+
+        Returns:
+            The return value of fn.
+
+        Raises:
+            The last exception if it is permanent or retries are exhausted,
+            or RequestCancelled once cancel() has been called.
+        """
+        attempt = 0
+        while True:
+            if self._cancelled.is_set():
+                raise RequestCancelled()
+            self._acquire()
+            try:
+                result = fn(*args, **kwargs)
+            except RequestCancelled:
+                self._release()
+                raise
+            except Exception as e:
+                self._release()
+                kind = classify_error(e)
+                if kind is None or attempt >= self.max_retries:
+                    with self._cond:
+                        self.stats["failures"] += 1
+                    raise
+                delay = self.backoff(attempt, e)
+                if kind == "throttle":
+                    self._on_throttle(delay)
+                else:
+                    with self._cond:
+                        self.stats["transient_errors"] += 1
+                with self._cond:
+                    self.stats["retries"] += 1
+                attempt += 1
+                self._cancelled.wait(delay)
+                continue
+            self._release()
+            self._on_success()
+            return result
+
+
+class _Released(Exception):
+    """Set on a claim given up by RequestCoalescer.release(); waiters claim again."""
+
+
+class RequestCoalescer:
+    """
+    Send identical requests once and share the response.
+
+    The first caller for a key sends the request, and callers with the same
+    key that arrive while it is in flight wait for it. Responses are not
+    kept once shared, so a later caller sends the request again (or finds
+    it in the response cache). A failed request is not shared with later
+    callers either, but callers already waiting share the error.
+    """
+
+    def __init__(self):
+        self._futures = {}
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "deduplicated": 0}
+
+    def claim(self, key):
+        """
+        Claim key, or join the request already sent for it.
+
+        Returns:
+            tuple: (Future for the response, True if the caller must send
+            the request and then resolve() or release() the claim)
+        """
+        with self._lock:
+            future = self._futures.get(key)
+            if future is not None:
+                return future, False
+            future = self._futures[key] = Future()
+            return future, True
+
+    def resolve(self, key, future, value):
+        """Share the response to a claimed request with the callers waiting on it."""
+        with self._lock:
+            self.stats["requests"] += 1
+            if self._futures.get(key) is future:
+                del self._futures[key]
+        future.set_result(value)
+
+    def release(self, key, future, error=None):
+        """
+        Give up a claim without a response.
+
+        Callers waiting on it raise error, or claim the key again if error
+        is None.
+        """
+        with self._lock:
+            if self._futures.get(key) is future:
+                del self._futures[key]
+        future.set_exception(error or _Released())
+
+    def call(self, key, fn, *args, **kwargs):
+        """
+        Return fn(*args, **kwargs), unless it has been called for key already.
+
+        Returns:
+            tuple: (return value of fn, True if it came from another
+            caller's request)
+        """
+        while True:
+            future, leader = self.claim(key)
+            if leader:
+                break
+            try:
+                value = future.result()
+            except _Released:
+                continue
+            with self._lock:
+                self.stats["deduplicated"] += 1
+            return value, True
+        try:
+            value = fn(*args, **kwargs)
+        except BaseException as e:
+            self.release(key, future, e)
+            raise
+        self.resolve(key, future, value)
+        return value, False
+
+
+class _Sending:
+    """Context wrapped around each try of one copy of a hedged request, recording when it was sent."""
+
+    def __init__(self):
+        self.tries = 0
+        self.failed = False
+        self.last = None
+        self.first = Future()  # Resolves to the time of the first try
+
+    def __enter__(self):
+        self.tries += 1
+        self.last = time.perf_counter()
+        if self.tries == 1:
+            self.first.set_result(self.last)
+
+    def __exit__(self, error_type, error, traceback):
+        if error_type is not None:
+            self.failed = True  # The scheduler may be backing off to retry
+
+
+class RequestHedger:
+    """
+    Send a backup copy of requests that run past a latency percentile.
+
+    A request is timed from when it is sent, so the wait for a scheduler
+    slot does not count, and a request being retried is not hedged, since
+    the scheduler is already sending it again. The threshold is the given
+    percentile of the latencies of recent attempts, including the losing
+    copies of hedged requests, so it follows the endpoint as it speeds up
+    or slows down. No request is
+    hedged until min_samples latencies are known, and hedges are capped
+    at budget times the number of requests. Whichever copy finishes first
+    wins; the other is told to stop through its cancelled event.
+    """
+
+    def __init__(self, percentile=95.0, budget=0.05, min_samples=20, window=1000, max_workers=64):
+        """
+        Args:
+            percentile: Latency percentile after which a backup is sent
+            budget: Maximum backups as a fraction of requests
+            min_samples: Latencies needed before hedging starts
+            window: Recent latencies the percentile is computed over
+            max_workers: Threads running attempts, about twice the
+                concurrency
+        """
+        self.percentile = percentile
+        self.budget = budget
+        self.min_samples = min_samples
+        self.latencies = deque(maxlen=window)
+        self.stats = {"requests": 0, "hedges": 0, "wins": 0, "threshold": None}
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers)
+
+    def threshold(self):
+        """Return the current hedging delay in seconds, or None before min_samples latencies."""
+        with self._lock:
+            if len(self.latencies) < self.min_samples:
+                return None
+            latencies = list(self.latencies)
+        return percentile(latencies, self.percentile)
+
+    def _attempt(self, fn, cancelled, sending):
+        try:
+            value = fn(cancelled, sending)
+        except RequestCancelled:
+            # A copy stopped after losing still ran at least this long
+            if cancelled.is_set():
+                self._add_latency(sending.last)
+            raise
+        self._add_latency(sending.last)
+        return value
+
+    def _add_latency(self, sent):
+        if sent is None:
+            return  # Never sent
+        with self._lock:
+            self.latencies.append(time.perf_counter() - sent)
+
+    def call(self, fn):
+        """
+        Call fn(cancelled, sending), and again if the first call is slow; return the first result.
+
+        fn must send each try of the request inside `with sending:`, once
+        it holds a scheduler slot, so that the wait for the slot is not
+        timed and a retry is not hedged. It should stop early, if it can, once its cancelled threading.Event
+        is set, by raising RequestCancelled. An error from one copy is
+        ignored while the other may still succeed.
+
+        Returns:
+            tuple: (return value of fn, None if no backup was sent, else
+            "primary" or "backup" for the copy that finished first)
+        """
+        with self._lock:
+            self.stats["requests"] += 1
+        delay = self.threshold()
+        primary_cancelled = threading.Event()
+        primary_sending = _Sending()
+        primary = self._pool.submit(self._attempt, fn, primary_cancelled, primary_sending)
+        if delay is None:
+            return primary.result(), None
+
+        # Start the timer once the request is sent, not while it waits for a slot
+        wait([primary, primary_sending.first], return_when=FIRST_COMPLETED)
+        if primary.done():
+            return primary.result(), None
+        remaining = delay - (time.perf_counter() - primary_sending.first.result())
+        done, _ = wait([primary], timeout=max(0.0, remaining))
+        if done:
+            return primary.result(), None
+        with self._lock:
+            if primary_sending.failed:
+                hedge = False  # Retrying; a backup would only add to the load
+            elif self.stats["hedges"] >= self.budget * self.stats["requests"]:
+                hedge = False
+            else:
+                hedge = True
+                self.stats["hedges"] += 1
+                self.stats["threshold"] = delay
+        if not hedge:
+            return primary.result(), None
+
+        backup_cancelled = threading.Event()
+        backup = self._pool.submit(self._attempt, fn, backup_cancelled, _Sending())
+        copies = {primary: ("primary", backup_cancelled), backup: ("backup", primary_cancelled)}
+        pending = set(copies)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    winner, loser_cancelled = copies[future]
+                    loser_cancelled.set()
+                    if winner == "backup":
+                        with self._lock:
+                            self.stats["wins"] += 1
+                    return future.result(), winner
+        return primary.result(), None  # Both failed; raise the primary's error
+
+    def close(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+class BudgetGovernor:
+    """
+    Decide when a run must stop sending requests to stay within its limits.
+
+    The limits are on total tokens, cost and wall time, counted from the
+    start of this invocation. A run stops as soon as what it has spent,
+    plus what the requests sent or queued are likely to add, reaches a
+    limit; callers check before queueing each request, so nothing is sent
+    that was not counted. Each result is expected to use as many tokens,
+    and cost as much, as the largest recent result plus a margin, since
+    early on few results are known, and to take the 95th-percentile
+    latency. A request carries up to batch_size prompts, each giving a
+    result, so it counts as batch_size results. Stopping with that margin
+    leaves room for the requests in flight to finish instead of being
+    thrown away. Until the first result is known nothing can be estimated,
+    so callers send one request and wait while estimating() is True.
+    Requests cannot run past the wall-time limit: they time out at
+    deadline().
+    """
+
+    # Limits in the order they are checked, with the summary key they compare against
+    LIMITS = (("max_total_tokens", "tokens"), ("max_cost", "cost"), ("max_wall_time", "wall_time"))
+
+    def __init__(self, max_total_tokens=None, max_cost=None, max_wall_time=None, prices=None, window=1000, margin=0.25, batch_size=1):
+        """
+        Args:
+            max_total_tokens: Prompt plus output tokens allowed, or None
+            max_cost: USD allowed, or None; needs prices
+            max_wall_time: Seconds allowed, or None
+            prices: (prompt, output) prices in USD per million tokens
+            window: Recent results the estimates are computed over
+            margin: Fraction added to the largest recent result's tokens
+                and cost when estimating a result in flight
+            batch_size: Prompts, and so results, each request carries
+        """
+        self.max_total_tokens = max_total_tokens
+        self.max_cost = max_cost
+        self.max_wall_time = max_wall_time
+        self.prices = prices
+        self.margin = margin
+        self.batch_size = batch_size
+        self.tokens = 0
+        self.cost = 0.0
+        self.stopped = None
+        self._start = time.monotonic()
+        self._tokens = deque(maxlen=window)
+        self._costs = deque(maxlen=window)
+        self._latencies = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def elapsed(self):
+        return time.monotonic() - self._start
+
+    def deadline(self):
+        """Return the time.monotonic() value at which max_wall_time runs out, or None."""
+        return self._start + self.max_wall_time if self.max_wall_time is not None else None
+
+    def add(self, metrics):
+        """Count the usage and latency of one finished result; results without metrics cost nothing."""
+        if not metrics:
+            return
+        prompt_tokens = metrics.get("prompt_tokens") or 0
+        output_tokens = metrics.get("output_tokens") or 0
+        cost = usage_cost(prompt_tokens, output_tokens, self.prices) if self.prices else 0.0
+        with self._lock:
+            self.tokens += prompt_tokens + output_tokens
+            self.cost += cost
+            self._tokens.append(prompt_tokens + output_tokens)
+            self._costs.append(cost)
+            if metrics.get("latency") is not None:
+                self._latencies.append(metrics["latency"])
+
+    def estimating(self):
+        """Return True until a result's usage is known; until then a request in flight cannot be estimated."""
+        with self._lock:
+            return not self._tokens
+
+    def spent(self):
+        """Return what has been used so far: tokens, cost (0 without prices) and wall_time."""
+        with self._lock:
+            return {"tokens": self.tokens, "cost": self.cost, "wall_time": self.elapsed()}
+
+    def check(self, in_flight):
+        """
+        Stop once a limit would be reached by the requests in flight.
+
+        Args:
+            in_flight: Requests sent or queued whose results have not been
+                added yet, including one about to be queued
+
+        Returns:
+            dict: The stop, with reason (the limit's name), limit, the
+            requests in flight and spent_at_stop, the spend() when it was
+            reached; or None while the run is within its limits. Once
+            stopped, the same stop is returned every time
+        """
+        if self.stopped:
+            return self.stopped
+        with self._lock:
+            # Results are estimated, so count each request as a full batch of them
+            sending = in_flight * self.batch_size
+            expected = {
+                "tokens": self.tokens + sending * max(self._tokens, default=0) * (1 + self.margin),
+                "cost": self.cost + sending * max(self._costs, default=0) * (1 + self.margin),
+                # Requests run in parallel, so in-flight ones add one latency, not one each
+                "wall_time": self.elapsed() + ((percentile(self._latencies, 95) or 0) if in_flight else 0)
+            }
+        for name, key in self.LIMITS:
+            limit = getattr(self, name)
+            if limit is not None and expected[key] >= limit:
+                self.stopped = {"reason": name, "limit": limit, "in_flight": in_flight, "spent_at_stop": self.spent()}
+                break
+        return self.stopped
+
+    def overrun(self):
+        """Return True once the wall-time limit itself has passed, so requests still in flight are abandoned."""
+        return self.max_wall_time is not None and self.elapsed() >= self.max_wall_time
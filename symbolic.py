@@ -0,0 +1,241 @@
+"""Optional symbolic answer verification for FuBench, using SymPy.
+
+The problem classes check answers by exact string or JSON comparison, so an
+answer that is right but written differently, such as \\frac{68}{2} for 34
+or \\sec\\theta\\cos\\theta for 1, counts as wrong. verify() parses the
+answer with SymPy's LaTeX parser and tests whether it equals the expected
+value. Symbolic simplification is CPU-heavy and can hang on hostile input,
+so SymbolicVerifier runs each check in a process pool with a timeout and
+memoizes the verdicts.
+
+SymPy and its LaTeX parser are optional dependencies:
+
+    pip install sympy antlr4-python3-runtime==4.11
+"""
+
+import json
+import re
+import signal
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+# Verdicts of verify()
+EQUIVALENT = "equivalent"
+NOT_EQUIVALENT = "not_equivalent"
+UNPARSABLE = "unparsable"
+TIMEOUT = "timeout"
+
+
+def available():
+    """Return True if SymPy and its LaTeX parser can be imported."""
+    try:
+        import sympy  # noqa: F401
+        import antlr4  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def normalize(answer):
+    """Strip math delimiters, \\boxed{} and whitespace, so trivially different answers share a verdict."""
+    text = answer.strip()
+    while len(text) >= 2 and text[0] == text[-1] == "$":
+        text = text[1:-1].strip()
+    match = re.fullmatch(r"\\boxed\{(.*)\}", text, re.DOTALL)
+    if match:
+        text = match.group(1)
+    return " ".join(text.split())
+
+
+def _split_list(text):
+    """Split "[a, b, c]" into its top-level elements, or return None if text is not a list."""
+    if not (text.startswith("[") and text.endswith("]")):
+        return None
+    elements, depth, start = [], 0, 1
+    for i, char in enumerate(text[1:-1], 1):
+        if char in "([{":
+            depth += 1
+        elif char in ")]}":
+            depth -= 1
+        elif char == "," and depth == 0:
+            elements.append(text[start:i])
+            start = i + 1
+    elements.append(text[start:-1])
+    return [element.strip() for element in elements if element.strip()]
+
+
+def _parse(text):
+    """Parse one expression, as LaTeX first and then as plain SymPy syntax."""
+    from sympy import sympify
+    from sympy.parsing.latex import parse_latex
+    try:
+        return parse_latex(text)
+    except Exception:
+        return sympify(text.replace("^", "**"))
+
+
+def _parse_expected(expected):
+    """Parse an expected value from solve(): JSON numbers or lists, else an expression."""
+    from sympy import Integer, Rational, nsimplify
+    try:
+        value = json.loads(expected)
+    except ValueError:
+        return _parse(expected)
+
+    def convert(item):
+        if isinstance(item, list):
+            return [convert(element) for element in item]
+        if isinstance(item, int):
+            return Integer(item)
+        return nsimplify(item, rational=True) if isinstance(item, float) else Rational(item)
+    return convert(value)
+
+
+def _equal(a, b):
+    from sympy import simplify
+    if isinstance(a, list) or isinstance(b, list):
+        return isinstance(a, list) and isinstance(b, list) and len(a) == len(b) \
+            and all(_equal(x, y) for x, y in zip(a, b))
+    return simplify(a - b) == 0
+
+
+class _Timeout(Exception):
+    pass
+
+
+def _on_alarm(signum, frame):
+    raise _Timeout()
+
+
+def verify(answer, expected, timeout=None):
+    """
+    Test whether an answer is mathematically equal to the expected value.
+
+    Lists such as "[\\frac{68}{2}, 79]" are compared element by element, in
+    order. Runs in the calling process; the timeout uses SIGALRM, so it is
+    only enforced in the main thread on platforms that have it.
+
+    Args:
+        answer: Extracted answer text, LaTeX or plain
+        expected: The problem's solve() value
+        timeout: Seconds before giving up, or None
+
+    Returns:
+        str: EQUIVALENT, NOT_EQUIVALENT, UNPARSABLE or TIMEOUT
+    """
+    use_alarm = (timeout and hasattr(signal, "setitimer")
+                 and threading.current_thread() is threading.main_thread())
+    if use_alarm:
+        previous = signal.signal(signal.SIGALRM, _on_alarm)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        text = normalize(answer)
+        try:
+            elements = _split_list(text)
+            parsed = [_parse(element) for element in elements] if elements is not None else _parse(text)
+            target = _parse_expected(expected)
+        except _Timeout:
+            raise
+        except Exception:
+            return UNPARSABLE
+        return EQUIVALENT if _equal(parsed, target) else NOT_EQUIVALENT
+    except _Timeout:
+        return TIMEOUT
+    except Exception:
+        return NOT_EQUIVALENT  # e.g. comparing a matrix with a number
+    finally:
+        if use_alarm:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, previous)
+
+
+def new_stats():
+    """Return zeroed counts of checks, memo hits, errors and each verdict."""
+    return {"checks": 0, "memo_hits": 0, "errors": 0,
+            EQUIVALENT: 0, NOT_EQUIVALENT: 0, UNPARSABLE: 0, TIMEOUT: 0}
+
+
+def _chain(source):
+    """Return a new Future that resolves with the outcome of source."""
+    future = Future()
+
+    def copy(source):
+        if source.cancelled():
+            future.cancel()
+        elif not future.set_running_or_notify_cancel():
+            pass  # Cancelled by its caller, e.g. when a model stops early
+        elif source.exception() is not None:
+            future.set_exception(source.exception())
+        else:
+            future.set_result(source.result())
+    source.add_done_callback(copy)
+    return future
+
+
+class SymbolicVerifier:
+    """
+    Run verify() in a process pool, memoizing verdicts.
+
+    submit() returns at once with a Future, so grading never holds up the
+    threads that send requests. Verdicts are memoized on the normalized
+    answer and the expected value; a check already in flight is shared
+    rather than run twice. Every submit() still gets its own Future, so
+    callers can tell repeated checks apart.
+    """
+
+    def __init__(self, jobs=None, timeout=5.0, memo_size=100000):
+        """
+        Args:
+            jobs: Worker processes (default: CPU count)
+            timeout: Seconds allowed per check
+            memo_size: Verdicts kept in memory, least recently used first out
+        """
+        self.timeout = timeout
+        self.memo_size = memo_size
+        self.stats = new_stats()
+        from concurrent.futures import ProcessPoolExecutor
+        self._pool = ProcessPoolExecutor(max_workers=jobs)
+        self._memo = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, answer, expected, stats=None):
+        """
+        Start checking answer against expected.
+
+        Args:
+            stats: Optional dict from new_stats() that counts this check
+                too, e.g. one model's checks when models share the verifier
+
+        Returns:
+            Future: Resolves to the verdict of verify(); a new Future on
+            every call, even when the verdict is memoized
+        """
+        key = (normalize(answer), expected)
+        counters = [self.stats] if stats is None else [self.stats, stats]
+        with self._lock:
+            future = self._memo.get(key)
+            if future is not None:
+                self._memo.move_to_end(key)
+                for counter in counters:
+                    counter["memo_hits"] += 1
+                return _chain(future)
+            for counter in counters:
+                counter["checks"] += 1
+            future = self._pool.submit(verify, answer, expected, self.timeout)
+            self._memo[key] = future
+            while len(self._memo) > self.memo_size:
+                self._memo.popitem(last=False)
+        future.add_done_callback(lambda future: self._count(counters, future))
+        return _chain(future)
+
+    def _count(self, counters, future):
+        if future.cancelled():
+            return
+        verdict = "errors" if future.exception() else future.result()  # e.g. a crashed worker
+        with self._lock:
+            for counter in counters:
+                counter[verdict] += 1
+
+    def close(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
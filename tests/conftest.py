@@ -0,0 +1,44 @@
+"""Make FuBench's top-level modules importable from the tests, and run it against an in-process mock server."""
+
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+@pytest.fixture
+def mock_endpoint():
+    """Start mock_server.py in-process; call with MockConfig arguments to get its base URL."""
+    from mock_server import MockConfig, make_server
+    servers = []
+
+    def start(**config):
+        config = {"latency_median": 0.0, "seed": 0, **config}
+        server = make_server("127.0.0.1", 0, MockConfig(**config))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return f"http://127.0.0.1:{server.server_address[1]}/v1"
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture
+def fubench(tmp_path, monkeypatch):
+    """Run `fubench.py` with the given arguments in an empty working directory."""
+    import cli
+    monkeypatch.chdir(tmp_path)
+
+    def run(*args):
+        monkeypatch.setattr(sys, "argv", ["fubench.py", *map(str, args)])
+        cli.run()
+    return run
+
+
+def run_logs(directory="logs"):
+    """Return the run logs written so far, oldest first."""
+    return sorted(Path(directory).glob("fubench_run_*.jsonl"), key=lambda path: path.stat().st_mtime_ns)
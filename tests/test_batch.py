@@ -0,0 +1,19 @@
+import pytest
+
+from conftest import run_logs
+from runlog import read_results
+
+
+@pytest.mark.parametrize("batch_limit, fallbacks", [(None, 0), (2, 4), (0, 8)])
+def test_batch_falls_back_for_unanswered_prompts(fubench, mock_endpoint, batch_limit, fallbacks):
+    # batch_limit 2 answers the first two prompts of each batch of 4; 0 rejects list prompts
+    base_url = mock_endpoint(batch_limit=batch_limit)
+    fubench("--base-url", base_url, "--num-problems", 8, "--batch-size", 4, "--concurrency", 2,
+            "--no-cache", "--no-dedup", "--seed", 0)
+    [log] = run_logs()
+    results = list(read_results(log))
+    assert [r["problem_index"] for r in results] == list(range(1, 9))
+    assert all(r.get("metrics") for r in results)  # Every prompt got a response
+    assert sum(bool(r.get("batch_fallback")) for r in results) == fallbacks
+    batched = [r for r in results if not r.get("batch_fallback")]
+    assert all(r["metrics"].get("batch_size") for r in batched)
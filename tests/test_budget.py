@@ -0,0 +1,42 @@
+import json
+
+import pytest
+
+from conftest import run_logs
+from runlog import read_results, read_summary
+from scheduler import BudgetGovernor
+
+
+@pytest.mark.parametrize("batch_size", [1, 3])
+def test_budget_stop_writes_a_complete_run(fubench, mock_endpoint, batch_size):
+    # 429s keep requests queued and retrying when the budget stops the run
+    base_url = mock_endpoint(throttle_rate=0.5, retry_after=0.05)
+    fubench("--base-url", base_url, "--num-problems", 60, "--concurrency", 4, "--batch-size", batch_size,
+            "--max-total-tokens", 3000, "--no-cache", "--seed", 0)
+    [log] = run_logs()
+    summary = read_summary(log)
+    stop = summary["budget_stop"]
+    assert stop["reason"] == "max_total_tokens"
+    assert stop["evaluated"] < stop["planned"] == 60
+    results = list(read_results(log))
+    assert len(results) == stop["evaluated"]
+    assert not any(r.get("cancelled") for r in results)  # Unsent problems are left for --resume
+    with open("results.json") as f:
+        assert json.load(f)["budget_stop"]["reason"] == "max_total_tokens"
+
+
+def test_batched_run_stays_within_token_limit(fubench, mock_endpoint):
+    base_url = mock_endpoint()
+    fubench("--base-url", base_url, "--num-problems", 400, "--concurrency", 4, "--batch-size", 10,
+            "--max-total-tokens", 5000, "--no-cache", "--seed", 0)
+    [log] = run_logs()
+    stop = read_summary(log)["budget_stop"]
+    assert stop["reason"] == "max_total_tokens"
+    assert 0 < stop["spent"]["tokens"] < 5000
+
+
+def test_governor_counts_each_request_as_a_batch():
+    governor = BudgetGovernor(max_total_tokens=1000, margin=0.0, batch_size=10)
+    governor.add({"prompt_tokens": 5, "output_tokens": 5})
+    assert governor.check(8) is None  # 10 + 8 requests x 10 results x 10 tokens
+    assert governor.check(10)["reason"] == "max_total_tokens"
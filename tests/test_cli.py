@@ -0,0 +1,84 @@
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+from conftest import run_logs
+from resultsdb import ResultsDB
+from runlog import read_results, read_summary
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def test_dry_run_prints_plan_without_rich_or_numpy(tmp_path):
+    # Fails if rich or NumPy is imported by the time the dry run returns
+    code = ("import sys, cli; sys.argv = ['fubench.py', '--dry-run', '--num-problems', '7', '--base-url', 'http://x/v1']; "
+            "cli.run(); assert not {'rich', 'numpy'} & set(sys.modules), sorted({'rich', 'numpy'} & set(sys.modules))")
+    out = subprocess.run([sys.executable, "-c", code], cwd=tmp_path, env={"PYTHONPATH": str(ROOT)},
+                         capture_output=True, text=True, check=True).stdout
+    assert "Problems: 7" in out and "Example prompt:" in out
+    assert "no requests sent" in out
+    assert not list(tmp_path.iterdir())  # No logs written
+
+
+def test_fubench_reexports_cli():
+    import cli
+    import fubench
+    assert fubench.main is cli.main and fubench.make_problem_set is cli.make_problem_set
+    assert fubench is not cli
+
+
+def test_resume_reuses_the_logged_endpoint(fubench, mock_endpoint, monkeypatch):
+    base_url = mock_endpoint()
+    fubench("--base-url", base_url, "--num-problems", 6, "--no-cache", "--seed", 0)
+    [log] = run_logs()
+    # Cut the log after its header and two results, as a crash would
+    lines = log.read_text().splitlines(keepends=True)
+    log.write_text("".join(lines[:3]))
+    monkeypatch.delenv("OPENROUTER_API_KEY", raising=False)
+
+    fubench("--resume", log, "--no-cache")
+    results = list(read_results(log))
+    assert sorted(r["problem_index"] for r in results) == list(range(1, 7))
+    assert all(r.get("metrics") for r in results)  # Every problem got a response from the endpoint
+    assert read_summary(log)["total_problems"] == 6
+
+
+def test_resume_rejects_another_endpoint(fubench, mock_endpoint, capsys):
+    fubench("--base-url", mock_endpoint(), "--num-problems", 2, "--no-cache", "--seed", 0)
+    [log] = run_logs()
+    size = log.stat().st_size
+    fubench("--resume", log, "--base-url", "http://127.0.0.1:9/v1")
+    assert "differs from the endpoint" in capsys.readouterr().out
+    assert log.stat().st_size == size
+
+
+def test_each_model_counts_its_own_cache_hits(fubench, mock_endpoint):
+    base_url = mock_endpoint()
+    for expected in ({"hits": 0, "misses": 4, "writes": 4}, {"hits": 4, "misses": 0, "writes": 0}):
+        fubench("--base-url", base_url, "--model", "a", "b", "--num-problems", 4, "--seed", 0)
+        for log in run_logs()[-2:]:
+            assert read_summary(log)["cache_stats"] == expected
+
+
+def test_regrade_replaces_the_runs_rows_in_the_results_db(fubench, mock_endpoint):
+    fubench("--base-url", mock_endpoint(correct_rate=1.0), "--num-problems", 5, "--no-cache", "--seed", 0)
+    [log] = run_logs()
+    # Grades from an older, broken check(), in the log and the database
+    records = [json.loads(line) for line in log.read_text().splitlines()]
+    for record in records:
+        if record["type"] == "result":
+            record["is_correct"] = False
+    log.write_text("".join(json.dumps(record) + "\n" for record in records))
+    fubench("import", log)
+
+    fubench("regrade", log)
+    db = ResultsDB(Path("logs") / "results.sqlite3")
+    try:
+        _, [(runs,)] = db.query("SELECT COUNT(*) FROM runs")
+        _, [(results, correct)] = db.query("SELECT COUNT(*), SUM(is_correct) FROM results")
+        _, [(run_info,)] = db.query("SELECT run_info FROM runs")
+    finally:
+        db.close()
+    assert runs == 1 and results == 5 and correct == 5
+    assert json.loads(run_info)["regraded_from"] == str(log)
@@ -0,0 +1,30 @@
+from pathlib import Path
+
+from conftest import run_logs
+from runlog import read_header, read_results, read_summary
+
+
+def test_merge_combines_shards_in_problem_order(fubench, mock_endpoint):
+    base_url = mock_endpoint()
+    for shard in ("0/2", "1/2"):
+        fubench("--base-url", base_url, "--num-problems", 7, "--seed", 3, "--shard", shard, "--no-cache")
+    shards = run_logs()
+    fubench("merge", *shards)
+    [merged] = [log for log in run_logs() if "_merged_" in log.name]
+
+    results = list(read_results(merged))
+    assert [r["problem_index"] for r in results] == list(range(1, 8))
+    summary = read_summary(merged)
+    assert summary["total_problems"] == 7
+    assert summary["correct_count"] == sum(read_summary(log)["correct_count"] for log in shards)
+    assert read_header(merged)["run_info"]["merged_from"] == [str(log) for log in shards]
+
+
+def test_merge_rejects_logs_of_different_problem_sets(fubench, mock_endpoint, capsys):
+    base_url = mock_endpoint()
+    for seed, shard in ((3, "0/2"), (4, "1/2")):
+        fubench("--base-url", base_url, "--num-problems", 4, "--seed", seed, "--shard", shard, "--no-cache")
+    capsys.readouterr()
+    fubench("merge", *run_logs())
+    assert "disagree on problem_set_hash" in capsys.readouterr().out
+    assert not list(Path("logs").glob("*_merged_*"))
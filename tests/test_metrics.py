@@ -0,0 +1,39 @@
+import pytest
+
+from metrics import mcnemar_p, pass_at_k, pass_at_k_values, wilson_interval
+
+
+def test_wilson_interval():
+    assert wilson_interval(0, 0) == (0.0, 1.0)
+    low, high = wilson_interval(50, 100)
+    assert low == pytest.approx(0.4038, abs=1e-4)
+    assert high == pytest.approx(0.5962, abs=1e-4)
+    # Stays inside [0, 1] at the extremes, unlike the normal approximation
+    low, high = wilson_interval(0, 20)
+    assert low == 0.0 and 0.0 < high < 0.2
+    low, high = wilson_interval(20, 20)
+    assert 0.8 < low < 1.0 and high == 1.0
+
+
+def test_mcnemar_p():
+    assert mcnemar_p(0, 0) == 1.0
+    assert mcnemar_p(5, 5) == 1.0
+    # Two-sided exact binomial test of 1 vs 9 at p = 0.5
+    assert mcnemar_p(1, 9) == pytest.approx(2 * (1 + 10) / 2 ** 10)
+    assert mcnemar_p(9, 1) == mcnemar_p(1, 9)
+    assert mcnemar_p(0, 20) == pytest.approx(2 / 2 ** 20)
+
+
+def test_pass_at_k():
+    assert pass_at_k(10, 0, 1) == 0.0
+    assert pass_at_k(10, 3, 1) == pytest.approx(0.3)
+    # 1 - C(7, 3) / C(10, 3)
+    assert pass_at_k(10, 3, 3) == pytest.approx(1 - 35 / 120)
+    # Fewer than k incorrect samples: every draw of k holds a correct one
+    assert pass_at_k(10, 8, 3) == 1.0
+
+
+def test_pass_at_k_values():
+    assert pass_at_k_values(1) == [1]
+    assert pass_at_k_values(8) == [1, 2, 4, 8]
+    assert pass_at_k_values(10) == [1, 2, 4, 8, 10]
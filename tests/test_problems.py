@@ -0,0 +1,27 @@
+import hashlib
+import json
+
+from cli import problem_set_hash
+from problems import IntegerQuadraticProblem, IntegerQuadraticSpace, ProblemParams
+
+
+def test_integer_quadratic_space_matches_enumeration():
+    space = IntegerQuadraticSpace()
+    low, high = IntegerQuadraticSpace.LOW, IntegerQuadraticSpace.HIGH
+    expected = [{"x1": x1, "x2": x2} for x1 in range(low, high + 1) for x2 in range(x1, high + 1)]
+    assert space.size() == len(expected) == 19900
+    assert [space._params(index) for index in range(space.size())] == expected
+
+
+def test_integer_quadratic_space_builds_problems():
+    space = IntegerQuadraticProblem.space()
+    assert space.params(0) == {"x1": -99, "x2": -99}
+    assert space.params(len(space) - 1) == {"x1": 99, "x2": 99}
+    assert space[199].params() == {"x1": -98, "x2": -98}
+
+
+def test_problem_params_hash_like_a_list():
+    space = IntegerQuadraticProblem.space()[:50]
+    params = ProblemParams(space)
+    assert len(params) == 50 and params[3] == space.params(3)
+    assert problem_set_hash(params) == hashlib.sha256(json.dumps(list(params)).encode()).hexdigest()
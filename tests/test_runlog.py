@@ -0,0 +1,87 @@
+import gzip
+import json
+
+import pytest
+
+from runlog import INLINE_LIMIT, RunLogWriter, read_header, read_results, read_summary, responses_path
+
+TEMPLATE = "Solve: {problem}. Answer:"
+
+
+def write_log(path, results, summary=None):
+    writer = RunLogWriter(path, header={"run_info": {"prompt_template": TEMPLATE}, "problems": []})
+    for result in results:
+        writer.write_result(result)
+    if summary is not None:
+        writer.write_summary(summary)
+    writer.close()
+
+
+def result(index, response, **extra):
+    return {"problem_index": index, "prompt": TEMPLATE.format(problem=f"problem {index}"),
+            "full_response": response, "is_correct": index % 2 == 0, **extra}
+
+
+def test_round_trip(tmp_path):
+    path = tmp_path / "run.jsonl"
+    results = [result(2, "second"), result(1, "first"), result(3, None)]
+    write_log(path, results, summary={"accuracy": 0.5})
+
+    assert read_header(path)["run_info"]["prompt_template"] == TEMPLATE
+    assert read_summary(path) == {"accuracy": 0.5}
+    # Written in completion order, read in problem order
+    assert list(read_results(path)) == sorted(results, key=lambda r: r["problem_index"])
+
+
+def test_resume_keeps_last_result_and_skips_truncated_line(tmp_path):
+    path = tmp_path / "run.jsonl"
+    write_log(path, [result(1, "first"), result(2, "second")])
+    with open(path, "a") as f:
+        f.write('{"type": "result", "problem_ind')  # Crashed mid-write
+
+    writer = RunLogWriter(path)  # Resume
+    writer.write_result(result(1, "retried"))
+    writer.close()
+    assert [r["full_response"] for r in read_results(path)] == ["retried", "second"]
+
+
+def test_new_log_never_overwrites(tmp_path):
+    path = tmp_path / "run.jsonl"
+    write_log(path, [result(1, "first")])
+    with pytest.raises(FileExistsError):
+        RunLogWriter(path, header={"run_info": {}})
+
+
+def test_long_responses_round_trip_through_sidecar(tmp_path):
+    path = tmp_path / "run.jsonl"
+    long_response = "x" * (INLINE_LIMIT * 4)
+    results = [
+        result(1, long_response),
+        result(2, "short"),
+        result(3, None, samples=[{"full_response": long_response}, {"full_response": "short"}]),
+    ]
+    write_log(path, results)
+
+    assert list(read_results(path)) == results
+    # Long responses went to the sidecar, which zcat can read whole
+    assert gzip.decompress(responses_path(path).read_bytes()).decode() == long_response * 2
+    assert long_response not in path.read_text()
+    # Results store only the problem text substituted into the template
+    assert "Solve:" not in path.read_text().split("\n", 1)[1]
+
+
+def test_read_without_responses(tmp_path):
+    path = tmp_path / "run.jsonl"
+    write_log(path, [result(1, "x" * (INLINE_LIMIT + 1)), result(2, "short")])
+    responses = [r["full_response"] for r in read_results(path, responses=False)]
+    assert responses == [None, "short"]
+
+
+def test_header_problems_are_streamed_as_a_json_list(tmp_path):
+    path = tmp_path / "run.jsonl"
+    problems = [{"x1": i, "x2": -i} for i in range(5)]
+    header = {"run_info": {"prompt_template": TEMPLATE}, "problems": problems}
+    RunLogWriter(path, header={**header, "problems": iter(problems)}).close()
+    # Byte for byte what json.dumps() writes, so problem_set_hash matches
+    assert path.read_text() == json.dumps({"type": "header", **header}) + "\n"
+    assert read_header(path)["problems"] == problems
@@ -0,0 +1,260 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import scheduler
+from scheduler import RequestCancelled, RequestCoalescer, RequestHedger, RequestScheduler
+
+
+class Throttled(Exception):
+    def __init__(self, retry_after="0"):
+        super().__init__("429")
+        self.response = SimpleNamespace(headers={"retry-after": retry_after})
+
+
+class Transient(Exception):
+    pass
+
+
+@pytest.fixture(autouse=True)
+def fake_errors(monkeypatch):
+    """Classify the test's own exceptions, so no openai errors need building."""
+    kinds = {Throttled: "throttle", Transient: "transient"}
+    monkeypatch.setattr(scheduler, "classify_error", lambda error: kinds.get(type(error)))
+
+
+def failing(*errors, value="ok"):
+    """Return a function that raises errors in turn, then returns value."""
+    errors = list(errors)
+
+    def fn():
+        if errors:
+            raise errors.pop(0)
+        return value
+    return fn
+
+
+def test_throttle_halves_limit_and_retries():
+    s = RequestScheduler(8, base_delay=0.01)
+    assert s.call(failing(Throttled())) == "ok"
+    # Halved by the 429, then raised by 1/limit by the retry's success
+    assert s.limit == 4 + 1 / 4
+    assert s.stats["throttles"] == 1
+    assert s.stats["retries"] == 1
+    assert s.stats["min_limit"] == 4
+
+
+def test_throttle_burst_halves_limit_once():
+    s = RequestScheduler(8)
+    for _ in range(5):
+        s._on_throttle(1.0)
+    assert s.limit == 4
+    assert s.stats["throttles"] == 5
+
+
+def test_success_raises_limit_additively():
+    s = RequestScheduler(8, base_delay=0.01)
+    s.call(failing(Throttled()))
+    limit = s.limit
+    s.call(failing())
+    assert s.limit == pytest.approx(limit + 1 / limit)
+    for _ in range(100):
+        s.call(failing())
+    assert s.limit == 8
+
+
+def test_limit_never_drops_below_minimum():
+    s = RequestScheduler(4, min_concurrency=2, base_delay=0.0)
+    for _ in range(5):
+        s._last_decrease = 0.0  # Past the cooldown
+        s._on_throttle(0.0)
+    assert s.limit == 2
+
+
+def test_transient_errors_retry_until_exhausted():
+    s = RequestScheduler(2, max_retries=2, base_delay=0.001)
+    assert s.call(failing(Transient(), Transient())) == "ok"
+    assert s.stats["transient_errors"] == 2
+    assert s.limit == 2  # Only throttles lower the limit
+    with pytest.raises(Transient):
+        s.call(failing(Transient(), Transient(), Transient()))
+    assert s.stats["failures"] == 1
+    assert s.in_flight == 0
+
+
+def test_permanent_error_is_not_retried():
+    s = RequestScheduler(2)
+    with pytest.raises(ValueError):
+        s.call(failing(ValueError()))
+    assert s.stats["retries"] == 0
+    assert s.stats["failures"] == 1
+
+
+def test_backoff():
+    s = RequestScheduler(1, base_delay=1.0, max_delay=10.0)
+    # Full jitter below base_delay * 2 ** attempt, capped at max_delay
+    assert all(0 <= s.backoff(2) <= 4 for _ in range(100))
+    assert all(0 <= s.backoff(20) <= 10 for _ in range(100))
+    # Retry-After is honored, plus up to base_delay of jitter, up to max_delay
+    assert all(5 <= s.backoff(0, Throttled("5")) <= 6 for _ in range(100))
+    assert all(10 <= s.backoff(0, Throttled("120")) <= 11 for _ in range(100))
+
+
+def test_concurrency_limit_and_cancel():
+    s = RequestScheduler(1)
+    release = threading.Event()
+    first = threading.Thread(target=s.call, args=(release.wait,))
+    first.start()
+    while s.in_flight == 0:
+        time.sleep(0.001)
+
+    errors = []
+
+    def queued():
+        try:
+            s.call(failing())
+        except RequestCancelled as e:
+            errors.append(e)
+    second = threading.Thread(target=queued)
+    second.start()
+    time.sleep(0.05)
+    assert s.in_flight == 1  # The second call waits for the slot
+    s.cancel()
+    second.join(1)
+    assert len(errors) == 1
+    release.set()
+    first.join(1)
+    assert s.in_flight == 0
+
+
+def test_coalescer_shares_request_in_flight():
+    coalescer = RequestCoalescer()
+    calls = []
+    started = threading.Event()
+    release = threading.Event()
+
+    def send():
+        calls.append(1)
+        started.set()
+        release.wait(1)
+        return "response"
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(coalescer.call("key", send)))
+    leader.start()
+    started.wait(1)
+    followers = [threading.Thread(target=lambda: results.append(coalescer.call("key", send))) for _ in range(3)]
+    for thread in followers:
+        thread.start()
+    time.sleep(0.05)
+    release.set()
+    for thread in [leader, *followers]:
+        thread.join(1)
+
+    assert len(calls) == 1
+    assert sorted(results, key=lambda r: r[1]) == [("response", False)] + [("response", True)] * 3
+    assert coalescer.stats == {"requests": 1, "deduplicated": 3}
+    # Nothing is kept once shared; a later caller sends again
+    assert coalescer._futures == {}
+    assert coalescer.call("key", send) == ("response", False)
+    assert len(calls) == 2
+
+
+def test_coalescer_does_not_keep_errors():
+    coalescer = RequestCoalescer()
+    with pytest.raises(ValueError):
+        coalescer.call("key", failing(ValueError()))
+    assert coalescer.call("key", failing()) == ("ok", False)
+
+
+def sleeper(*delays):
+    """Return a hedged fn whose calls sleep for delays in turn, sent at once."""
+    delays = list(delays)
+    lock = threading.Lock()
+
+    def fn(cancelled, sending):
+        with lock:
+            delay = delays.pop(0)
+        with sending:
+            if cancelled.wait(delay):
+                raise RequestCancelled()
+            return delay
+    return fn
+
+
+def warm_hedger(latency=0.01, **kwargs):
+    hedger = RequestHedger(percentile=50, budget=1.0, min_samples=5, **kwargs)
+    hedger.latencies.extend([latency] * 5)
+    return hedger
+
+
+def test_hedger_waits_for_enough_latencies():
+    hedger = RequestHedger(min_samples=5)
+    assert hedger.threshold() is None
+    assert hedger.call(sleeper(0.05)) == (0.05, None)
+    hedger.close()
+
+
+def test_hedger_backup_wins_slow_request():
+    hedger = warm_hedger()
+    value, winner = hedger.call(sleeper(1.0, 0.01))
+    assert (value, winner) == (0.01, "backup")
+    assert hedger.stats["hedges"] == 1 and hedger.stats["wins"] == 1
+    hedger.close()
+
+
+def test_hedger_leaves_fast_request_alone():
+    hedger = warm_hedger(latency=0.5)
+    assert hedger.call(sleeper(0.01)) == (0.01, None)
+    assert hedger.stats["hedges"] == 0
+    hedger.close()
+
+
+def test_hedger_respects_budget():
+    hedger = warm_hedger()
+    hedger.budget = 0.0
+    assert hedger.call(sleeper(0.1, 0.01)) == (0.1, None)
+    hedger.close()
+
+
+def test_hedger_does_not_time_the_wait_for_a_slot():
+    hedger = warm_hedger(latency=0.05)
+    slot = RequestScheduler(1)
+    hold = threading.Event()
+    holder = threading.Thread(target=slot.call, args=(lambda: hold.wait(1),))
+    holder.start()
+
+    def fn(cancelled, sending):
+        def send():
+            with sending:
+                time.sleep(0.01)
+                return "ok"
+        return slot.call(send)
+
+    threading.Timer(0.2, hold.set).start()
+    # Queued for 0.2s behind the holder, far past the 0.05s threshold
+    assert hedger.call(fn) == ("ok", None)
+    assert hedger.stats["hedges"] == 0
+    holder.join(1)
+    hedger.close()
+
+
+def test_hedger_does_not_hedge_a_retry():
+    hedger = warm_hedger()
+    s = RequestScheduler(2, base_delay=0.01)
+
+    def fn(cancelled, sending):
+        errors = [Throttled("0.1")]
+
+        def send():
+            with sending:
+                if errors:
+                    raise errors.pop()
+                return "ok"
+        return s.call(send)
+
+    assert hedger.call(fn) == ("ok", None)
+    assert hedger.stats["hedges"] == 0
+    hedger.close()
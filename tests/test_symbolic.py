@@ -0,0 +1,59 @@
+import pytest
+
+import symbolic
+from conftest import run_logs
+from runlog import read_results, read_summary
+
+pytestmark = pytest.mark.skipif(not symbolic.available(), reason="needs sympy and antlr4-python3-runtime")
+
+
+@pytest.fixture
+def verifier():
+    verifier = symbolic.SymbolicVerifier(jobs=1, timeout=10)
+    yield verifier
+    verifier.close()
+
+
+def test_repeated_answer_gets_its_own_future(verifier):
+    first = verifier.submit("\\frac{68}{2}", "34")
+    second = verifier.submit("\\frac{68}{2}", "34")
+    # Callers key their pending work by the Future, so each check needs its own
+    assert first is not second
+    assert first.result(30) == second.result(30) == symbolic.EQUIVALENT
+    assert verifier.stats["checks"] == 1
+    assert verifier.stats["memo_hits"] == 1
+    # A memoized verdict also comes back on a new Future
+    third = verifier.submit("\\frac{68}{2}", "34")
+    assert third not in (first, second)
+    assert third.result(30) == symbolic.EQUIVALENT
+
+
+def test_cancelling_one_caller_leaves_the_others(verifier):
+    first = verifier.submit("\\frac{10}{2}", "5")
+    second = verifier.submit("\\frac{10}{2}", "5")
+    second.cancel()
+    assert first.result(30) == symbolic.EQUIVALENT
+    assert second.cancelled()
+
+
+def test_run_records_every_repeated_answer(fubench, mock_endpoint):
+    # Every answer is the same correct LaTeX, so all but the first check are memo hits
+    base_url = mock_endpoint(correct_rate=1.0, latex_rate=1.0)
+    fubench("--base-url", base_url, "--class", "DerivativeComputationProblem", "--num-problems", 6,
+            "--symbolic", "--no-cache", "--no-dedup", "--seed", 0)
+    [log] = run_logs()
+    results = list(read_results(log))
+    assert [r["problem_index"] for r in results] == [1, 2, 3, 4, 5, 6]
+    assert all(r["is_correct"] for r in results)
+    summary = read_summary(log)
+    assert summary["correct_count"] == 6
+    assert summary["symbolic_stats"]["checks"] + summary["symbolic_stats"]["memo_hits"] == 6
+
+
+def test_each_model_counts_its_own_checks(fubench, mock_endpoint):
+    base_url = mock_endpoint(correct_rate=1.0, latex_rate=1.0)
+    fubench("--base-url", base_url, "--model", "a", "b", "--class", "DerivativeComputationProblem",
+            "--num-problems", 6, "--symbolic", "--no-cache", "--no-dedup", "--seed", 0)
+    for log in run_logs():
+        stats = read_summary(log)["symbolic_stats"]
+        assert stats["checks"] + stats["memo_hits"] == 6
@@ -0,0 +1,105 @@
+"""Client-side early termination of streamed completions for FuBench.
+
+The stop sequences end a response at </answer>, but base models often
+never get there: they repeat the same sentence or step over and over, or
+keep reasoning inside <think> until max_tokens runs out. Every one of
+those tokens is paid for and waited on. A StreamWatchdog reads a response
+as it streams in and says when to give up on it, so request_completion()
+can close the stream and record why.
+"""
+
+# Abort reasons, recorded in the result under "aborted"
+REPETITION = "repetition"
+THINK_LENGTH = "think_length"
+
+# A response is degenerate once its last REPEAT_MIN_CHARS characters, and
+# at least REPEAT_MIN_COPIES copies of the repeated part, are one substring
+# of up to REPEAT_MAX_PERIOD characters over and over
+REPEAT_MIN_CHARS = 256
+REPEAT_MIN_COPIES = 4
+REPEAT_MAX_PERIOD = 256
+
+# Characters of the response kept for the checks
+WINDOW = max(REPEAT_MIN_CHARS, REPEAT_MIN_COPIES * REPEAT_MAX_PERIOD)
+
+
+def repeating_period(text):
+    """
+    Return the length of the substring text ends by repeating, or None.
+
+    Args:
+        text: Response so far
+
+    Returns:
+        int: Smallest period p such that the last max(REPEAT_MIN_CHARS,
+        REPEAT_MIN_COPIES * p) characters repeat every p characters, or
+        None if there is none up to REPEAT_MAX_PERIOD
+    """
+    for period in range(1, REPEAT_MAX_PERIOD + 1):
+        span = max(REPEAT_MIN_CHARS, REPEAT_MIN_COPIES * period)
+        if span > len(text):
+            return None
+        # Cheap test first: the last copy must equal the one before it
+        if text[-period:] != text[-2 * period:-period]:
+            continue
+        tail = text[-span:]
+        if tail[period:] == tail[:-period]:
+            return period
+    return None
+
+
+class StreamWatchdog:
+    """
+    Watch one streamed response for degenerate repetition and overlong reasoning.
+
+    Feed it each chunk of text as it arrives; feed() returns the reason to
+    abort, or None to keep reading. Lengths are counted in chunks, which
+    providers send at about one token each.
+    """
+
+    def __init__(self, repetition=True, max_think_tokens=None, check_every=16):
+        """
+        Args:
+            repetition: Abort a response that keeps repeating itself
+            max_think_tokens: Abort a <think> block still open after this
+                many tokens, or None for no limit
+            check_every: Chunks between repetition checks
+        """
+        self.repetition = repetition
+        self.max_think_tokens = max_think_tokens
+        self.check_every = check_every
+        self.text = ""  # At least the last WINDOW characters
+        self.chunks = 0
+        self.think_start = None  # Chunk count when <think> appeared
+        self.think_closed = False
+
+    def feed(self, text):
+        """
+        Add the next chunk of the response.
+
+        Returns:
+            str: REPETITION or THINK_LENGTH if the response should be
+            aborted, else None
+        """
+        if len(self.text) > 2 * WINDOW:
+            self.text = self.text[-WINDOW:]
+        # Tags may be split across chunks, so search from just before the new text
+        scan_from = max(0, len(self.text) - len("</think>"))
+        self.text += text
+        self.chunks += 1
+
+        if self.max_think_tokens is not None and not self.think_closed:
+            if self.think_start is None:
+                opened = self.text.find("<think>", scan_from)
+                if opened != -1:
+                    self.think_start = self.chunks
+                    scan_from = opened
+            if self.think_start is not None:
+                if self.text.find("</think>", scan_from) != -1:
+                    self.think_closed = True
+                elif self.chunks - self.think_start > self.max_think_tokens:
+                    return THINK_LENGTH
+
+        if self.repetition and self.chunks % self.check_every == 0 and repeating_period(self.text) is not None:
+            return REPETITION
+        return None